@@ -1,19 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc
-from core.db import get_db
-from core.deps import get_current_active_user
-from models.users import User, UserType
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.db import get_db, get_async_db
+from core.deps import get_current_active_user, Principal
+from models.users import UserType
 from models.jobs import Job
 from models.resumes import Resume
 from models.applications import JobApplication
+from models.analysis_jobs import AnalysisJob, AnalysisJobKind
 from schemas.applications import ApplicationCreate, ApplicationUpdate, ApplicationResponse, ApplicationWithDetailsResponse
-from services.application_analyzer import application_analyzer
+from schemas.analysis_jobs import AnalysisJobResponse
+from services.job_queue import job_queue
 from services.ws_manager import ws_manager
 router = APIRouter(prefix='/applications', tags=['applications'])
 
 @router.get('/', response_model=list[ApplicationWithDetailsResponse])
-def get_applications(current_user: User=Depends(get_current_active_user), db: Session=Depends(get_db)):
+def get_applications(current_user: Principal=Depends(get_current_active_user), db: Session=Depends(get_db)):
     if current_user.user_type == UserType.JOB_SEEKER:
         applications = db.query(JobApplication).options(joinedload(JobApplication.job), joinedload(JobApplication.resume), joinedload(JobApplication.user)).filter(JobApplication.user_id == current_user.id).order_by(desc(JobApplication.created_at)).all()
     else:
@@ -24,7 +27,7 @@ def get_applications(current_user: User=Depends(get_current_active_user), db: Se
     return result
 
 @router.get('/{application_id}', response_model=ApplicationResponse)
-def get_application(application_id: int, current_user: User=Depends(get_current_active_user), db: Session=Depends(get_db)):
+def get_application(application_id: int, current_user: Principal=Depends(get_current_active_user), db: Session=Depends(get_db)):
     application = db.query(JobApplication).filter(JobApplication.id == application_id).first()
     if not application:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Application not found')
@@ -38,34 +41,49 @@ def get_application(application_id: int, current_user: User=Depends(get_current_
     return application
 
 @router.post('/', response_model=ApplicationResponse)
-async def create_application(application_data: ApplicationCreate, current_user: User=Depends(get_current_active_user), db: Session=Depends(get_db)):
+async def create_application(application_data: ApplicationCreate, current_user: Principal=Depends(get_current_active_user), db: AsyncSession=Depends(get_async_db)):
     if current_user.user_type != UserType.JOB_SEEKER:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Only job seekers can create applications')
-    job = db.query(Job).filter(Job.id == application_data.job_id, Job.is_active == True).first()
+    job = await db.scalar(select(Job).filter(Job.id == application_data.job_id, Job.is_active == True))
     if not job:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Job not found or inactive')
-    resume = db.query(Resume).filter(Resume.id == application_data.resume_id, Resume.user_id == current_user.id).first()
+    resume = await db.scalar(select(Resume).filter(Resume.id == application_data.resume_id, Resume.user_id == current_user.id))
     if not resume:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Resume not found')
-    existing_application = db.query(JobApplication).filter(JobApplication.user_id == current_user.id, JobApplication.job_id == application_data.job_id).first()
+    existing_application = await db.scalar(select(JobApplication).filter(JobApplication.user_id == current_user.id, JobApplication.job_id == application_data.job_id))
     if existing_application:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='You have already applied for this job')
     db_application = JobApplication(**application_data.dict(), user_id=current_user.id)
     db.add(db_application)
-    db.commit()
-    db.refresh(db_application)
+    await db.flush()
+    job_queue.enqueue(db, AnalysisJobKind.START_ANALYSIS.value, {'application_id': db_application.id}, application_id=db_application.id)
+    await db.commit()
+    await db.refresh(db_application)
     try:
         await ws_manager.broadcast_job(db_application.job_id, {'event': 'application_created', 'application_id': db_application.id, 'job_id': db_application.job_id, 'user_id': db_application.user_id, 'created_at': db_application.created_at.isoformat() if hasattr(db_application, 'created_at') and db_application.created_at else None})
     except Exception as e:
         print(f'WS broadcast failed (application_created): {e}')
-    try:
-        await application_analyzer.start_analysis_session(db, db_application)
-    except Exception as e:
-        print(f'Failed to start SmartBot analysis: {e}')
     return db_application
 
+@router.get('/{application_id}/analysis-status', response_model=AnalysisJobResponse)
+def get_application_analysis_status(application_id: int, current_user: Principal=Depends(get_current_active_user), db: Session=Depends(get_db)):
+    application = db.query(JobApplication).filter(JobApplication.id == application_id).first()
+    if not application:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Application not found')
+    if current_user.user_type == UserType.JOB_SEEKER:
+        if application.user_id != current_user.id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='You can only view your own applications')
+    else:
+        job = db.query(Job).filter(Job.id == application.job_id).first()
+        if job.employer_id != current_user.id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='You can only view applications for your jobs')
+    analysis_job = db.query(AnalysisJob).filter(AnalysisJob.application_id == application_id).order_by(desc(AnalysisJob.created_at), desc(AnalysisJob.id)).first()
+    if not analysis_job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='No analysis job for this application')
+    return analysis_job
+
 @router.put('/{application_id}', response_model=ApplicationResponse)
-def update_application(application_id: int, application_data: ApplicationUpdate, current_user: User=Depends(get_current_active_user), db: Session=Depends(get_db)):
+def update_application(application_id: int, application_data: ApplicationUpdate, current_user: Principal=Depends(get_current_active_user), db: Session=Depends(get_db)):
     application = db.query(JobApplication).filter(JobApplication.id == application_id).first()
     if not application:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Application not found')
@@ -90,7 +108,7 @@ def update_application(application_id: int, application_data: ApplicationUpdate,
     return application
 
 @router.get('/{application_id}/resume')
-def get_application_resume(application_id: int, current_user: User=Depends(get_current_active_user), db: Session=Depends(get_db)):
+def get_application_resume(application_id: int, current_user: Principal=Depends(get_current_active_user), db: Session=Depends(get_db)):
     application = db.query(JobApplication).options(joinedload(JobApplication.resume), joinedload(JobApplication.job), joinedload(JobApplication.user)).filter(JobApplication.id == application_id).first()
     if not application:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Application not found')
@@ -101,7 +119,7 @@ def get_application_resume(application_id: int, current_user: User=Depends(get_c
     return application.resume
 
 @router.delete('/{application_id}')
-def delete_application(application_id: int, current_user: User=Depends(get_current_active_user), db: Session=Depends(get_db)):
+def delete_application(application_id: int, current_user: Principal=Depends(get_current_active_user), db: Session=Depends(get_db)):
     application = db.query(JobApplication).filter(JobApplication.id == application_id).first()
     if not application:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Application not found')
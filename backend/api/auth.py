@@ -1,49 +1,67 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
-from core.db import get_db
-from core.security import verify_password, get_password_hash, create_access_token
-from core.deps import get_current_active_user
+from core.db import get_async_db
+from core.security import verify_and_update_password_async, get_password_hash_async, create_access_token, PasswordHasherBusy
+from core.deps import get_current_active_user, Principal
 from models.users import User
 from schemas.users import UserCreate, UserResponse, UserLogin, Token
 router = APIRouter(prefix='/auth', tags=['authentication'])
 
+def _hasher_busy() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail='Authentication service is busy, please retry', headers={'Retry-After': '1'})
+
 @router.post('/register', response_model=UserResponse)
-def register(user_data: UserCreate, db: Session=Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession=Depends(get_async_db)):
     try:
-        existing_user = db.query(User).filter(User.email == user_data.email).first()
+        existing_user = await db.scalar(select(User).filter(User.email == user_data.email))
         if existing_user:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Email already registered')
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await get_password_hash_async(user_data.password)
         db_user = User(email=user_data.email, hashed_password=hashed_password, full_name=user_data.full_name, phone=user_data.phone, user_type=user_data.user_type)
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
         return db_user
+    except HTTPException:
+        raise
+    except PasswordHasherBusy:
+        raise _hasher_busy()
     except SQLAlchemyError as e:
         try:
-            db.rollback()
+            await db.rollback()
         except Exception:
             pass
         raise HTTPException(status_code=500, detail=f'DB error: {repr(e)}')
     except Exception as e:
         try:
-            db.rollback()
+            await db.rollback()
         except Exception:
             pass
         raise HTTPException(status_code=500, detail=f'Unexpected error: {repr(e)}')
 
 @router.post('/login', response_model=Token)
-def login(user_credentials: UserLogin, db: Session=Depends(get_db)):
-    user = db.query(User).filter(User.email == user_credentials.email).first()
-    if not user or not verify_password(user_credentials.password, user.hashed_password):
+async def login(user_credentials: UserLogin, db: AsyncSession=Depends(get_async_db)):
+    user = await db.scalar(select(User).filter(User.email == user_credentials.email))
+    try:
+        (verified, new_hash) = await verify_and_update_password_async(user_credentials.password, user.hashed_password) if user else (False, None)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+    if not verified:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Incorrect email or password', headers={'WWW-Authenticate': 'Bearer'})
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Inactive user')
-    access_token = create_access_token(data={'sub': user.email})
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+    access_token = create_access_token(data={'sub': user.email, 'uid': user.id, 'typ': user.user_type.value if hasattr(user.user_type, 'value') else user.user_type})
     return {'access_token': access_token, 'token_type': 'bearer'}
 
 @router.get('/me', response_model=UserResponse)
-def get_current_user_info(current_user: User=Depends(get_current_active_user)):
-    return current_user
+async def get_current_user_info(current_user: Principal=Depends(get_current_active_user), db: AsyncSession=Depends(get_async_db)):
+    user = await db.get(User, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='User not found', headers={'WWW-Authenticate': 'Bearer'})
+    return user
@@ -1,44 +1,122 @@
+import json
+import base64
+from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import Optional
+from sqlalchemy import desc, func, literal_column, tuple_
+from typing import Optional, Tuple
+from core.config import settings
+from core.cache import build_cache
 from core.db import get_db
-from core.deps import get_current_active_user
-from models.users import User, UserType
-from models.jobs import Job
+from core.deps import get_current_active_user, Principal
+from models.users import UserType
+from models.jobs import Job, SEARCH_CONFIGS
 from schemas.jobs import JobCreate, JobUpdate, JobResponse, JobListResponse
 router = APIRouter(prefix='/jobs', tags=['jobs'])
+job_cache = build_cache('jobs')
+
+def _search_filter(db: Session, search: str):
+    if db.get_bind().dialect.name != 'postgresql':
+        return (Job.title.ilike(f'%{search}%') | Job.description.ilike(f'%{search}%') | Job.company_name.ilike(f'%{search}%'), None)
+    (ru, en) = (func.websearch_to_tsquery(literal_column(f"'{config}'::regconfig"), search) for config in SEARCH_CONFIGS)
+    ts_query = ru.op('||')(en)
+    rank = func.ts_rank(Job.search_vector, ts_query) + func.word_similarity(search, Job.company_name)
+    return (Job.search_vector.op('@@')(ts_query) | Job.company_name.op('%>')(search), rank)
+
+def _encode_cursor(job: Job) -> str:
+    raw = json.dumps({'c': job.created_at.isoformat(), 'i': job.id}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return (datetime.fromisoformat(data['c']), int(data['i']))
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid cursor')
+
+def _approximate_total(db: Session, query) -> int:
+    if db.get_bind().dialect.name == 'postgresql':
+        compiled = query.with_entities(Job.id).statement.compile(dialect=db.get_bind().dialect)
+        plan = db.connection().exec_driver_sql('EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params).scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        return int(plan[0]['Plan']['Plan Rows'])
+    key = 'jobs:count:' + str(query.statement.compile(compile_kwargs={'literal_binds': True}))
+    cached = job_cache.get(key)
+    if cached is not None:
+        return cached
+    total = query.count()
+    job_cache.set(key, total, ttl=settings.jobs_count_cache_ttl)
+    return total
+
+def _invalidate_job_caches(employer_id: int, job_id: Optional[int]=None) -> None:
+    job_cache.delete_prefix('jobs:list:')
+    job_cache.delete(f'jobs:employer:{employer_id}')
+    if job_id is not None:
+        job_cache.delete(f'jobs:detail:{job_id}')
 
 @router.get('/', response_model=JobListResponse)
-def get_jobs(page: int=Query(1, ge=1), per_page: int=Query(10, ge=1, le=100), search: Optional[str]=None, location: Optional[str]=None, db: Session=Depends(get_db)):
+def get_jobs(page: int=Query(1, ge=1), per_page: int=Query(10, ge=1, le=100), search: Optional[str]=None, location: Optional[str]=None, pagination: str=Query('offset', pattern='^(offset|cursor)$'), cursor: Optional[str]=None, total_mode: Optional[str]=Query(None, pattern='^(exact|approximate|none)$'), db: Session=Depends(get_db)):
+    total_mode = total_mode or ('none' if pagination == 'cursor' or cursor else 'exact')
+    list_key = None
+    if not cursor and page <= settings.jobs_list_cache_pages:
+        list_key = 'jobs:list:' + json.dumps([pagination, page, per_page, search, location, total_mode], ensure_ascii=False)
+        cached = job_cache.get(list_key)
+        if cached is not None:
+            return cached
     query = db.query(Job).filter(Job.is_active == True)
+    rank = None
     if search:
-        query = query.filter(Job.title.ilike(f'%{search}%') | Job.description.ilike(f'%{search}%') | Job.company_name.ilike(f'%{search}%'))
+        (search_clause, rank) = _search_filter(db, search)
+        query = query.filter(search_clause)
     if location:
         query = query.filter(Job.location.ilike(f'%{location}%'))
-    total = query.count()
-    jobs = query.order_by(desc(Job.created_at)).offset((page - 1) * per_page).limit(per_page).all()
-    return JobListResponse(jobs=jobs, total=total, page=page, per_page=per_page)
+    if total_mode == 'exact':
+        total = query.count()
+    elif total_mode == 'approximate':
+        total = _approximate_total(db, query)
+    else:
+        total = None
+    if pagination == 'cursor' or cursor:
+        if cursor:
+            (created_at, job_id) = _decode_cursor(cursor)
+            query = query.filter(tuple_(Job.created_at, Job.id) < tuple_(created_at, job_id))
+        jobs = query.order_by(desc(Job.created_at), desc(Job.id)).limit(per_page + 1).all()
+        next_cursor = _encode_cursor(jobs[per_page - 1]) if len(jobs) > per_page else None
+        response = JobListResponse(jobs=jobs[:per_page], total=total, total_is_approximate=total_mode == 'approximate', page=page, per_page=per_page, next_cursor=next_cursor)
+    else:
+        order_by = [desc(Job.created_at)] if rank is None else [desc(rank), desc(Job.created_at)]
+        jobs = query.order_by(*order_by).offset((page - 1) * per_page).limit(per_page).all()
+        response = JobListResponse(jobs=jobs, total=total, total_is_approximate=total_mode == 'approximate', page=page, per_page=per_page)
+    if list_key:
+        job_cache.set(list_key, response.model_dump(mode='json'))
+    return response
 
 @router.get('/{job_id}', response_model=JobResponse)
 def get_job(job_id: int, db: Session=Depends(get_db)):
+    cached = job_cache.get(f'jobs:detail:{job_id}')
+    if cached is not None:
+        return cached
     job = db.query(Job).filter(Job.id == job_id, Job.is_active == True).first()
     if not job:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Job not found')
-    return job
+    response = JobResponse.model_validate(job).model_dump(mode='json')
+    job_cache.set(f'jobs:detail:{job_id}', response)
+    return response
 
 @router.post('/', response_model=JobResponse)
-def create_job(job_data: JobCreate, current_user: User=Depends(get_current_active_user), db: Session=Depends(get_db)):
+def create_job(job_data: JobCreate, current_user: Principal=Depends(get_current_active_user), db: Session=Depends(get_db)):
     if current_user.user_type != UserType.EMPLOYER:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Only employers can create jobs')
     db_job = Job(**job_data.dict(), employer_id=current_user.id)
     db.add(db_job)
     db.commit()
     db.refresh(db_job)
+    _invalidate_job_caches(current_user.id)
     return db_job
 
 @router.put('/{job_id}', response_model=JobResponse)
-def update_job(job_id: int, job_data: JobUpdate, current_user: User=Depends(get_current_active_user), db: Session=Depends(get_db)):
+def update_job(job_id: int, job_data: JobUpdate, current_user: Principal=Depends(get_current_active_user), db: Session=Depends(get_db)):
     job = db.query(Job).filter(Job.id == job_id).first()
     if not job:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Job not found')
@@ -49,10 +127,11 @@ def update_job(job_id: int, job_data: JobUpdate, current_user: User=Depends(get_
         setattr(job, field, value)
     db.commit()
     db.refresh(job)
+    _invalidate_job_caches(job.employer_id, job.id)
     return job
 
 @router.delete('/{job_id}')
-def delete_job(job_id: int, current_user: User=Depends(get_current_active_user), db: Session=Depends(get_db)):
+def delete_job(job_id: int, current_user: Principal=Depends(get_current_active_user), db: Session=Depends(get_db)):
     job = db.query(Job).filter(Job.id == job_id).first()
     if not job:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Job not found')
@@ -60,11 +139,17 @@ def delete_job(job_id: int, current_user: User=Depends(get_current_active_user),
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='You can only delete your own jobs')
     job.is_active = False
     db.commit()
+    _invalidate_job_caches(job.employer_id, job.id)
     return {'message': 'Job deleted successfully'}
 
 @router.get('/my/jobs', response_model=list[JobResponse])
-def get_my_jobs(current_user: User=Depends(get_current_active_user), db: Session=Depends(get_db)):
+def get_my_jobs(current_user: Principal=Depends(get_current_active_user), db: Session=Depends(get_db)):
     if current_user.user_type != UserType.EMPLOYER:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Only employers can view their jobs')
+    cached = job_cache.get(f'jobs:employer:{current_user.id}')
+    if cached is not None:
+        return cached
     jobs = db.query(Job).filter(Job.employer_id == current_user.id).order_by(desc(Job.created_at)).all()
-    return jobs
+    response = [JobResponse.model_validate(job).model_dump(mode='json') for job in jobs]
+    job_cache.set(f'jobs:employer:{current_user.id}', response)
+    return response
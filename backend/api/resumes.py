@@ -2,21 +2,21 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from core.db import get_db
-from core.deps import get_current_active_user
-from models.users import User, UserType
+from core.deps import get_current_active_user, Principal
+from models.users import UserType
 from models.resumes import Resume
 from schemas.resumes import ResumeCreate, ResumeUpdate, ResumeResponse
 router = APIRouter(prefix='/resumes', tags=['resumes'])
 
 @router.get('/', response_model=list[ResumeResponse])
-def get_my_resumes(current_user: User=Depends(get_current_active_user), db: Session=Depends(get_db)):
+def get_my_resumes(current_user: Principal=Depends(get_current_active_user), db: Session=Depends(get_db)):
     if current_user.user_type != UserType.JOB_SEEKER:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Only job seekers can view resumes')
     resumes = db.query(Resume).filter(Resume.user_id == current_user.id).order_by(desc(Resume.created_at)).all()
     return resumes
 
 @router.get('/{resume_id}', response_model=ResumeResponse)
-def get_resume(resume_id: int, current_user: User=Depends(get_current_active_user), db: Session=Depends(get_db)):
+def get_resume(resume_id: int, current_user: Principal=Depends(get_current_active_user), db: Session=Depends(get_db)):
     resume = db.query(Resume).filter(Resume.id == resume_id).first()
     if not resume:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Resume not found')
@@ -25,7 +25,7 @@ def get_resume(resume_id: int, current_user: User=Depends(get_current_active_use
     return resume
 
 @router.post('/', response_model=ResumeResponse)
-def create_resume(resume_data: ResumeCreate, current_user: User=Depends(get_current_active_user), db: Session=Depends(get_db)):
+def create_resume(resume_data: ResumeCreate, current_user: Principal=Depends(get_current_active_user), db: Session=Depends(get_db)):
     if current_user.user_type != UserType.JOB_SEEKER:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Only job seekers can create resumes')
     db_resume = Resume(**resume_data.dict(), user_id=current_user.id)
@@ -35,7 +35,7 @@ def create_resume(resume_data: ResumeCreate, current_user: User=Depends(get_curr
     return db_resume
 
 @router.put('/{resume_id}', response_model=ResumeResponse)
-def update_resume(resume_id: int, resume_data: ResumeUpdate, current_user: User=Depends(get_current_active_user), db: Session=Depends(get_db)):
+def update_resume(resume_id: int, resume_data: ResumeUpdate, current_user: Principal=Depends(get_current_active_user), db: Session=Depends(get_db)):
     resume = db.query(Resume).filter(Resume.id == resume_id).first()
     if not resume:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Resume not found')
@@ -49,7 +49,7 @@ def update_resume(resume_id: int, resume_data: ResumeUpdate, current_user: User=
     return resume
 
 @router.delete('/{resume_id}')
-def delete_resume(resume_id: int, current_user: User=Depends(get_current_active_user), db: Session=Depends(get_db)):
+def delete_resume(resume_id: int, current_user: Principal=Depends(get_current_active_user), db: Session=Depends(get_db)):
     resume = db.query(Resume).filter(Resume.id == resume_id).first()
     if not resume:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Resume not found')
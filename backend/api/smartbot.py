@@ -1,34 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from core.db import get_db
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy import select, func, desc, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional, Tuple
+from core.db import get_async_db, AsyncSessionLocal
 from models.applications import JobApplication
 from models.chat import SmartBotSession, SmartBotMessage, CandidateAnalysis, AnalysisCategory
 from models.jobs import Job
-from models.resumes import Resume
 from models.users import User, UserType
-from schemas.chat import SmartBotInitRequest, SmartBotInitResponse, SmartBotChatRequest, SmartBotChatResponse, SmartBotSessionResponse, EmployerAnalysisView
+from models.analysis_jobs import AnalysisJob, AnalysisJobKind, AnalysisJobStatus
+from schemas.chat import SmartBotInitRequest, SmartBotInitResponse, SmartBotChatRequest, SmartBotChatResponse, SmartBotSessionResponse, SmartBotMessageResponse, EmployerAnalysisView
+from schemas.analysis_jobs import AnalysisJobResponse
+from services.job_queue import job_queue
 from services.application_analyzer import application_analyzer
-from core.deps import get_current_active_user
+from core.deps import get_current_active_user, Principal, principal_from_payload, cached_principal, remember_principal
 import json
-from fastapi import WebSocket, WebSocketDisconnect
+from fastapi import WebSocket
 from core.security import verify_token
 from services.ws_manager import ws_manager
-import asyncio
 router = APIRouter(prefix='/smartbot', tags=['SmartBot'])
 
 @router.post('/start-analysis', response_model=SmartBotInitResponse)
-async def start_analysis(request: SmartBotInitRequest, db: Session=Depends(get_db), current_user: User=Depends(get_current_active_user)):
-    application = db.query(JobApplication).filter(JobApplication.id == request.application_id, JobApplication.user_id == current_user.id).first()
+async def start_analysis(request: SmartBotInitRequest, db: AsyncSession=Depends(get_async_db), current_user: Principal=Depends(get_current_active_user)):
+    application = await db.scalar(select(JobApplication).filter(JobApplication.id == request.application_id, JobApplication.user_id == current_user.id))
     if not application:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Application not found')
-    existing_session = db.query(SmartBotSession).filter(SmartBotSession.application_id == application.id).first()
+    existing_session = await db.scalar(select(SmartBotSession).filter(SmartBotSession.application_id == application.id))
     if existing_session:
-        messages = db.query(SmartBotMessage).filter(SmartBotMessage.session_id == existing_session.session_id).order_by(SmartBotMessage.created_at).all()
-        return SmartBotInitResponse(session_id=existing_session.session_id, status=existing_session.status, initial_message=messages[0].content if messages else 'Добро пожаловать в SmartBot!', is_completed=existing_session.status == 'completed')
+        first_message = await _first_message(db, existing_session.session_id)
+        return SmartBotInitResponse(session_id=existing_session.session_id, status=existing_session.status, initial_message=first_message.content if first_message else 'Добро пожаловать в SmartBot!', is_completed=existing_session.status == 'completed')
     try:
         session = await application_analyzer.start_analysis_session(db, application)
-        initial_message = db.query(SmartBotMessage).filter(SmartBotMessage.session_id == session.session_id).order_by(SmartBotMessage.created_at).first()
+        initial_message = await _first_message(db, session.session_id)
         return SmartBotInitResponse(session_id=session.session_id, status=session.status, initial_message=initial_message.content if initial_message else 'Добро пожаловать в SmartBot!', is_completed=session.status == 'completed')
     except Exception as e:
         import traceback
@@ -37,11 +39,11 @@ async def start_analysis(request: SmartBotInitRequest, db: Session=Depends(get_d
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f'Failed to start analysis: {str(e)}')
 
 @router.post('/chat', response_model=SmartBotChatResponse)
-async def chat_with_smartbot(request: SmartBotChatRequest, db: Session=Depends(get_db), current_user: User=Depends(get_current_active_user)):
-    session = db.query(SmartBotSession).filter(SmartBotSession.session_id == request.session_id).first()
+async def chat_with_smartbot(request: SmartBotChatRequest, db: AsyncSession=Depends(get_async_db), current_user: Principal=Depends(get_current_active_user)):
+    session = await db.scalar(select(SmartBotSession).filter(SmartBotSession.session_id == request.session_id))
     if not session:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Session not found')
-    application = db.query(JobApplication).filter(JobApplication.id == session.application_id, JobApplication.user_id == current_user.id).first()
+    application = await db.scalar(select(JobApplication).filter(JobApplication.id == session.application_id, JobApplication.user_id == current_user.id))
     if not application:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Access denied')
     try:
@@ -50,35 +52,74 @@ async def chat_with_smartbot(request: SmartBotChatRequest, db: Session=Depends(g
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f'Failed to process message: {str(e)}')
 
-@router.get('/session/{session_id}', response_model=SmartBotSessionResponse)
-async def get_session(session_id: str, db: Session=Depends(get_db), current_user: User=Depends(get_current_active_user)):
-    session = db.query(SmartBotSession).filter(SmartBotSession.session_id == session_id).first()
+async def _first_message(db: AsyncSession, session_id: str) -> Optional[SmartBotMessage]:
+    return await db.scalar(select(SmartBotMessage).filter(SmartBotMessage.session_id == session_id).order_by(SmartBotMessage.created_at, SmartBotMessage.id).limit(1))
+
+async def _message_page(db: AsyncSession, session_id: str, limit: int, before_id: Optional[int]) -> Tuple[List[SmartBotMessage], bool]:
+    query = select(SmartBotMessage).filter(SmartBotMessage.session_id == session_id)
+    if before_id is not None:
+        anchor = select(SmartBotMessage.created_at).filter(SmartBotMessage.id == before_id).scalar_subquery()
+        query = query.filter(tuple_(SmartBotMessage.created_at, SmartBotMessage.id) < tuple_(anchor, before_id))
+    rows = (await db.scalars(query.order_by(SmartBotMessage.created_at.desc(), SmartBotMessage.id.desc()).limit(limit + 1))).all()
+    return (list(reversed(rows[:limit])), len(rows) > limit)
+
+def _json_list(value) -> list:
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return []
+    return value if isinstance(value, list) else []
+
+def _message_view(msg: SmartBotMessage) -> dict:
+    metadata = msg.message_metadata
+    if isinstance(metadata, str):
+        try:
+            metadata = json.loads(metadata)
+        except ValueError:
+            metadata = None
+    return {'id': msg.id, 'message_type': msg.message_type.value if hasattr(msg.message_type, 'value') else msg.message_type, 'content': msg.content, 'metadata': metadata if isinstance(metadata, dict) else None, 'created_at': msg.created_at}
+
+async def _candidate_session(db: AsyncSession, session_id: str, user_id: int) -> SmartBotSession:
+    session = await db.scalar(select(SmartBotSession).filter(SmartBotSession.session_id == session_id))
     if not session:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Session not found')
-    application = db.query(JobApplication).filter(JobApplication.id == session.application_id, JobApplication.user_id == current_user.id).first()
+    application = await db.scalar(select(JobApplication).filter(JobApplication.id == session.application_id, JobApplication.user_id == user_id))
     if not application:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Access denied')
-    messages = db.query(SmartBotMessage).filter(SmartBotMessage.session_id == session_id).order_by(SmartBotMessage.created_at).all()
-    analysis = db.query(CandidateAnalysis).filter(CandidateAnalysis.session_id == session_id).first()
-    return SmartBotSessionResponse(id=session.id, application_id=session.application_id, status=session.status, started_at=session.started_at, completed_at=session.completed_at, messages=[{'id': msg.id, 'message_type': msg.message_type.value if hasattr(msg.message_type, 'value') else msg.message_type, 'content': msg.content, 'metadata': msg.message_metadata, 'created_at': msg.created_at} for msg in messages])
+    return session
+
+@router.get('/session/{session_id}', response_model=SmartBotSessionResponse)
+async def get_session(session_id: str, limit: int=Query(50, ge=1, le=200), before_id: Optional[int]=Query(None, ge=1), db: AsyncSession=Depends(get_async_db), current_user: Principal=Depends(get_current_active_user)):
+    session = await _candidate_session(db, session_id, current_user.id)
+    (messages, has_more) = await _message_page(db, session_id, limit, before_id)
+    return SmartBotSessionResponse(id=session.id, application_id=session.application_id, status=session.status, started_at=session.started_at, completed_at=session.completed_at, messages=[_message_view(msg) for msg in messages], has_more=has_more, next_before_id=messages[0].id if has_more else None)
+
+@router.get('/session/{session_id}/messages', response_model=List[SmartBotMessageResponse])
+async def get_session_messages(session_id: str, response: Response, limit: int=Query(50, ge=1, le=200), before_id: Optional[int]=Query(None, ge=1), db: AsyncSession=Depends(get_async_db), current_user: Principal=Depends(get_current_active_user)):
+    await _candidate_session(db, session_id, current_user.id)
+    (messages, has_more) = await _message_page(db, session_id, limit, before_id)
+    if has_more:
+        response.headers['X-Next-Before-Id'] = str(messages[0].id)
+    return [_message_view(msg) for msg in messages]
 
 @router.post('/employer/start-analysis', response_model=SmartBotInitResponse)
-async def start_employer_analysis(request: SmartBotInitRequest, db: Session=Depends(get_db), current_user: User=Depends(get_current_active_user)):
+async def start_employer_analysis(request: SmartBotInitRequest, db: AsyncSession=Depends(get_async_db), current_user: Principal=Depends(get_current_active_user)):
     if current_user.user_type != 'employer':
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Only employers can access this endpoint')
-    application = db.query(JobApplication).filter(JobApplication.id == request.application_id).first()
+    application = await db.scalar(select(JobApplication).filter(JobApplication.id == request.application_id))
     if not application:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Application not found')
-    job = db.query(Job).filter(Job.id == application.job_id, Job.employer_id == current_user.id).first()
+    job = await db.scalar(select(Job).filter(Job.id == application.job_id, Job.employer_id == current_user.id))
     if not job:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied - you don't own this job")
-    existing_session = db.query(SmartBotSession).filter(SmartBotSession.application_id == application.id).first()
+    existing_session = await db.scalar(select(SmartBotSession).filter(SmartBotSession.application_id == application.id))
     if existing_session:
-        messages = db.query(SmartBotMessage).filter(SmartBotMessage.session_id == existing_session.session_id).order_by(SmartBotMessage.created_at).all()
-        return SmartBotInitResponse(session_id=existing_session.session_id, status=existing_session.status, initial_message=messages[0].content if messages else 'Добро пожаловать в SmartBot!', is_completed=existing_session.status == 'completed')
+        first_message = await _first_message(db, existing_session.session_id)
+        return SmartBotInitResponse(session_id=existing_session.session_id, status=existing_session.status, initial_message=first_message.content if first_message else 'Добро пожаловать в SmartBot!', is_completed=existing_session.status == 'completed')
     try:
         session = await application_analyzer.start_analysis_session(db, application)
-        initial_message = db.query(SmartBotMessage).filter(SmartBotMessage.session_id == session.session_id).order_by(SmartBotMessage.created_at).first()
+        initial_message = await _first_message(db, session.session_id)
         return SmartBotInitResponse(session_id=session.session_id, status=session.status, initial_message=initial_message.content if initial_message else 'Добро пожаловать в SmartBot!', is_completed=session.status == 'completed')
     except Exception as e:
         import traceback
@@ -86,58 +127,83 @@ async def start_employer_analysis(request: SmartBotInitRequest, db: Session=Depe
         print(f'ERROR traceback: {traceback.format_exc()}')
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f'Failed to start analysis: {str(e)}')
 
+@router.post('/employer/jobs/{job_id}/reanalyze', response_model=AnalysisJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def reanalyze_job_applications(job_id: int, db: AsyncSession=Depends(get_async_db), current_user: Principal=Depends(get_current_active_user)):
+    if current_user.user_type != 'employer':
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Only employers can access this endpoint')
+    job = await db.scalar(select(Job).filter(Job.id == job_id, Job.employer_id == current_user.id))
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Job not found or access denied')
+    active = await db.scalar(select(AnalysisJob).filter(AnalysisJob.kind == AnalysisJobKind.REANALYZE_JOB.value, AnalysisJob.payload['job_id'].as_integer() == job_id, AnalysisJob.status.in_([AnalysisJobStatus.QUEUED.value, AnalysisJobStatus.RUNNING.value])).order_by(desc(AnalysisJob.id)).limit(1))
+    if active:
+        return active
+    analysis_job = job_queue.enqueue(db, AnalysisJobKind.REANALYZE_JOB.value, {'job_id': job_id})
+    await db.commit()
+    await db.refresh(analysis_job)
+    return analysis_job
+
 @router.get('/employer/applications/{job_id}', response_model=List[EmployerAnalysisView])
-async def get_employer_analysis(job_id: int, db: Session=Depends(get_db), current_user: User=Depends(get_current_active_user)):
-    job = db.query(Job).filter(Job.id == job_id, Job.employer_id == current_user.id).first()
+async def get_employer_analysis(job_id: int, response: Response, page: int=Query(1, ge=1), per_page: int=Query(50, ge=1, le=200), sort: str=Query('score', pattern='^(score|applied_at)$'), include_messages: bool=Query(True), db: AsyncSession=Depends(get_async_db), current_user: Principal=Depends(get_current_active_user)):
+    job = await db.scalar(select(Job).filter(Job.id == job_id, Job.employer_id == current_user.id))
     if not job:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Job not found or access denied')
-    applications = db.query(JobApplication).filter(JobApplication.job_id == job_id).all()
-    results = []
-    for application in applications:
-        user = db.query(User).filter(User.id == application.user_id).first()
-        session = db.query(SmartBotSession).filter(SmartBotSession.application_id == application.id).first()
-        if not session:
-            continue
-        analysis = db.query(CandidateAnalysis).filter(CandidateAnalysis.session_id == session.session_id).first()
-        messages = db.query(SmartBotMessage).filter(SmartBotMessage.session_id == session.session_id).order_by(SmartBotMessage.created_at).all()
-        categories = db.query(AnalysisCategory).filter(AnalysisCategory.analysis_id == analysis.id).all() if analysis else []
-        results.append(EmployerAnalysisView(application_id=application.id, candidate_name=f'{user.first_name} {user.last_name}' if user else 'Unknown', candidate_email=user.email if user else '', session_id=session.session_id, session_status=session.status, relevance_score=analysis.final_score or analysis.initial_score if analysis else 0, recommendation=_get_recommendation_from_score(analysis.final_score or analysis.initial_score if analysis else 0), summary=analysis.summary if analysis else 'Анализ не завершен', strengths=json.loads(analysis.strengths) if analysis and analysis.strengths else [], concerns=json.loads(analysis.weaknesses) if analysis and analysis.weaknesses else [], chat_messages=[{'type': msg.message_type.value if hasattr(msg.message_type, 'value') else msg.message_type, 'content': msg.content, 'created_at': msg.created_at} for msg in messages], categories=[{'name': cat.category, 'status': cat.status, 'score': cat.score, 'details': cat.details} for cat in categories], applied_at=application.created_at, analyzed_at=session.updated_at))
-    results.sort(key=lambda x: x.relevance_score, reverse=True)
-    return results
+    base = select(JobApplication, SmartBotSession, CandidateAnalysis, User).join(SmartBotSession, SmartBotSession.application_id == JobApplication.id).outerjoin(CandidateAnalysis, CandidateAnalysis.session_id == SmartBotSession.session_id).outerjoin(User, User.id == JobApplication.user_id).filter(JobApplication.job_id == job_id)
+    total = await db.scalar(select(func.count()).select_from(base.with_only_columns(JobApplication.id).subquery()))
+    response.headers['X-Total-Count'] = str(total or 0)
+    if sort == 'score':
+        base = base.order_by(func.coalesce(CandidateAnalysis.final_score, CandidateAnalysis.initial_score).desc().nullslast(), desc(JobApplication.created_at), JobApplication.id)
+    else:
+        base = base.order_by(desc(JobApplication.created_at), JobApplication.id)
+    rows = (await db.execute(base.offset((page - 1) * per_page).limit(per_page))).all()
+    analysis_ids = [analysis.id for (_, _, analysis, _) in rows if analysis]
+    categories_by_analysis: Dict[int, List[AnalysisCategory]] = {}
+    if analysis_ids:
+        for cat in (await db.scalars(select(AnalysisCategory).filter(AnalysisCategory.analysis_id.in_(analysis_ids)))).all():
+            categories_by_analysis.setdefault(cat.analysis_id, []).append(cat)
+    messages_by_session: Dict[str, List[SmartBotMessage]] = {}
+    if include_messages and rows:
+        session_ids = [session.session_id for (_, session, _, _) in rows]
+        for msg in (await db.scalars(select(SmartBotMessage).filter(SmartBotMessage.session_id.in_(session_ids)).order_by(SmartBotMessage.session_id, SmartBotMessage.created_at))).all():
+            messages_by_session.setdefault(msg.session_id, []).append(msg)
+    return [_build_employer_view(application, session, analysis, user, messages_by_session.get(session.session_id, []), categories_by_analysis.get(analysis.id, []) if analysis else []) for (application, session, analysis, user) in rows]
 
 @router.get('/employer/analysis/{session_id}', response_model=EmployerAnalysisView)
-async def get_single_analysis(session_id: str, db: Session=Depends(get_db), current_user: User=Depends(get_current_active_user)):
-    session = db.query(SmartBotSession).filter(SmartBotSession.session_id == session_id).first()
+async def get_single_analysis(session_id: str, db: AsyncSession=Depends(get_async_db), current_user: Principal=Depends(get_current_active_user)):
+    session = await db.scalar(select(SmartBotSession).filter(SmartBotSession.session_id == session_id))
     if not session:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Session not found')
-    application = db.query(JobApplication).filter(JobApplication.id == session.application_id).first()
+    application = await db.scalar(select(JobApplication).filter(JobApplication.id == session.application_id))
     if not application:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Application not found')
-    job = db.query(Job).filter(Job.id == application.job_id, Job.employer_id == current_user.id).first()
+    job = await db.scalar(select(Job).filter(Job.id == application.job_id, Job.employer_id == current_user.id))
     if not job:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Access denied')
-    user = db.query(User).filter(User.id == application.user_id).first()
-    analysis = db.query(CandidateAnalysis).filter(CandidateAnalysis.session_id == session_id).first()
-    messages = db.query(SmartBotMessage).filter(SmartBotMessage.session_id == session_id).order_by(SmartBotMessage.created_at).all()
-    categories = db.query(AnalysisCategory).filter(AnalysisCategory.analysis_id == analysis.id).all() if analysis else []
-    return EmployerAnalysisView(application_id=application.id, candidate_name=f'{user.first_name} {user.last_name}' if user else 'Unknown', candidate_email=user.email if user else '', session_id=session.session_id, session_status=session.status, relevance_score=analysis.final_score or analysis.initial_score if analysis else 0, recommendation=_get_recommendation_from_score(analysis.final_score or analysis.initial_score if analysis else 0), summary=analysis.summary if analysis else 'Анализ не завершен', strengths=json.loads(analysis.strengths) if analysis and analysis.strengths else [], concerns=json.loads(analysis.weaknesses) if analysis and analysis.weaknesses else [], chat_messages=[{'type': msg.message_type.value if hasattr(msg.message_type, 'value') else msg.message_type, 'content': msg.content, 'created_at': msg.created_at} for msg in messages], categories=[{'name': cat.category, 'status': cat.status, 'score': cat.score, 'details': cat.details} for cat in categories], applied_at=application.created_at, analyzed_at=session.completed_at or session.started_at)
+    user = await db.scalar(select(User).filter(User.id == application.user_id))
+    analysis = await db.scalar(select(CandidateAnalysis).filter(CandidateAnalysis.session_id == session_id))
+    messages = (await db.scalars(select(SmartBotMessage).filter(SmartBotMessage.session_id == session_id).order_by(SmartBotMessage.created_at))).all()
+    categories = (await db.scalars(select(AnalysisCategory).filter(AnalysisCategory.analysis_id == analysis.id))).all() if analysis else []
+    return _build_employer_view(application, session, analysis, user, messages, categories)
 
 @router.get('/employer/application-analysis/{application_id}', response_model=EmployerAnalysisView)
-async def get_application_analysis(application_id: int, db: Session=Depends(get_db), current_user: User=Depends(get_current_active_user)):
-    application = db.query(JobApplication).filter(JobApplication.id == application_id).first()
+async def get_application_analysis(application_id: int, db: AsyncSession=Depends(get_async_db), current_user: Principal=Depends(get_current_active_user)):
+    application = await db.scalar(select(JobApplication).filter(JobApplication.id == application_id))
     if not application:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Application not found')
-    job = db.query(Job).filter(Job.id == application.job_id, Job.employer_id == current_user.id).first()
+    job = await db.scalar(select(Job).filter(Job.id == application.job_id, Job.employer_id == current_user.id))
     if not job:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Access denied')
-    session = db.query(SmartBotSession).filter(SmartBotSession.application_id == application_id).first()
+    session = await db.scalar(select(SmartBotSession).filter(SmartBotSession.application_id == application_id))
     if not session:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Analysis not found for this application')
-    user = db.query(User).filter(User.id == application.user_id).first()
-    analysis = db.query(CandidateAnalysis).filter(CandidateAnalysis.session_id == session.session_id).first()
-    messages = db.query(SmartBotMessage).filter(SmartBotMessage.session_id == session.session_id).order_by(SmartBotMessage.created_at).all()
-    categories = db.query(AnalysisCategory).filter(AnalysisCategory.analysis_id == analysis.id).all() if analysis else []
-    return EmployerAnalysisView(application_id=application.id, candidate_name=user.full_name if user else 'Unknown', candidate_email=user.email if user else None, session_id=session.session_id, session_status=session.status, relevance_score=analysis.final_score if analysis else None, recommendation=_get_recommendation_from_score(analysis.final_score) if analysis and analysis.final_score else None, summary=analysis.summary if analysis else None, strengths=json.loads(analysis.strengths) if analysis and analysis.strengths else [], concerns=json.loads(analysis.weaknesses) if analysis and analysis.weaknesses else [], chat_messages=[{'id': msg.id, 'role': msg.message_type, 'content': msg.content, 'created_at': msg.created_at.isoformat()} for msg in messages], categories=[{'name': cat.category, 'score': cat.score, 'details': cat.details} for cat in categories], applied_at=application.created_at, analyzed_at=session.completed_at or session.started_at)
+    user = await db.scalar(select(User).filter(User.id == application.user_id))
+    analysis = await db.scalar(select(CandidateAnalysis).filter(CandidateAnalysis.session_id == session.session_id))
+    messages = (await db.scalars(select(SmartBotMessage).filter(SmartBotMessage.session_id == session.session_id).order_by(SmartBotMessage.created_at))).all()
+    categories = (await db.scalars(select(AnalysisCategory).filter(AnalysisCategory.analysis_id == analysis.id))).all() if analysis else []
+    return EmployerAnalysisView(application_id=application.id, candidate_name=user.full_name if user else 'Unknown', candidate_email=user.email if user else None, session_id=session.session_id, session_status=session.status, relevance_score=analysis.final_score if analysis else None, recommendation=_get_recommendation_from_score(analysis.final_score) if analysis and analysis.final_score else None, summary=analysis.summary if analysis else None, strengths=_json_list(analysis.strengths) if analysis else [], concerns=_json_list(analysis.weaknesses) if analysis else [], chat_messages=[{'id': msg.id, 'role': msg.message_type, 'content': msg.content, 'created_at': msg.created_at.isoformat()} for msg in messages], categories=[{'name': cat.category, 'score': cat.score, 'details': cat.details} for cat in categories], applied_at=application.created_at, analyzed_at=session.completed_at or session.started_at)
+
+def _build_employer_view(application: JobApplication, session: SmartBotSession, analysis: Optional[CandidateAnalysis], user: Optional[User], messages: List[SmartBotMessage], categories: List[AnalysisCategory]) -> EmployerAnalysisView:
+    score = analysis.final_score or analysis.initial_score if analysis else 0
+    return EmployerAnalysisView(application_id=application.id, candidate_name=user.full_name if user else 'Unknown', candidate_email=user.email if user else '', session_id=session.session_id, session_status=session.status, relevance_score=score, recommendation=_get_recommendation_from_score(score or 0), summary=analysis.summary if analysis else 'Анализ не завершен', strengths=_json_list(analysis.strengths) if analysis else [], concerns=_json_list(analysis.weaknesses) if analysis else [], chat_messages=[{'type': msg.message_type.value if hasattr(msg.message_type, 'value') else msg.message_type, 'content': msg.content, 'created_at': msg.created_at} for msg in messages], categories=[{'name': cat.category, 'status': cat.status, 'score': cat.score, 'details': cat.details} for cat in categories], applied_at=application.created_at, analyzed_at=session.completed_at or session.started_at)
 
 def _get_recommendation_from_score(score: int) -> str:
     if score >= 80:
@@ -147,78 +213,76 @@ def _get_recommendation_from_score(score: int) -> str:
     else:
         return 'reject'
 
-@router.websocket('/employer/ws/jobs/{job_id}')
-async def employer_jobs_ws(websocket: WebSocket, job_id: int, db: Session=Depends(get_db)):
-    await websocket.accept()
+async def _ws_principal(db: AsyncSession, payload: dict) -> Optional[Principal]:
+    email = payload.get('sub')
+    cached = cached_principal(email)
+    if cached is not None:
+        return cached
+    principal = principal_from_payload(payload)
+    if principal is not None:
+        user = await db.get(User, principal.id)
+        if user is not None and user.email != email:
+            user = None
+    else:
+        user = await db.scalar(select(User).filter(User.email == email))
+    return remember_principal(user) if user else None
+
+def _ws_token(websocket: WebSocket) -> Optional[str]:
     auth_header = websocket.headers.get('authorization')
-    token = None
     if auth_header and auth_header.lower().startswith('bearer '):
-        token = auth_header.split(' ', 1)[1].strip()
-    if not token:
-        token = websocket.query_params.get('token')
+        return auth_header.split(' ', 1)[1].strip()
+    return websocket.query_params.get('token')
+
+async def _ws_reject(websocket: WebSocket, message: str) -> None:
+    await websocket.send_json({'event': 'error', 'message': message})
+    await websocket.close(code=1008)
+
+async def _authorize_job_ws(token: Optional[str], job_id: int) -> Optional[str]:
     payload = verify_token(token) if token else None
     if not payload:
-        await websocket.send_json({'event': 'error', 'message': 'Unauthorized'})
-        await websocket.close(code=1008)
-        return
-    email = payload.get('sub')
-    user = db.query(User).filter(User.email == email).first()
-    if not user or user.user_type != UserType.EMPLOYER:
-        await websocket.send_json({'event': 'error', 'message': 'Forbidden'})
-        await websocket.close(code=1008)
-        return
-    job = db.query(Job).filter(Job.id == job_id).first()
-    if not job or job.employer_id != user.id:
-        await websocket.send_json({'event': 'error', 'message': 'Job not found or not owned'})
-        await websocket.close(code=1008)
-        return
-    await ws_manager.connect_job(job_id, websocket)
-    await websocket.send_json({'event': 'subscribed', 'job_id': job_id})
-    try:
-        while True:
-            await asyncio.sleep(60)
-    except WebSocketDisconnect:
-        await ws_manager.disconnect_job(job_id, websocket)
+        return 'Unauthorized'
+    async with AsyncSessionLocal() as db:
+        user = await _ws_principal(db, payload)
+        if not user or not user.is_active or user.user_type != UserType.EMPLOYER:
+            return 'Forbidden'
+        employer_id = await db.scalar(select(Job.employer_id).filter(Job.id == job_id))
+    if employer_id is None or employer_id != user.id:
+        return 'Job not found or not owned'
+    return None
 
-@router.websocket('/employer/ws/sessions/{session_id}')
-async def employer_session_ws(websocket: WebSocket, session_id: str, db: Session=Depends(get_db)):
-    await websocket.accept()
-    auth_header = websocket.headers.get('authorization')
-    token = None
-    if auth_header and auth_header.lower().startswith('bearer '):
-        token = auth_header.split(' ', 1)[1].strip()
-    if not token:
-        token = websocket.query_params.get('token')
+async def _authorize_session_ws(token: Optional[str], session_id: str) -> Optional[str]:
     payload = verify_token(token) if token else None
     if not payload:
-        await websocket.send_json({'event': 'error', 'message': 'Unauthorized'})
-        await websocket.close(code=1008)
-        return
-    email = payload.get('sub')
-    user = db.query(User).filter(User.email == email).first()
-    if not user or user.user_type != UserType.EMPLOYER:
-        await websocket.send_json({'event': 'error', 'message': 'Forbidden'})
-        await websocket.close(code=1008)
-        return
-    session = db.query(SmartBotSession).filter(SmartBotSession.session_id == session_id).first()
-    if not session:
-        await websocket.send_json({'event': 'error', 'message': 'Session not found'})
-        await websocket.close(code=1008)
-        return
-    application = db.query(JobApplication).filter(JobApplication.id == session.application_id).first()
-    if not application:
-        await websocket.send_json({'event': 'error', 'message': 'Application not found'})
-        await websocket.close(code=1008)
+        return 'Unauthorized'
+    async with AsyncSessionLocal() as db:
+        user = await _ws_principal(db, payload)
+        if not user or not user.is_active or user.user_type != UserType.EMPLOYER:
+            return 'Forbidden'
+        row = (await db.execute(select(SmartBotSession.id, JobApplication.id, Job.employer_id).select_from(SmartBotSession).outerjoin(JobApplication, JobApplication.id == SmartBotSession.application_id).outerjoin(Job, Job.id == JobApplication.job_id).filter(SmartBotSession.session_id == session_id))).first()
+    if row is None:
+        return 'Session not found'
+    if row[1] is None:
+        return 'Application not found'
+    if row[2] != user.id:
+        return 'Forbidden'
+    return None
+
+@router.websocket('/employer/ws/jobs/{job_id}')
+async def employer_jobs_ws(websocket: WebSocket, job_id: int, since: Optional[int]=Query(None, ge=0), epoch: Optional[str]=Query(None)):
+    await websocket.accept()
+    error = await _authorize_job_ws(_ws_token(websocket), job_id)
+    if error:
+        await _ws_reject(websocket, error)
         return
-    job = db.query(Job).filter(Job.id == application.job_id).first()
-    if not job or job.employer_id != user.id:
-        await websocket.send_json({'event': 'error', 'message': 'Forbidden'})
-        await websocket.close(code=1008)
+    conn = await ws_manager.connect_job(job_id, websocket, since=since, epoch=epoch)
+    await ws_manager.serve(conn)
+
+@router.websocket('/employer/ws/sessions/{session_id}')
+async def employer_session_ws(websocket: WebSocket, session_id: str, since: Optional[int]=Query(None, ge=0), epoch: Optional[str]=Query(None)):
+    await websocket.accept()
+    error = await _authorize_session_ws(_ws_token(websocket), session_id)
+    if error:
+        await _ws_reject(websocket, error)
         return
-    await ws_manager.connect_session(session_id, websocket)
-    await websocket.send_json({'event': 'subscribed', 'session_id': session_id})
-    try:
-        while True:
-            await asyncio.sleep(60)
-    except WebSocketDisconnect:
-        await ws_manager.disconnect_session(session_id, websocket)
+    conn = await ws_manager.connect_session(session_id, websocket, since=since, epoch=epoch)
+    await ws_manager.serve(conn)
\ No newline at end of file
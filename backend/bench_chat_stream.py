@@ -0,0 +1,39 @@
+import sys
+import time
+import asyncio
+from bench_llm_client import serve_stub
+from services.llm_client import LLMClient
+from services.llm_gateway import LLMGateway
+from core.metrics import metrics
+MESSAGES = [{'role': 'user', 'content': 'Как подготовиться к собеседованию?'}]
+
+async def blocking_turn(gateway: LLMGateway) -> float:
+    started = time.perf_counter()
+    await gateway.chat(messages=MESSAGES, model='stub', max_tokens=500, temperature=0.7)
+    return time.perf_counter() - started
+
+async def streaming_turn(gateway: LLMGateway) -> float:
+    started = time.perf_counter()
+    first = None
+    async for _ in gateway.stream(messages=MESSAGES, model='stub', max_tokens=500, temperature=0.7):
+        if first is None:
+            first = time.perf_counter() - started
+    return first
+
+async def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    port = 8767
+    server = await serve_stub(port, latency)
+    client = LLMClient(api_key='stub', base_url=f'http://127.0.0.1:{port}/v1')
+    gateway = LLMGateway(client, max_in_flight=turns)
+    print(f'{turns} concurrent chat turns, stub generation takes {latency * 1000:.0f}ms')
+    for (name, turn) in (('blocking', blocking_turn), ('streaming', streaming_turn)):
+        waits = sorted(await asyncio.gather(*[turn(gateway) for _ in range(turns)]))
+        print(f'{name:>10} | first visible text p50={waits[len(waits) // 2] * 1000:.0f}ms max={waits[-1] * 1000:.0f}ms')
+    print('llm_time_to_first_token_seconds', metrics.snapshot()['histograms'].get('llm_time_to_first_token_seconds{model=stub}'))
+    await client.aclose()
+    server.should_exit = True
+    await asyncio.sleep(0.2)
+if __name__ == '__main__':
+    asyncio.run(main())
\ No newline at end of file
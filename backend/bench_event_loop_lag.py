@@ -0,0 +1,49 @@
+import sys
+import time
+import asyncio
+import statistics
+from sqlalchemy import text
+from core.db import SessionLocal, AsyncSessionLocal
+
+async def monitor_lag(stop_event: asyncio.Event, samples: list, interval: float=0.01):
+    loop = asyncio.get_running_loop()
+    while not stop_event.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append((loop.time() - start - interval) * 1000)
+
+async def sync_chat_turn(query_seconds: float):
+    db = SessionLocal()
+    try:
+        db.execute(text('SELECT pg_sleep(:s)'), {'s': query_seconds})
+        db.commit()
+    finally:
+        db.close()
+
+async def async_chat_turn(query_seconds: float):
+    async with AsyncSessionLocal() as db:
+        await db.execute(text('SELECT pg_sleep(:s)'), {'s': query_seconds})
+        await db.commit()
+
+async def run(mode: str, concurrency: int, query_seconds: float):
+    samples: list = []
+    stop_event = asyncio.Event()
+    monitor = asyncio.create_task(monitor_lag(stop_event, samples))
+    turn = sync_chat_turn if mode == 'sync' else async_chat_turn
+    started = time.perf_counter()
+    await asyncio.gather(*[turn(query_seconds) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    stop_event.set()
+    await monitor
+    samples.sort()
+    p99 = samples[int(len(samples) * 0.99) - 1] if samples else 0.0
+    print(f"{mode:>5} | concurrency={concurrency:<4} | wall={elapsed:.2f}s | lag mean={(statistics.mean(samples) if samples else 0):.1f}ms p99={p99:.1f}ms max={(max(samples) if samples else 0):.1f}ms")
+
+async def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    query_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    print(f'Event-loop lag under {concurrency} concurrent chat turns, {query_seconds * 1000:.0f}ms query each')
+    await run('sync', concurrency, query_seconds)
+    await run('async', concurrency, query_seconds)
+if __name__ == '__main__':
+    asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,45 @@
+import sys
+import time
+from sqlalchemy import text
+from core.db import engine
+from models.jobs import JOB_SEARCH_VECTOR_SQL
+TITLES = ['Python разработчик', 'Senior Backend Engineer', 'Data Analyst', 'Frontend React developer', 'Бухгалтер', 'Менеджер по продажам', 'DevOps инженер', 'QA Automation', 'Product Manager', 'UX/UI дизайнер']
+COMPANIES = ['ТехКорп ТОО', 'Kaspi Tech', 'Дизайн Студия Креатив', 'Halyk Digital', 'Стартап Хаб Алматы', 'Finance Group Capital']
+QUERIES = ['python', 'разработчик', 'react developer', 'продажам', 'Kaspi']
+
+def seed(conn, rows: int) -> None:
+    conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    conn.execute(text('DROP TABLE IF EXISTS jobs_search_bench'))
+    conn.execute(text(f"CREATE TABLE jobs_search_bench (id SERIAL PRIMARY KEY, title VARCHAR(255) NOT NULL, description TEXT NOT NULL, company_name VARCHAR(255) NOT NULL, is_active BOOLEAN DEFAULT TRUE, created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(), search_vector tsvector GENERATED ALWAYS AS ({JOB_SEARCH_VECTOR_SQL}) STORED)"))
+    titles = 'ARRAY[' + ','.join((f"'{t}'" for t in TITLES)) + ']'
+    companies = 'ARRAY[' + ','.join((f"'{c}'" for c in COMPANIES)) + ']'
+    conn.execute(text(f"INSERT INTO jobs_search_bench (title, description, company_name, created_at) SELECT ({titles})[1 + g % {len(TITLES)}] || ' #' || g, repeat('Описание вакансии: опыт работы, командная работа, английский язык, SQL, Docker. ', 8) || md5(g::text), ({companies})[1 + g % {len(COMPANIES)}], NOW() - (g || ' minutes')::interval FROM generate_series(1, :rows) AS g"), {'rows': rows})
+    conn.execute(text('CREATE INDEX ON jobs_search_bench USING GIN (search_vector)'))
+    conn.execute(text('CREATE INDEX ON jobs_search_bench USING GIN (company_name gin_trgm_ops)'))
+    conn.execute(text('ANALYZE jobs_search_bench'))
+
+def timed(conn, sql: str, params: dict, repeat: int=5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(text(sql), params).fetchall()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    with engine.begin() as conn:
+        print(f'Seeding jobs_search_bench with {rows} rows...')
+        seed(conn, rows)
+    ilike_sql = "SELECT id FROM jobs_search_bench WHERE is_active AND (title ILIKE :pattern OR description ILIKE :pattern OR company_name ILIKE :pattern) ORDER BY created_at DESC LIMIT 10"
+    fts_sql = "WITH q AS (SELECT websearch_to_tsquery('russian', :search) || websearch_to_tsquery('english', :search) AS query) SELECT id FROM jobs_search_bench, q WHERE is_active AND (search_vector @@ q.query OR company_name %> :search) ORDER BY ts_rank(search_vector, q.query) + word_similarity(:search, company_name) DESC, created_at DESC LIMIT 10"
+    with engine.connect() as conn:
+        print(f"{'query':<20} {'ILIKE ms':>10} {'FTS ms':>10}")
+        for search in QUERIES:
+            ilike_ms = timed(conn, ilike_sql, {'pattern': f'%{search}%'})
+            fts_ms = timed(conn, fts_sql, {'search': search})
+            print(f'{search:<20} {ilike_ms:>10.1f} {fts_ms:>10.1f}')
+    with engine.begin() as conn:
+        conn.execute(text('DROP TABLE IF EXISTS jobs_search_bench'))
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,91 @@
+import sys
+import json
+import time
+import asyncio
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from services.llm_client import LLMClient
+from core.metrics import metrics
+
+def stub_app(latency: float, max_concurrency: int=0, tokens: int=40) -> FastAPI:
+    app = FastAPI()
+
+    async def stream_chunks(model: str):
+        for i in range(tokens):
+            await asyncio.sleep(latency / tokens)
+            chunk = {'id': 'stub', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model, 'choices': [{'index': 0, 'delta': {'content': f'tok{i} '}, 'finish_reason': None}]}
+            yield f'data: {json.dumps(chunk)}\n\n'
+        yield 'data: [DONE]\n\n'
+    app.state.stats = {'requests': 0, 'rejected': 0, 'in_flight': 0}
+
+    @app.post('/v1/chat/completions')
+    async def completions(body: dict):
+        stats = app.state.stats
+        stats['requests'] += 1
+        if max_concurrency and stats['in_flight'] >= max_concurrency:
+            stats['rejected'] += 1
+            return JSONResponse({'error': {'message': 'Rate limit reached', 'type': 'rate_limit_error'}}, status_code=429)
+        if body.get('stream'):
+            return StreamingResponse(stream_chunks(body.get('model', 'stub')), media_type='text/event-stream')
+        stats['in_flight'] += 1
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            stats['in_flight'] -= 1
+        return {'id': 'stub', 'object': 'chat.completion', 'created': int(time.time()), 'model': body.get('model', 'stub'), 'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': '{"initial_score": 70}'}, 'finish_reason': 'stop'}], 'usage': {'prompt_tokens': 10, 'completion_tokens': 5, 'total_tokens': 15}}
+    return app
+
+async def serve_stub(port: int, latency: float, max_concurrency: int=0) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(stub_app(latency, max_concurrency), host='127.0.0.1', port=port, log_level='warning', access_log=False))
+    asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    return server
+
+async def call(client: LLMClient) -> None:
+    await client.chat(messages=[{'role': 'user', 'content': 'ping'}], model='stub', max_tokens=10, temperature=0)
+
+async def per_call_clients(base_url: str, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            client = LLMClient(api_key='stub', base_url=base_url)
+            try:
+                await call(client)
+            finally:
+                await client.aclose()
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(requests)])
+    return time.perf_counter() - started
+
+async def shared_client(base_url: str, requests: int, concurrency: int) -> float:
+    client = LLMClient(api_key='stub', base_url=base_url, max_connections=concurrency, max_keepalive_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await call(client)
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(requests)])
+    elapsed = time.perf_counter() - started
+    await client.aclose()
+    return elapsed
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.01
+    port = 8765
+    server = await serve_stub(port, latency)
+    base_url = f'http://127.0.0.1:{port}/v1'
+    print(f'{requests} completions against a local stub ({latency * 1000:.0f}ms), concurrency={concurrency}')
+    for (name, runner) in (('client per call', per_call_clients), ('shared client', shared_client)):
+        elapsed = await runner(base_url, requests, concurrency)
+        print(f'{name:>16} | {requests / elapsed:>8.1f} req/s | wall={elapsed:.2f}s')
+    print(f"clients created: {metrics.snapshot()['counters'].get('llm_clients_created_total')}")
+    server.should_exit = True
+    await asyncio.sleep(0.2)
+if __name__ == '__main__':
+    asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,49 @@
+import sys
+import time
+import asyncio
+from bench_llm_client import serve_stub
+from services.llm_client import LLMClient
+from services.llm_gateway import LLMGateway, LLMUnavailableError
+
+async def naive_call(client: LLMClient) -> bool:
+    for attempt in range(3):
+        try:
+            await client.chat(messages=[{'role': 'user', 'content': 'analyze'}], model='stub', max_tokens=100, temperature=0)
+            return True
+        except Exception:
+            if attempt < 2:
+                await asyncio.sleep(0.05 * 2 ** attempt)
+    return False
+
+async def gateway_call(gateway: LLMGateway) -> bool:
+    try:
+        await gateway.chat(messages=[{'role': 'user', 'content': 'analyze'}], model='stub', max_tokens=100, temperature=0)
+        return True
+    except LLMUnavailableError:
+        return False
+
+async def run(name: str, server, calls) -> None:
+    stats = server.config.app.state.stats
+    stats.update(requests=0, rejected=0)
+    started = time.perf_counter()
+    results = await asyncio.gather(*calls)
+    elapsed = time.perf_counter() - started
+    print(f'{name:>8} | ok={sum(results):<5} failed={len(results) - sum(results):<5} | upstream requests={stats["requests"]:<6} 429s={stats["rejected"]:<6} | wall={elapsed:.2f}s')
+
+async def main():
+    burst = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    provider_limit = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    port = 8766
+    server = await serve_stub(port, latency, max_concurrency=provider_limit)
+    base_url = f'http://127.0.0.1:{port}/v1'
+    print(f'burst of {burst} analyses against a stub that allows {provider_limit} concurrent requests ({latency * 1000:.0f}ms each)')
+    client = LLMClient(api_key='stub', base_url=base_url, max_connections=burst, max_keepalive_connections=burst)
+    await run('naive', server, [naive_call(client) for _ in range(burst)])
+    gateway = LLMGateway(client, max_in_flight=provider_limit, max_retries=3, backoff_base=0.05, backoff_max=1, queue_timeout=60)
+    await run('gateway', server, [gateway_call(gateway) for _ in range(burst)])
+    await client.aclose()
+    server.should_exit = True
+    await asyncio.sleep(0.2)
+if __name__ == '__main__':
+    asyncio.run(main())
\ No newline at end of file
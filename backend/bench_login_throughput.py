@@ -0,0 +1,39 @@
+import sys
+import time
+import asyncio
+from core.security import pwd_context, verify_password_async, PasswordHasherBusy
+from core.config import settings
+LEVELS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+async def run_level(concurrency: int, hashed: str, duration: float):
+    latencies = []
+    rejected = 0
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        nonlocal rejected
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                await verify_password_async('correct horse battery staple', hashed)
+                latencies.append(time.perf_counter() - started)
+            except PasswordHasherBusy:
+                rejected += 1
+                await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000 if latencies else 0.0
+    print(f'{concurrency:>11} | {len(latencies) / elapsed:>10.1f} | {p50:>8.1f} | {p99:>8.1f} | {rejected:>8}')
+
+async def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    hashed = pwd_context.hash('correct horse battery staple')
+    print(f'bcrypt rounds={settings.bcrypt_rounds}, workers={settings.password_hash_workers}, max pending={settings.password_hash_max_pending}')
+    print(f"{'concurrency':>11} | {'logins/s':>10} | {'p50 ms':>8} | {'p99 ms':>8} | {'rejected':>8}")
+    for level in LEVELS:
+        await run_level(level, hashed, duration)
+if __name__ == '__main__':
+    asyncio.run(main())
\ No newline at end of file
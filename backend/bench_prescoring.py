@@ -0,0 +1,28 @@
+import sys
+import time
+from types import SimpleNamespace
+from services.prescoring import PrescoringEngine, TfidfIndex
+JOB = SimpleNamespace(title='Senior Python разработчик', description='Разработка backend сервисов на Django и FastAPI, PostgreSQL, Docker, CI/CD. Высшее техническое образование.', requirements='Python, Django, Docker, Kubernetes, английский язык', location='Алматы', employment_type='full_time', experience_level='senior', salary_max=900000, company_name='Kaspi Tech')
+SKILLS = ['Python, Django, PostgreSQL, Docker', 'Java, Spring, SQL', 'React, TypeScript, HTML, CSS', '1С, Excel, МСФО', 'Python, FastAPI, Kubernetes, English', 'Продажи B2B, CRM']
+CITIES = ['Алматы', 'Астана', 'Шымкент']
+
+def resumes(count: int):
+    return [SimpleNamespace(title='Кандидат', desired_position='Разработчик', skills=SKILLS[i % len(SKILLS)], experience=f'{i % 9} лет опыта работы в компаниях', education='КазНУ' if i % 3 else '', summary='Ответственный, быстро обучаюсь, командная работа.', location=CITIES[i % len(CITIES)], desired_salary=500000 + i % 7 * 100000) for i in range(count)]
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    batch = resumes(count)
+    engine = PrescoringEngine(borderline_min=45, borderline_max=80, refit_interval=3600, corpus_limit=5000)
+    engine.index = TfidfIndex().fit([JOB.description] * 100)
+    started = time.perf_counter()
+    for resume in batch[:500]:
+        engine.score(JOB, resume)
+    single = (time.perf_counter() - started) / 500
+    started = time.perf_counter()
+    results = engine.score_many(JOB, batch)
+    bulk = (time.perf_counter() - started) / count
+    borderline = sum((1 for r in results if engine.is_borderline(r['initial_score'])))
+    print(f'single: {single * 1000:.3f} ms/candidate, batch of {count}: {bulk * 1000:.3f} ms/candidate')
+    print(f'borderline (sent to LLM): {borderline}/{count} ({borderline / count:.0%})')
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,68 @@
+import sys
+import time
+import asyncio
+from services.ws_manager import WSManager
+from core.metrics import metrics
+
+class FakeWebSocket:
+
+    def __init__(self, delay: float, received: list) -> None:
+        self.delay = delay
+        self.received = received
+
+    async def send_text(self, data: str) -> None:
+        await asyncio.sleep(self.delay)
+        self.received.append(time.perf_counter())
+
+    async def send_json(self, data: dict) -> None:
+        await self.send_text(str(data))
+
+    async def close(self, code: int=1000) -> None:
+        pass
+
+def build_clients(subscribers: int, slow: int, slow_delay: float, received: list) -> list:
+    return [FakeWebSocket(slow_delay if i < slow else 0, received) for i in range(subscribers)]
+
+async def sequential(clients: list, received: list, events: int) -> None:
+    started = time.perf_counter()
+    for n in range(events):
+        for ws in clients:
+            await ws.send_json({'event': 'application_created', 'n': n})
+    report('sequential', started, received, len(clients) * events)
+
+async def queued(clients: list, received: list, events: int, send_timeout: float) -> None:
+    manager = WSManager(queue_size=64, send_timeout=send_timeout)
+    for ws in clients:
+        await manager.connect_job(1, ws)
+    started = time.perf_counter()
+    for n in range(events):
+        await manager.deliver('job', 1, {'event': 'application_created', 'n': n})
+    enqueued = time.perf_counter() - started
+    expected = len(manager.job_connections.get(1, {})) * events
+    while len(received) < expected:
+        await asyncio.sleep(0.001)
+        expected = len(manager.job_connections.get(1, {})) * events
+    report('per-connection', started, received, expected, f'enqueue={enqueued * 1000:.1f}ms')
+    for ws in list(manager.job_connections.get(1, {})):
+        await manager.disconnect_job(1, ws)
+
+def report(mode: str, started: float, received: list, expected: int, extra: str='') -> None:
+    latencies = sorted((t - started for t in received))
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000 if latencies else 0.0
+    print(f'{mode:>15} | delivered={len(received):<6} of {expected:<6} | p50={p50:.1f}ms p99={p99:.1f}ms {extra}')
+
+async def main():
+    subscribers = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    slow = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    slow_delay = float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+    events = 3
+    print(f'{subscribers} subscribers on one job, {slow} slow consumers ({slow_delay * 1000:.0f}ms per send), {events} events')
+    received: list = []
+    await sequential(build_clients(subscribers, slow, slow_delay, received), received, events)
+    received = []
+    await queued(build_clients(subscribers, slow, slow_delay, received), received, events, send_timeout=slow_delay / 2)
+    snapshot = metrics.snapshot()['counters']
+    print({k: v for (k, v) in snapshot.items() if k.startswith('ws_')})
+if __name__ == '__main__':
+    asyncio.run(main())
\ No newline at end of file
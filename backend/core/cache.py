@@ -0,0 +1,150 @@
+import json
+import time
+import fnmatch
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Tuple
+from .config import settings
+from .metrics import metrics
+
+class CacheBackend:
+
+    def __init__(self, name: str, default_ttl: float) -> None:
+        self.name = name
+        self.default_ttl = default_ttl
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[float]=None) -> None:
+        raise NotImplementedError
+
+    def delete(self, *keys: str) -> None:
+        raise NotImplementedError
+
+    def delete_prefix(self, prefix: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def _record(self, hit: bool) -> None:
+        metrics.inc('cache_hits_total' if hit else 'cache_misses_total', cache=self.name)
+
+class InMemoryCache(CacheBackend):
+
+    def __init__(self, name: str, max_entries: int=1024, default_ttl: float=30) -> None:
+        super().__init__(name, default_ttl)
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        self._record(entry is not None)
+        return entry[1] if entry is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float]=None) -> None:
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.default_ttl)
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            size = len(self._entries)
+        if evicted:
+            metrics.inc('cache_evictions_total', evicted, cache=self.name)
+        metrics.set_gauge('cache_entries', size, cache=self.name)
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+class LocalSharedClient:
+
+    def __init__(self) -> None:
+        self._data: Dict[str, Tuple[Optional[float], str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(name)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= time.time():
+                del self._data[name]
+                return None
+            return entry[1]
+
+    def set(self, name: str, value: str, ex: Optional[int]=None) -> bool:
+        with self._lock:
+            self._data[name] = (time.time() + ex if ex else None, value)
+        return True
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            return sum((1 for name in names if self._data.pop(name, None) is not None))
+
+    def scan_iter(self, match: str='*') -> Iterator[str]:
+        with self._lock:
+            keys = list(self._data)
+        return (key for key in keys if fnmatch.fnmatchcase(key, match))
+
+    def flushdb(self) -> bool:
+        with self._lock:
+            self._data.clear()
+        return True
+
+class SharedCache(CacheBackend):
+
+    def __init__(self, name: str, client: Any, default_ttl: float=30) -> None:
+        super().__init__(name, default_ttl)
+        self.client = client
+
+    def _key(self, key: str) -> str:
+        return f'{self.name}:{key}'
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(self._key(key))
+        self._record(raw is not None)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float]=None) -> None:
+        self.client.set(self._key(key), json.dumps(value, default=str), ex=max(1, int(ttl if ttl is not None else self.default_ttl)))
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self.client.delete(*[self._key(k) for k in keys])
+
+    def delete_prefix(self, prefix: str) -> None:
+        keys = list(self.client.scan_iter(match=self._key(prefix) + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def clear(self) -> None:
+        self.delete_prefix('')
+
+def build_cache(name: str, default_ttl: Optional[float]=None, max_entries: Optional[int]=None) -> CacheBackend:
+    ttl = default_ttl if default_ttl is not None else settings.cache_default_ttl
+    if settings.cache_backend == 'shared':
+        return SharedCache(name, shared_cache_client, default_ttl=ttl)
+    return InMemoryCache(name, max_entries=max_entries or settings.cache_max_entries, default_ttl=ttl)
+shared_cache_client: Any = LocalSharedClient()
\ No newline at end of file
@@ -1,14 +1,77 @@
-from sqlalchemy import create_engine
+import time
+from typing import Any, Dict
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
-engine = create_engine(settings.database_url, pool_pre_ping=True, echo=True)
+from .metrics import metrics
+ENGINE_PROFILES: Dict[str, Dict[str, Any]] = {'dev': {'echo': False, 'pool_size': 5, 'max_overflow': 10, 'pool_timeout': 30, 'pool_recycle': -1, 'statement_timeout_ms': None}, 'prod': {'echo': False, 'pool_size': 20, 'max_overflow': 10, 'pool_timeout': 5, 'pool_recycle': 1800, 'statement_timeout_ms': 15000}}
+
+def _async_database_url(url: str) -> str:
+    if url.startswith('postgresql+psycopg2://'):
+        return 'postgresql+asyncpg://' + url[len('postgresql+psycopg2://'):]
+    if url.startswith('postgresql://'):
+        return 'postgresql+asyncpg://' + url[len('postgresql://'):]
+    if url.startswith('sqlite://'):
+        return 'sqlite+aiosqlite://' + url[len('sqlite://'):]
+    return url
+
+def engine_profile() -> Dict[str, Any]:
+    profile = dict(ENGINE_PROFILES.get(settings.db_profile, ENGINE_PROFILES['dev']))
+    overrides = {'echo': settings.db_echo, 'pool_size': settings.db_pool_size, 'max_overflow': settings.db_max_overflow, 'pool_timeout': settings.db_pool_timeout, 'pool_recycle': settings.db_pool_recycle, 'statement_timeout_ms': settings.db_statement_timeout_ms}
+    profile.update({k: v for (k, v) in overrides.items() if v is not None})
+    return profile
+
+def _engine_kwargs(url: str, is_async: bool) -> Dict[str, Any]:
+    profile = engine_profile()
+    kwargs: Dict[str, Any] = {'echo': profile['echo'], 'pool_pre_ping': True}
+    if url.startswith('sqlite'):
+        return kwargs
+    if settings.db_pgbouncer:
+        kwargs['poolclass'] = NullPool
+        if is_async:
+            kwargs['connect_args'] = {'statement_cache_size': 0, 'prepared_statement_cache_size': 0}
+        return kwargs
+    kwargs.update(pool_size=profile['pool_size'], max_overflow=profile['max_overflow'], pool_timeout=profile['pool_timeout'], pool_recycle=profile['pool_recycle'])
+    if profile['statement_timeout_ms']:
+        if is_async:
+            kwargs['connect_args'] = {'server_settings': {'statement_timeout': str(profile['statement_timeout_ms'])}}
+        else:
+            kwargs['connect_args'] = {'options': f"-c statement_timeout={profile['statement_timeout_ms']}"}
+    return kwargs
+
+def _install_transaction_timeout(sync_engine) -> None:
+    timeout_ms = engine_profile()['statement_timeout_ms']
+    if not settings.db_pgbouncer or not timeout_ms:
+        return
+
+    @event.listens_for(sync_engine, 'begin')
+    def _set_local_statement_timeout(conn):
+        conn.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout_ms)}')
+ASYNC_DATABASE_URL = settings.async_database_url or _async_database_url(settings.database_url)
+engine = create_engine(settings.database_url, **_engine_kwargs(settings.database_url, is_async=False))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_kwargs(ASYNC_DATABASE_URL, is_async=True))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+_install_transaction_timeout(engine)
+_install_transaction_timeout(async_engine.sync_engine)
 Base = declarative_base()
 
 def get_db():
     db = SessionLocal()
     try:
+        started = time.perf_counter()
+        db.connection()
+        metrics.observe('db_pool_wait_seconds', time.perf_counter() - started, engine='sync')
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        started = time.perf_counter()
+        await db.connection()
+        metrics.observe('db_pool_wait_seconds', time.perf_counter() - started, engine='async')
+        yield db
\ No newline at end of file
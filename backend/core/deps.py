@@ -1,12 +1,54 @@
+from typing import Any, Dict, NamedTuple, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
+from .cache import build_cache
+from .config import settings
 from .db import get_db
 from .security import verify_token
-from models.users import User
+from models.users import User, UserType
 security = HTTPBearer()
+principal_cache = build_cache('principals', default_ttl=settings.principal_cache_ttl, max_entries=settings.principal_cache_max_entries)
 
-def get_current_user(credentials: HTTPAuthorizationCredentials=Depends(security), db: Session=Depends(get_db)) -> User:
+class Principal(NamedTuple):
+    id: int
+    email: str
+    user_type: UserType
+    full_name: Optional[str] = None
+    is_active: bool = True
+
+def principal_from_payload(payload: Dict[str, Any]) -> Optional[Principal]:
+    if payload.get('uid') is None or payload.get('typ') is None or payload.get('sub') is None:
+        return None
+    try:
+        return Principal(id=int(payload['uid']), email=payload['sub'], user_type=UserType(payload['typ']))
+    except (TypeError, ValueError):
+        return None
+
+def cached_principal(email: Optional[str]) -> Optional[Principal]:
+    snapshot = principal_cache.get(email) if email else None
+    if snapshot is None:
+        return None
+    return Principal(id=snapshot['id'], email=snapshot['email'], user_type=UserType(snapshot['user_type']), full_name=snapshot['full_name'], is_active=snapshot['is_active'])
+
+def remember_principal(user: User) -> Principal:
+    principal = Principal(id=user.id, email=user.email, user_type=UserType(user.user_type), full_name=user.full_name, is_active=bool(user.is_active))
+    principal_cache.set(user.email, {'id': principal.id, 'email': principal.email, 'user_type': principal.user_type.value, 'full_name': principal.full_name, 'is_active': principal.is_active})
+    return principal
+
+def invalidate_principal(email: Optional[str]) -> None:
+    if email:
+        principal_cache.delete(email)
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_principal_on_change(mapper, connection, target: User) -> None:
+    history = inspect(target).attrs.email.history
+    for email in list(history.deleted or []) + [target.email]:
+        invalidate_principal(email)
+
+def get_current_user(credentials: HTTPAuthorizationCredentials=Depends(security), db: Session=Depends(get_db)) -> Principal:
     token = credentials.credentials
     payload = verify_token(token)
     if payload is None:
@@ -14,12 +56,21 @@ def get_current_user(credentials: HTTPAuthorizationCredentials=Depends(security)
     email: str = payload.get('sub')
     if email is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid authentication credentials', headers={'WWW-Authenticate': 'Bearer'})
-    user = db.query(User).filter(User.email == email).first()
+    cached = cached_principal(email)
+    if cached is not None:
+        return cached
+    principal = principal_from_payload(payload)
+    if principal is not None:
+        user = db.get(User, principal.id)
+        if user is not None and user.email != email:
+            user = None
+    else:
+        user = db.query(User).filter(User.email == email).first()
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='User not found', headers={'WWW-Authenticate': 'Bearer'})
-    return user
+    return remember_principal(user)
 
-def get_current_active_user(current_user: User=Depends(get_current_user)) -> User:
+def get_current_active_user(current_user: Principal=Depends(get_current_user)) -> Principal:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail='Inactive user')
     return current_user
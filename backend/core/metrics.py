@@ -0,0 +1,67 @@
+import threading
+from collections import deque
+from typing import Any, Deque, Dict
+
+def _key(name: str, labels: Dict[str, Any]) -> str:
+    if not labels:
+        return name
+    return name + '{' + ','.join((f'{k}={labels[k]}' for k in sorted(labels))) + '}'
+
+class Histogram:
+
+    def __init__(self, reservoir_size: int=1024) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: Deque[float] = deque(maxlen=reservoir_size)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        self.samples.append(value)
+
+    def snapshot(self) -> Dict[str, float]:
+        ordered = sorted(self.samples)
+
+        def pct(p: float) -> float:
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+        return {'count': self.count, 'sum': round(self.total, 6), 'avg': round(self.total / self.count, 6) if self.count else 0.0, 'p50': pct(0.5), 'p95': pct(0.95), 'p99': pct(0.99), 'max': self.max}
+
+class MetricsRegistry:
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+
+    def inc(self, name: str, value: float=1, **labels: Any) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+
+    def add_gauge(self, name: str, delta: float, **labels: Any) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            self.gauges[key] = self.gauges.get(key, 0) + delta
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'counters': dict(self.counters), 'gauges': dict(self.gauges), 'histograms': {k: h.snapshot() for (k, h) in self.histograms.items()}}
+metrics = MetricsRegistry()
\ No newline at end of file
@@ -1,15 +1,72 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Callable, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from .config import settings
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+from .metrics import metrics
+pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto', bcrypt__default_rounds=settings.bcrypt_rounds, bcrypt__min_rounds=settings.bcrypt_rounds, bcrypt__max_rounds=settings.bcrypt_rounds)
+
+class PasswordHasherBusy(Exception):
+    pass
+
+class PasswordHasher:
+
+    def __init__(self, workers: int, max_pending: int) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def _release(self, _: Future) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            metrics.set_gauge('password_hash_queue_depth', self.in_flight)
+        self._slots.release()
+
+    def _timed(self, fn: Callable[..., Any], submitted: float, *args: Any) -> Any:
+        started = time.perf_counter()
+        metrics.observe('password_hash_wait_seconds', started - submitted)
+        try:
+            return fn(*args)
+        finally:
+            metrics.observe('password_hash_seconds', time.perf_counter() - started, op=fn.__name__)
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        if not self._slots.acquire(blocking=False):
+            metrics.inc('password_hash_rejected_total')
+            raise PasswordHasherBusy('Password hashing queue is full')
+        with self._lock:
+            self.in_flight += 1
+            metrics.set_gauge('password_hash_queue_depth', self.in_flight)
+        future = self._executor.submit(self._timed, fn, time.perf_counter(), *args)
+        future.add_done_callback(self._release)
+        return future
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.wrap_future(self.submit(fn, *args))
+password_hasher = PasswordHasher(workers=settings.password_hash_workers, max_pending=settings.password_hash_max_pending)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.run(pwd_context.verify, plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_hasher.run(pwd_context.hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.run_async(pwd_context.verify, plain_password, hashed_password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await password_hasher.run_async(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_hasher.run_async(pwd_context.hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta]=None):
     to_encode = data.copy()
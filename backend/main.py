@@ -1,8 +1,25 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from core.config import settings
+from core.metrics import metrics
 from api import auth, jobs, resumes, applications, chat, smartbot
-app = FastAPI(title='MyLink + SmartBot API', description='API for MyLink with AI-powered SmartBot assistant', version='1.0.0')
+from services.job_queue import job_queue
+from services.event_bus import event_bus
+from services.llm_client import llm_client
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await event_bus.start()
+    stop_event = asyncio.Event()
+    workers = [asyncio.create_task(job_queue.run_worker(worker_id=f'embedded-{i}', stop_event=stop_event)) for i in range(settings.analysis_queue_embedded_workers)]
+    yield
+    stop_event.set()
+    await asyncio.gather(*workers, return_exceptions=True)
+    await event_bus.stop()
+    await llm_client.aclose()
+app = FastAPI(title='MyLink + SmartBot API', description='API for MyLink with AI-powered SmartBot assistant', version='1.0.0', lifespan=lifespan)
 app.add_middleware(CORSMiddleware, allow_origins=['http://localhost:3000', 'http://localhost:5173', 'http://127.0.0.1:5173', 'http://localhost:5174', 'http://127.0.0.1:5174'], allow_credentials=True, allow_methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS', 'HEAD'], allow_headers=['*'], expose_headers=['*'])
 app.include_router(auth.router, prefix='/api')
 app.include_router(jobs.router, prefix='/api')
@@ -17,4 +34,8 @@ def read_root():
 
 @app.get('/health')
 def health_check():
-    return {'status': 'healthy'}
\ No newline at end of file
+    return {'status': 'healthy'}
+
+@app.get('/metrics')
+def get_metrics():
+    return metrics.snapshot()
\ No newline at end of file
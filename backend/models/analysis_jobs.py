@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+import enum
+from core.db import Base
+
+class AnalysisJobStatus(str, enum.Enum):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    DEAD = 'dead'
+
+class AnalysisJobKind(str, enum.Enum):
+    START_ANALYSIS = 'start_analysis'
+    REANALYZE_JOB = 'reanalyze_job'
+
+class AnalysisJob(Base):
+    __tablename__ = 'analysis_jobs'
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False)
+    payload = Column(JSONB, nullable=True)
+    status = Column(String(20), nullable=False, default=AnalysisJobStatus.QUEUED.value)
+    application_id = Column(Integer, ForeignKey('job_applications.id', ondelete='CASCADE'), nullable=True, index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    locked_by = Column(String(255), nullable=True)
+    last_error = Column(Text, nullable=True)
+    result = Column(JSONB, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
\ No newline at end of file
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, Float, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, Float, Boolean, Index
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from sqlalchemy.orm import relationship
 import enum
 from core.db import Base
@@ -14,12 +14,16 @@ class AIChatSession(Base):
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String(255), unique=True, nullable=False, index=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=True)
+    summary = Column(Text, nullable=True)
+    summary_through_id = Column(Integer, nullable=True)
+    messages_since_summary = Column(Integer, nullable=False, default=0, server_default='0')
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     messages = relationship('AIChatMessage', back_populates='session', cascade='all, delete-orphan')
 
 class AIChatMessage(Base):
     __tablename__ = 'ai_chat_messages'
+    __table_args__ = (Index('idx_ai_chat_messages_session_id_id', 'session_id', 'id'),)
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String(255), ForeignKey('ai_chat_sessions.session_id'), nullable=False)
     role = Column(Enum(MessageRole), nullable=False)
@@ -62,6 +66,7 @@ class SmartBotSession(Base):
 
 class SmartBotMessage(Base):
     __tablename__ = 'smartbot_messages'
+    __table_args__ = (Index('idx_smartbot_messages_session_created', 'session_id', 'created_at', 'id'), Index('idx_smartbot_messages_session_questions', 'session_id', 'created_at', 'id', postgresql_where=text("message_type = 'question'")))
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String(255), ForeignKey('smartbot_sessions.session_id'), nullable=False)
     message_type = Column(String(50), nullable=False)
@@ -94,6 +99,7 @@ class CandidateAnalysis(Base):
 
 class AnalysisCategory(Base):
     __tablename__ = 'analysis_categories'
+    __table_args__ = (Index('idx_analysis_categories_analysis_category', 'analysis_id', 'category'),)
     id = Column(Integer, primary_key=True, index=True)
     analysis_id = Column(Integer, ForeignKey('candidate_analyses.id'), nullable=False)
     category = Column(String(50), nullable=False)
@@ -1,7 +1,10 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Numeric
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Numeric, Computed
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from core.db import Base
+SEARCH_CONFIGS = ('russian', 'english')
+JOB_SEARCH_VECTOR_SQL = ' || '.join((f"setweight(to_tsvector('{config}', coalesce({column}, '')), '{weight}')" for (column, weight) in (('title', 'A'), ('company_name', 'B'), ('description', 'D')) for config in SEARCH_CONFIGS))
 
 class Job(Base):
     __tablename__ = 'jobs'
@@ -20,5 +23,6 @@ class Job(Base):
     employer_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    search_vector = deferred(Column(TSVECTOR, Computed(JOB_SEARCH_VECTOR_SQL, persisted=True)))
     employer = relationship('User', back_populates='jobs')
     applications = relationship('JobApplication', back_populates='job', cascade='all, delete-orphan')
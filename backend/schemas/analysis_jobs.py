@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from typing import Optional, Dict, Any
+from datetime import datetime
+from models.analysis_jobs import AnalysisJobStatus
+
+class AnalysisJobResponse(BaseModel):
+    id: int
+    kind: str
+    status: AnalysisJobStatus
+    application_id: Optional[int] = None
+    attempts: int
+    max_attempts: int
+    run_at: datetime
+    last_error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
\ No newline at end of file
@@ -55,6 +55,8 @@ class SmartBotSessionResponse(BaseModel):
     started_at: datetime
     completed_at: Optional[datetime] = None
     messages: List[SmartBotMessageResponse] = []
+    has_more: bool = False
+    next_before_id: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -42,6 +42,8 @@ class JobResponse(JobBase):
 
 class JobListResponse(BaseModel):
     jobs: List[JobResponse]
-    total: int
+    total: Optional[int] = None
+    total_is_approximate: bool = False
     page: int
     per_page: int
+    next_cursor: Optional[str] = None
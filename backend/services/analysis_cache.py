@@ -0,0 +1,63 @@
+import json
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from core.config import settings
+from core.db import AsyncSessionLocal
+from core.metrics import metrics
+from models.analysis_cache import AnalysisCacheEntry
+logger = logging.getLogger(__name__)
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return ' '.join(value.split())
+    if isinstance(value, dict):
+        return {k: _normalize(v) for (k, v) in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+class AnalysisCache:
+
+    def __init__(self, ttl: float, max_entries: int, evict_every: int=50) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self._puts = 0
+
+    def fingerprint(self, job_data: Dict[str, Any], candidate_data: Dict[str, Any], model: str, prompt_version: str) -> str:
+        material = json.dumps({'job': _normalize(job_data), 'candidate': _normalize(candidate_data), 'model': model, 'prompt_version': prompt_version}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    async def get(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        async with AsyncSessionLocal() as db:
+            result = await db.scalar(update(AnalysisCacheEntry).where(AnalysisCacheEntry.fingerprint == fingerprint, AnalysisCacheEntry.expires_at > func.now()).values(hit_count=AnalysisCacheEntry.hit_count + 1, last_hit_at=func.now()).returning(AnalysisCacheEntry.result))
+            await db.commit()
+        metrics.inc('cache_hits_total' if result is not None else 'cache_misses_total', cache='analysis')
+        return result
+
+    async def put(self, fingerprint: str, job_id: int, resume_id: int, model: str, prompt_version: str, result: Dict[str, Any]) -> None:
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+        values = {'fingerprint': fingerprint, 'job_id': job_id, 'resume_id': resume_id, 'model': model, 'prompt_version': prompt_version, 'result': result, 'hit_count': 0, 'expires_at': expires_at}
+        stmt = insert(AnalysisCacheEntry).values(**values)
+        async with AsyncSessionLocal() as db:
+            await db.execute(stmt.on_conflict_do_update(index_elements=[AnalysisCacheEntry.fingerprint], set_={'result': stmt.excluded.result, 'expires_at': stmt.excluded.expires_at, 'created_at': func.now(), 'last_hit_at': func.now(), 'hit_count': 0}))
+            await db.commit()
+        self._puts += 1
+        if self._puts % self.evict_every == 0:
+            await self.evict()
+
+    async def evict(self) -> int:
+        async with AsyncSessionLocal() as db:
+            expired = await db.execute(delete(AnalysisCacheEntry).where(AnalysisCacheEntry.expires_at <= func.now()))
+            keep = select(AnalysisCacheEntry.id).order_by(AnalysisCacheEntry.last_hit_at.desc(), AnalysisCacheEntry.id.desc()).limit(self.max_entries)
+            overflow = await db.execute(delete(AnalysisCacheEntry).where(AnalysisCacheEntry.id.not_in(keep.scalar_subquery())))
+            await db.commit()
+        evicted = (expired.rowcount or 0) + (overflow.rowcount or 0)
+        if evicted:
+            metrics.inc('cache_evictions_total', evicted, cache='analysis')
+        return evicted
+analysis_cache = AnalysisCache(ttl=settings.analysis_cache_ttl, max_entries=settings.analysis_cache_max_entries)
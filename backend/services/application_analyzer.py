@@ -2,40 +2,58 @@ import json
 import uuid
 import asyncio
 import logging
-from typing import List, Dict, Any, Optional, Tuple
-from sqlalchemy.orm import Session
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable
+from sqlalchemy import select, update, delete, insert, func, cast, literal, Text
+from sqlalchemy.dialects.postgresql import JSONB, ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
 from core.config import settings
+from core.db import AsyncSessionLocal
+from core.metrics import metrics
 from models.jobs import Job
 from models.resumes import Resume
 from models.users import User
 from models.applications import JobApplication
+from models.analysis_jobs import AnalysisJobKind
 from models.chat import SmartBotSession, SmartBotMessage, SmartBotSessionStatus, SmartBotMessageType, CandidateAnalysis, AnalysisCategory, AnalysisStatus
 from services.ws_manager import ws_manager
+from services.llm_client import llm_client
+from services.llm_gateway import LLMUnavailableError
+from services.model_router import model_router
+from services.prompt_budget import prompt_budget
+from services.analysis_cache import analysis_cache
+from services.prescoring import prescoring_engine
+from services.job_queue import job_queue
+from services.speculation import speculative_cache, state_key
+ANALYSIS_PROMPT_VERSION = 'v2'
+REPORT_SYSTEM_MESSAGE = {'role': 'system', 'content': 'Ты SmartBot - создаешь финальные отчеты для работодателей.'}
+CATEGORY_KEYWORDS = {'город': ('переезд', 'удален', 'релокац', 'город'), 'зарплата': ('зарплат', 'оклад', 'доход', 'ожидани'), 'опыт': ('опыт', 'стаж'), 'образование': ('образован', 'университет', 'вуз', 'диплом')}
+QUESTION_TEMPLATES = {'город': 'Вижу, что вы из другого города. Готовы ли вы рассмотреть переезд или удаленную работу?', 'опыт': 'Расскажите, пожалуйста, подробнее о вашем опыте работы: сколько лет и какие задачи вы решали?', 'навыки': '{issue}. Есть ли у вас опыт работы с этими технологиями, даже если он не указан в резюме?', 'зарплата': 'Ваши ожидания по зарплате выше вилки вакансии. Готовы ли вы обсудить условия?', 'образование': 'Пожалуйста, уточните уровень вашего образования и профиль, чтобы понять соответствие требованиям вакансии.', 'другое': 'Уточните, пожалуйста: {issue}'}
 
 class ApplicationAnalyzer:
 
-    def __init__(self):
-        self.openai_available = bool(settings.openai_api_key)
+    @property
+    def openai_available(self) -> bool:
+        return llm_client.available
 
-    async def start_analysis_session(self, db: Session, application: JobApplication) -> SmartBotSession:
+    async def start_analysis_session(self, db: AsyncSession, application: JobApplication) -> SmartBotSession:
         session = SmartBotSession(session_id=str(uuid.uuid4()), application_id=application.id, status=SmartBotSessionStatus.ACTIVE)
         db.add(session)
-        db.commit()
-        db.refresh(session)
-        job = db.query(Job).filter(Job.id == application.job_id).first()
-        resume = db.query(Resume).filter(Resume.id == application.resume_id).first()
-        user = db.query(User).filter(User.id == application.user_id).first()
+        await db.commit()
+        await db.refresh(session)
+        job = await db.get(Job, application.job_id)
+        resume = await db.get(Resume, application.resume_id)
+        user = await db.get(User, application.user_id)
         if not all([job, resume, user]):
             session.status = SmartBotSessionStatus.ERROR
-            db.commit()
+            await db.commit()
             raise ValueError('Missing required data for analysis')
         try:
-            analysis_result = await self._analyze_application(job, resume, user)
+            analysis_result = await self._analyze_application(db, job, resume, user)
             questions: List[Dict[str, Any]] = analysis_result.get('questions') or self._build_questions_from_discrepancies(analysis_result.get('discrepancies', []))
-            candidate_analysis = CandidateAnalysis(session_id=session.session_id, relevance_score=analysis_result.get('initial_score', 50), initial_score=analysis_result.get('initial_score', 50), strengths=json.dumps(analysis_result.get('strengths', []), ensure_ascii=False), weaknesses=json.dumps(analysis_result.get('concerns', []), ensure_ascii=False), clarifications_received=json.dumps({'items': []}, ensure_ascii=False), summary='Первичный анализ завершен', status=AnalysisStatus.IN_PROGRESS.value, questions_asked=1 if questions else 0, recommendation=analysis_result.get('recommendation'))
+            candidate_analysis = CandidateAnalysis(session_id=session.session_id, relevance_score=analysis_result.get('initial_score', 50), initial_score=analysis_result.get('initial_score', 50), strengths=analysis_result.get('strengths', []), weaknesses=analysis_result.get('concerns', []), clarifications_received={'items': []}, summary='Первичный анализ завершен', status=AnalysisStatus.IN_PROGRESS.value, questions_asked=1 if questions else 0, recommendation=analysis_result.get('recommendation'))
             db.add(candidate_analysis)
-            db.commit()
-            db.refresh(candidate_analysis)
+            await db.commit()
+            await db.refresh(candidate_analysis)
             for discrepancy in analysis_result.get('discrepancies', []):
                 category = AnalysisCategory(analysis_id=candidate_analysis.id, category=discrepancy.get('category', 'общее'), status='mismatch', score=self._calculate_category_score(discrepancy.get('severity', 'medium')), details=discrepancy.get('issue', ''))
                 db.add(category)
@@ -43,103 +61,86 @@ class ApplicationAnalyzer:
                 first_question = questions[0]
                 remaining_questions = questions[1:]
                 welcome_message = f"Спасибо за отклик на вакансию! Я SmartBot и помогу работодателю лучше понять ваш профиль. {first_question['question']}"
-                bot_message = SmartBotMessage(session_id=session.session_id, message_type=SmartBotMessageType.QUESTION.value, content=welcome_message, message_metadata=json.dumps({'question_category': first_question.get('category'), 'question_reason': first_question.get('reason'), 'remaining_questions': remaining_questions}, ensure_ascii=False))
+                bot_message = SmartBotMessage(session_id=session.session_id, message_type=SmartBotMessageType.QUESTION.value, content=welcome_message, message_metadata={'question_category': first_question.get('category'), 'question_reason': first_question.get('reason'), 'remaining_questions': remaining_questions})
                 db.add(bot_message)
             else:
+                remaining_questions = None
                 session.status = SmartBotSessionStatus.COMPLETED
                 welcome_message = 'Спасибо за отклик! Ваш профиль хорошо соответствует требованиям вакансии.'
                 bot_message = SmartBotMessage(session_id=session.session_id, message_type=SmartBotMessageType.INFO.value, content=welcome_message, message_metadata=None)
                 db.add(bot_message)
-            db.commit()
-            db.refresh(session)
+            await db.commit()
+            await db.refresh(session)
             try:
                 await ws_manager.broadcast_session(session.session_id, {'event': 'chat_message', 'session_id': session.session_id, 'message': {'role': 'bot', 'type': bot_message.message_type, 'content': bot_message.content}, 'session_status': session.status})
             except Exception as e:
                 logging.error(f'WS broadcast failed (initial message): {e}')
+            if remaining_questions is not None:
+                self._speculate(session.session_id, bot_message.id, candidate_analysis.initial_score, remaining_questions)
             return session
         except Exception as e:
             session.status = SmartBotSessionStatus.ERROR
-            db.commit()
+            await db.commit()
             raise e
 
-    async def process_candidate_response(self, db: Session, session_id: str, user_message: str) -> Dict[str, Any]:
-        session = db.query(SmartBotSession).filter(SmartBotSession.session_id == session_id).first()
+    async def process_candidate_response(self, db: AsyncSession, session_id: str, user_message: str) -> Dict[str, Any]:
+        session = await db.scalar(select(SmartBotSession).filter(SmartBotSession.session_id == session_id))
         if not session:
             raise ValueError('Session not found')
+        previous_id = await db.scalar(select(SmartBotMessage.id).filter(SmartBotMessage.session_id == session_id).order_by(SmartBotMessage.created_at.desc(), SmartBotMessage.id.desc()).limit(1))
         user_msg = SmartBotMessage(session_id=session_id, message_type=SmartBotMessageType.ANSWER.value, content=user_message, message_metadata=None)
         db.add(user_msg)
+        await db.flush()
         try:
             await ws_manager.broadcast_session(session_id, {'event': 'chat_message', 'session_id': session_id, 'message': {'role': 'candidate', 'type': user_msg.message_type, 'content': user_message}})
         except Exception as e:
             logging.error(f'WS broadcast failed (candidate message): {e}')
-        messages = db.query(SmartBotMessage).filter(SmartBotMessage.session_id == session_id).order_by(SmartBotMessage.created_at).all()
-        last_bot_message = None
-        for msg in reversed(messages):
-            if msg.message_type == SmartBotMessageType.QUESTION.value:
-                last_bot_message = msg
-                break
+        last_bot_message = await db.scalar(select(SmartBotMessage).filter(SmartBotMessage.session_id == session_id, SmartBotMessage.message_type == SmartBotMessageType.QUESTION.value).order_by(SmartBotMessage.created_at.desc(), SmartBotMessage.id.desc()).limit(1))
+        speculation_key = state_key([previous_id])
         remaining_questions = []
         metadata = {}
         if last_bot_message and last_bot_message.message_metadata:
-            try:
-                metadata = json.loads(last_bot_message.message_metadata)
-                remaining_questions = metadata.get('remaining_questions', [])
-            except Exception:
-                metadata = {}
-        analysis = db.query(CandidateAnalysis).filter(CandidateAnalysis.session_id == session_id).first()
-        if analysis:
-            items: List[Dict[str, Any]] = []
-            try:
-                clar_data = analysis.clarifications_received
-                if isinstance(clar_data, str):
-                    clar_obj = json.loads(clar_data)
-                else:
-                    clar_obj = clar_data or {}
-                if isinstance(clar_obj, dict):
-                    items = clar_obj.get('items', []) or []
-                elif isinstance(clar_obj, list):
-                    items = clar_obj
-            except Exception:
-                items = []
-            answer_entry = {'question_category': metadata.get('question_category'), 'question_reason': metadata.get('question_reason'), 'answer': user_message}
-            items.append(answer_entry)
-            analysis.clarifications_received = json.dumps({'items': items}, ensure_ascii=False)
-            analysis.questions_answered = (analysis.questions_answered or 0) + 1
-            if metadata.get('question_category'):
-                cat = db.query(AnalysisCategory).filter(AnalysisCategory.analysis_id == analysis.id, AnalysisCategory.category == metadata.get('question_category')).first()
-                if cat:
-                    cat.status = 'clarified'
-                    try:
-                        cat.details = (cat.details or '') + (' | Ответ кандидата: ' + user_message)
-                    except Exception:
-                        cat.details = cat.details or ''
+            metadata = self._json_value(last_bot_message.message_metadata, {})
+            remaining_questions = metadata.get('remaining_questions', []) or []
+        answer_entry = {'question_category': metadata.get('question_category'), 'question_reason': metadata.get('question_reason'), 'answer': user_message}
+        analysis = await db.scalar(update(CandidateAnalysis).where(CandidateAnalysis.session_id == session_id).values(clarifications_received=func.jsonb_set(func.coalesce(CandidateAnalysis.clarifications_received, cast({}, JSONB)), literal(['items'], ARRAY(Text)), func.coalesce(CandidateAnalysis.clarifications_received['items'], cast([], JSONB)).op('||')(func.jsonb_build_array(cast(answer_entry, JSONB)))), questions_answered=func.coalesce(CandidateAnalysis.questions_answered, 0) + 1).returning(CandidateAnalysis).execution_options(synchronize_session=False))
+        if analysis and metadata.get('question_category'):
+            await db.execute(update(AnalysisCategory).where(AnalysisCategory.analysis_id == analysis.id, AnalysisCategory.category == metadata.get('question_category')).values(status='clarified', details=func.coalesce(AnalysisCategory.details, '') + ' | Ответ кандидата: ' + user_message).execution_options(synchronize_session=False))
         if remaining_questions:
             next_question = remaining_questions[0]
             new_remaining = remaining_questions[1:]
-            bot_message = SmartBotMessage(session_id=session_id, message_type=SmartBotMessageType.QUESTION.value, content=next_question.get('question', 'Уточните, пожалуйста.'), message_metadata=json.dumps({'question_category': next_question.get('category'), 'question_reason': next_question.get('reason'), 'remaining_questions': new_remaining}, ensure_ascii=False))
+            rephrased = None
+            if self._answer_covers(user_message, next_question.get('category')):
+                speculative_cache.discard(session_id, 'rephrase', reason='answer')
+            else:
+                rephrase = speculative_cache.take(session_id, 'rephrase', speculation_key, ready_only=True)
+                rephrased = rephrase.result() if rephrase is not None else None
+            bot_message = SmartBotMessage(session_id=session_id, message_type=SmartBotMessageType.QUESTION.value, content=rephrased or next_question.get('question', 'Уточните, пожалуйста.'), message_metadata={'question_category': next_question.get('category'), 'question_reason': next_question.get('reason'), 'remaining_questions': new_remaining})
             db.add(bot_message)
             if analysis:
                 analysis.questions_asked = (analysis.questions_asked or 0) + 1
             session.status = SmartBotSessionStatus.ACTIVE
-            db.commit()
+            await db.commit()
             try:
                 await ws_manager.broadcast_session(session_id, {'event': 'chat_message', 'session_id': session_id, 'message': {'role': 'bot', 'type': bot_message.message_type, 'content': bot_message.content}, 'session_status': session.status})
             except Exception as e:
                 logging.error(f'WS broadcast failed (bot question): {e}')
+            self._speculate(session_id, bot_message.id, analysis.initial_score if analysis else None, new_remaining)
             return {'message': bot_message.content, 'session_status': session.status, 'is_completed': False}
-        final_analysis = await self._finalize_analysis(db, session_id)
+        final_analysis = await self._finalize_analysis(db, session_id, speculation_key, (last_bot_message.content if last_bot_message else '', user_message))
+        speculative_cache.discard(session_id, reason='completed')
         bot_response = 'Спасибо за ответы! Анализ завершен. Работодатель получит подробную информацию о вашем профиле.'
         bot_message = SmartBotMessage(session_id=session_id, message_type=SmartBotMessageType.COMPLETION.value, content=bot_response, message_metadata=None)
         db.add(bot_message)
         session.status = SmartBotSessionStatus.COMPLETED
-        analysis = db.query(CandidateAnalysis).filter(CandidateAnalysis.session_id == session_id).first()
+        analysis = await db.scalar(select(CandidateAnalysis).filter(CandidateAnalysis.session_id == session_id))
         if analysis:
             analysis.final_score = final_analysis.get('final_score', analysis.initial_score)
             analysis.summary = final_analysis.get('summary', 'Анализ завершен')
             analysis.status = AnalysisStatus.COMPLETED.value
             analysis.recommendation = final_analysis.get('recommendation', analysis.recommendation)
             analysis.analysis_completed = True
-        db.commit()
+        await db.commit()
         try:
             await ws_manager.broadcast_session(session_id, {'event': 'chat_message', 'session_id': session_id, 'message': {'role': 'bot', 'type': bot_message.message_type, 'content': bot_message.content}, 'session_status': session.status})
             await ws_manager.broadcast_session(session_id, {'event': 'session_completed', 'session_id': session_id, 'final': {'final_score': analysis.final_score if analysis else None, 'recommendation': analysis.recommendation if analysis else None, 'summary': analysis.summary if analysis else None}})
@@ -152,19 +153,160 @@ class ApplicationAnalyzer:
             logging.error(f'Failed to send notification: {str(e)}')
         return {'message': bot_response, 'session_status': session.status, 'is_completed': session.status == SmartBotSessionStatus.COMPLETED}
 
-    async def _analyze_application(self, job: Job, resume: Resume, user: User) -> Dict[str, Any]:
-        if not self.openai_available:
-            return self._get_demo_analysis()
+    async def _analyze_application(self, db: AsyncSession, job: Job, resume: Resume, user: User) -> Dict[str, Any]:
+        await prescoring_engine.ensure_corpus(db)
+        prescore = prescoring_engine.score(job, resume)
+        if not self.openai_available or not prescoring_engine.is_borderline(prescore['initial_score']):
+            metrics.inc('analysis_route_total', route='prescoring')
+            return prescore
+        metrics.inc('analysis_route_total', route='llm')
+        return await self._llm_analysis(job, resume, user, prescore)
+
+    async def _llm_analysis(self, job: Job, resume: Resume, user: User, prescore: Dict[str, Any]) -> Dict[str, Any]:
         job_data = self._extract_job_requirements(job)
         candidate_data = self._extract_candidate_profile(resume, user)
+        fingerprint = analysis_cache.fingerprint(job_data, candidate_data, model_router.signature('analysis'), ANALYSIS_PROMPT_VERSION)
+        cached = await analysis_cache.get(fingerprint)
+        if cached is not None:
+            return cached
         analysis_prompt = self._create_analysis_prompt(job_data, candidate_data)
         try:
             response = await self._call_openai_analysis(analysis_prompt)
             analysis_result = self._parse_analysis_response(response)
+            if analysis_result is None:
+                return prescore
+            await analysis_cache.put(fingerprint, job.id, resume.id, model_router.signature('analysis'), ANALYSIS_PROMPT_VERSION, analysis_result)
             return analysis_result
+        except LLMUnavailableError as e:
+            logging.getLogger(__name__).warning(f'LLM unavailable, using pre-scoring result: {e}')
+            return prescore
         except Exception as e:
             print(f'Error in SmartBot analysis: {e}')
-            return self._get_demo_analysis()
+            return prescore
+
+    async def reanalyze_job(self, db: AsyncSession, job_id: int, heartbeat: Optional[Callable[[], Awaitable[None]]]=None) -> Dict[str, Any]:
+        job = await db.get(Job, job_id)
+        if not job:
+            return {'skipped': 'job_not_found'}
+        rows = (await db.execute(select(JobApplication, Resume, User, CandidateAnalysis).join(Resume, Resume.id == JobApplication.resume_id).join(User, User.id == JobApplication.user_id).outerjoin(SmartBotSession, SmartBotSession.application_id == JobApplication.id).outerjoin(CandidateAnalysis, CandidateAnalysis.session_id == SmartBotSession.session_id).filter(JobApplication.job_id == job_id).order_by(JobApplication.id))).all()
+        unanalyzed = [application.id for (application, _, _, analysis) in rows if analysis is None]
+        for application_id in unanalyzed:
+            job_queue.enqueue(db, AnalysisJobKind.START_ANALYSIS.value, {'application_id': application_id}, application_id=application_id)
+        if unanalyzed:
+            await db.commit()
+        rows = [row for row in rows if row[3] is not None]
+        total = len(rows)
+        await prescoring_engine.ensure_corpus(db)
+        results = prescoring_engine.score_many(job, [resume for (_, resume, _, _) in rows])
+        borderline = [i for (i, result) in enumerate(results) if prescoring_engine.is_borderline(result['initial_score'])] if self.openai_available else []
+        metrics.inc('analysis_route_total', total - len(borderline), route='prescoring')
+        metrics.inc('analysis_route_total', len(borderline), route='llm')
+        step = max(1, total // 20)
+        progress = {'done': total - len(borderline)}
+
+        async def report(force: bool=False) -> None:
+            if not force and progress['done'] % step:
+                return
+            try:
+                await ws_manager.broadcast_job(job_id, {'event': 'reanalysis_progress', 'job_id': job_id, 'done': progress['done'], 'total': total, 'queued': len(unanalyzed)})
+            except Exception as e:
+                logging.error(f'WS broadcast failed (reanalysis progress): {e}')
+            if heartbeat is not None:
+                await heartbeat()
+        await report(force=True)
+        pending: asyncio.Queue = asyncio.Queue()
+        for i in borderline:
+            pending.put_nowait(i)
+
+        async def worker() -> None:
+            while not pending.empty():
+                i = pending.get_nowait()
+                (_, resume, user, _) = rows[i]
+                results[i] = await self._llm_analysis(job, resume, user, results[i])
+                progress['done'] += 1
+                await report()
+        await asyncio.gather(*[worker() for _ in range(min(settings.reanalysis_workers, len(borderline)))])
+        await self._write_reanalysis(db, [analysis for (_, _, _, analysis) in rows], results)
+        await report(force=True)
+        return {'job_id': job_id, 'rescored': total, 'llm': len(borderline), 'queued': len(unanalyzed)}
+
+    async def _write_reanalysis(self, db: AsyncSession, analyses: List[CandidateAnalysis], results: List[Dict[str, Any]]) -> None:
+        if not analyses:
+            return
+        await db.execute(update(CandidateAnalysis), [{'id': analysis.id, 'initial_score': result['initial_score'], 'relevance_score': analysis.relevance_score if analysis.final_score is not None else result['initial_score'], 'recommendation': analysis.recommendation if analysis.final_score is not None else result.get('recommendation'), 'strengths': result.get('strengths', []), 'weaknesses': result.get('concerns', [])} for (analysis, result) in zip(analyses, results)])
+        analysis_ids = [analysis.id for analysis in analyses]
+        clarified = set((await db.execute(select(AnalysisCategory.analysis_id, AnalysisCategory.category).where(AnalysisCategory.analysis_id.in_(analysis_ids), AnalysisCategory.status == 'clarified'))).all())
+        await db.execute(delete(AnalysisCategory).where(AnalysisCategory.analysis_id.in_(analysis_ids), AnalysisCategory.status != 'clarified'))
+        categories = [{'analysis_id': analysis.id, 'category': discrepancy.get('category', 'общее'), 'status': 'mismatch', 'score': self._calculate_category_score(discrepancy.get('severity', 'medium')), 'details': discrepancy.get('issue', '')} for (analysis, result) in zip(analyses, results) for discrepancy in result.get('discrepancies', []) if (analysis.id, discrepancy.get('category', 'общее')) not in clarified]
+        if categories:
+            await db.execute(insert(AnalysisCategory), categories)
+        await db.commit()
+
+    def _speculate(self, session_id: str, last_message_id: int, initial_score: Optional[float], remaining_questions: List[Dict[str, Any]]) -> None:
+        if not (settings.speculation_enabled and self.openai_available):
+            return
+        key = state_key([last_message_id])
+        if remaining_questions:
+            next_question = remaining_questions[0]
+            speculative_cache.schedule(session_id, 'rephrase', key, lambda: self._rephrase_question(session_id, last_message_id, next_question))
+        else:
+            speculative_cache.schedule(session_id, 'final_report', key, lambda: self._draft_final_report(session_id, last_message_id, initial_score))
+
+    async def _load_conversation(self, db: AsyncSession, session_id: str, through_id: Optional[int]=None) -> List[SmartBotMessage]:
+        query = select(SmartBotMessage).filter(SmartBotMessage.session_id == session_id).order_by(SmartBotMessage.created_at.desc(), SmartBotMessage.id.desc()).limit(settings.smartbot_context_messages)
+        if through_id is not None:
+            query = query.filter(SmartBotMessage.id <= through_id)
+        return list(reversed((await db.scalars(query)).all()))
+
+    async def _conversation_snapshot(self, session_id: str, through_id: int) -> str:
+        async with AsyncSessionLocal() as db:
+            return self._conversation_text(await self._load_conversation(db, session_id, through_id))
+
+    def _answer_covers(self, answer: str, category: Optional[str]) -> bool:
+        answer_lower = answer.lower()
+        return any((keyword in answer_lower for keyword in CATEGORY_KEYWORDS.get(category or '', ())))
+
+    async def _rephrase_question(self, session_id: str, through_id: int, question: Dict[str, Any]) -> Optional[str]:
+        conversation_text = await self._conversation_snapshot(session_id, through_id)
+        prompt = f"ДИАЛОГ С КАНДИДАТОМ:\n{conversation_text}\nСЛЕДУЮЩИЙ ВОПРОС: {question.get('question')}\nПерефразируй следующий вопрос так, чтобы он естественно продолжал диалог после ответа кандидата, не ссылаясь на содержание этого ответа. Одно-два предложения, дружелюбно. Верни только текст вопроса."
+        text = await model_router.chat('rephrase', [{'role': 'system', 'content': 'Ты SmartBot - дружелюбный HR-ассистент.'}, {'role': 'user', 'content': prompt}], temperature=0.5)
+        return text.strip() or None
+
+    async def _draft_final_report(self, session_id: str, through_id: int, initial_score: Optional[float]) -> Optional[Dict[str, Any]]:
+        conversation_text = await self._conversation_snapshot(session_id, through_id)
+        result = await model_router.chat('report', [REPORT_SYSTEM_MESSAGE, {'role': 'user', 'content': self._final_report_prompt(conversation_text, initial_score)}], temperature=0.5, validate=lambda text: self._parse_report(text) is not None)
+        return self._parse_report(result)
+
+    def _conversation_text(self, messages: List[SmartBotMessage]) -> str:
+        lines = [f'{msg.message_type}: {msg.content}' for msg in messages if msg.message_type and msg.content]
+        return '\n'.join(prompt_budget.fit_recent('report', lines, settings.prompt_conversation_tokens))
+
+    def _final_report_prompt(self, conversation_text: str, initial_score: Optional[float]) -> str:
+        return f'\nНа основе полного разговора с кандидатом, создай финальный анализ для работодателя.\nПЕРВИЧНАЯ ОЦЕНКА: {(initial_score if initial_score is not None else 50)}\nПОЛНАЯ БЕСЕДА:\n{conversation_text}\nСоздай финальный отчет в JSON формате:\n{{\n    "final_score": число от 0 до 100,\n    "recommendation": "recommend|consider|reject",\n    "summary": "краткое резюме на русском для работодателя (2-3 предложения)",\n    "key_insights": ["ключевые выводы о кандидате"],\n    "resolved_concerns": ["какие вопросы были решены"],\n    "remaining_concerns": ["что остается проблемным"]\n}}\n'
+
+    def _amend_report_prompt(self, draft: Dict[str, Any], question: str, answer: str) -> str:
+        answer = prompt_budget.fit_fields('report', {'answer': answer}, {'answer': settings.prompt_resume_field_tokens})['answer']
+        return f'\nЧерновик финального отчета по кандидату составлен до его последнего ответа:\n{json.dumps(draft, ensure_ascii=False)}\nПОСЛЕДНИЙ ВОПРОС: {question}\nОТВЕТ КАНДИДАТА: {answer}\nОбнови отчет с учетом этого ответа и верни его в том же JSON формате.\n'
+
+    def _parse_report(self, result: str) -> Optional[Dict[str, Any]]:
+        json_start = result.find('{')
+        json_end = result.rfind('}') + 1
+        if json_start == -1 or json_end == 0:
+            return None
+        try:
+            parsed = json.loads(result[json_start:json_end])
+        except json.JSONDecodeError:
+            return None
+        return parsed if isinstance(parsed, dict) else None
+
+    def _build_questions_from_discrepancies(self, discrepancies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        order = {'high': 0, 'medium': 1, 'low': 2}
+        questions = []
+        for discrepancy in sorted(discrepancies, key=lambda d: order.get(d.get('severity'), 1)):
+            category = discrepancy.get('category', 'другое')
+            template = QUESTION_TEMPLATES.get(category, QUESTION_TEMPLATES['другое'])
+            questions.append({'category': category, 'question': template.format(issue=discrepancy.get('issue', '')), 'reason': discrepancy.get('issue', '')})
+        return questions[:4]
 
     def _extract_job_requirements(self, job: Job) -> Dict[str, Any]:
         return {'title': job.title, 'description': job.description, 'requirements': job.requirements, 'location': job.location, 'salary_min': job.salary_min, 'salary_max': job.salary_max, 'employment_type': job.employment_type, 'experience_level': job.experience_level, 'company': job.company_name}
@@ -173,29 +315,31 @@ class ApplicationAnalyzer:
         return {'name': user.full_name or 'Не указано', 'email': user.email or 'Не указан', 'phone': user.phone or 'Не указан', 'city': resume.location or 'Не указан', 'skills': resume.skills or 'Не указаны', 'experience': resume.experience or 'Не указан', 'education': resume.education or 'Не указано', 'summary': resume.summary or 'Не указано'}
 
     def _create_analysis_prompt(self, job_data: Dict, candidate_data: Dict) -> str:
+        job_data = prompt_budget.fit_fields('analysis', job_data, {'description': settings.prompt_job_description_tokens, 'requirements': settings.prompt_job_requirements_tokens})
+        candidate_data = prompt_budget.fit_fields('analysis', candidate_data, {field: settings.prompt_resume_field_tokens for field in ('skills', 'experience', 'education', 'summary')})
         prompt = f"""\nТы SmartBot - умный помощник для анализа откликов на вакансии. Твоя задача проанализировать соответствие кандидата требованиям вакансии и выявить несоответствия, которые требуют уточнения.\nВАКАНСИЯ:\nДолжность: {job_data['title']}\nКомпания: {job_data['company']}\nЛокация: {job_data['location']}\nТип занятости: {job_data['employment_type']}\nУровень опыта: {job_data['experience_level']}\nЗарплата: {job_data['salary_min']} - {job_data['salary_max']}\nОписание: {job_data['description']}\nТребования: {job_data['requirements']}\nКАНДИДАТ:\nИмя: {candidate_data['name']}\nГород: {candidate_data['city']}\nНавыки: {candidate_data['skills']}\nОпыт работы: {candidate_data['experience']}\nОбразование: {candidate_data['education']}\nО себе: {candidate_data['summary']}\nЗАДАЧА:\nПроанализируй соответствие кандидата вакансии и определи:\n1. Ключевые несоответствия между требованиями и профилем кандидата\n2. Вопросы, которые нужно задать для уточнения (максимум 3-4 вопроса)\n3. Предварительную оценку релевантности (0-100%)\n4. Категории для анализа (город, опыт, навыки, зарплата, образование)\nВерни результат в JSON формате:\n{{\n    "initial_score": число от 0 до 100,\n    "discrepancies": [\n        {{\n            "category": "город|опыт|навыки|зарплата|образование|другое",\n            "issue": "описание несоответствия",\n            "severity": "high|medium|low"\n        }}\n    ],\n    "questions": [\n        {{\n            "category": "категория вопроса",\n            "question": "текст вопроса на русском языке",\n            "reason": "почему этот вопрос важен"\n        }}\n    ],\n    "strengths": ["список сильных сторон кандидата"],\n    "concerns": ["список проблемных моментов"],\n    "recommendation": "recommend|consider|reject"\n}}\nПомни: вопросы должны быть дружелюбными, профессиональными и понятными. Избегай давления и формальностей.\n"""
         return prompt
 
     async def _call_openai_analysis(self, prompt: str) -> str:
-        import logging
-        from openai import AsyncOpenAI
-        logger = logging.getLogger(__name__)
-        max_retries = 3
-        client = AsyncOpenAI(api_key=settings.openai_api_key)
-        for attempt in range(max_retries):
-            try:
-                response = await client.chat.completions.create(model='gpt-4', messages=[{'role': 'system', 'content': 'Ты SmartBot - профессиональный HR-аналитик, который помогает работодателям оценивать кандидатов.'}, {'role': 'user', 'content': prompt}], max_tokens=2000, temperature=0.7)
-                return response.choices[0].message.content
-            except Exception as e:
-                logger.warning(f'OpenAI API error (attempt {attempt + 1}/{max_retries}): {e}')
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(2 ** attempt)
-                    continue
-                raise e
-        logger.error('All OpenAI retry attempts failed, using fallback analysis')
-        raise Exception('OpenAI API unavailable after retries')
+        return await model_router.chat('analysis', [{'role': 'system', 'content': 'Ты SmartBot - профессиональный HR-аналитик, который помогает работодателям оценивать кандидатов.'}, {'role': 'user', 'content': prompt}], temperature=0.7, validate=self._is_valid_analysis)
 
-    def _parse_analysis_response(self, response: str) -> Dict[str, Any]:
+    def _is_valid_analysis(self, response: str) -> bool:
+        try:
+            analysis = json.loads(response[response.find('{'):response.rfind('}') + 1])
+        except (json.JSONDecodeError, TypeError):
+            return False
+        if not isinstance(analysis, dict) or analysis.get('recommendation') not in ('recommend', 'consider', 'reject'):
+            return False
+        score = analysis.get('initial_score')
+        if isinstance(score, bool) or not isinstance(score, (int, float)) or not 0 <= score <= 100:
+            return False
+        discrepancies = analysis.get('discrepancies')
+        questions = analysis.get('questions')
+        if not isinstance(discrepancies, list) or not all((isinstance(d, dict) and d.get('issue') for d in discrepancies)):
+            return False
+        return isinstance(questions, list) and all((isinstance(q, dict) and q.get('question') for q in questions))
+
+    def _parse_analysis_response(self, response: str) -> Optional[Dict[str, Any]]:
         logger = logging.getLogger(__name__)
         try:
             json_start = response.find('{')
@@ -214,39 +358,52 @@ class ApplicationAnalyzer:
                 return result
             else:
                 logger.error('No valid JSON found in OpenAI response')
-                return self._get_demo_analysis()
+                return None
         except json.JSONDecodeError as e:
             logger.error(f'JSON parsing error: {e}')
             logger.debug(f'Failed to parse response: {response[:200]}...')
-            return self._get_demo_analysis()
+            return None
         except Exception as e:
             logger.error(f'Unexpected error parsing analysis response: {e}')
-            return self._get_demo_analysis()
-
-    def _get_demo_analysis(self) -> Dict[str, Any]:
-        return {'initial_score': 75, 'discrepancies': [{'category': 'город', 'issue': 'Кандидат из другого города', 'severity': 'medium'}, {'category': 'образование', 'issue': 'Не указано соответствующее высшее образование', 'severity': 'low'}], 'questions': [{'category': 'город', 'question': 'Вижу, что вы из другого города. Готовы ли вы рассмотреть переезд или удаленную работу?', 'reason': 'Уточнить готовность к переезду'}, {'category': 'образование', 'question': 'Пожалуйста, уточните уровень вашего образования и профиль, чтобы понять соответствие требованиям вакансии.', 'reason': 'Проверить соответствие образования'}], 'strengths': ['Подходящий опыт работы', 'Релевантные навыки'], 'concerns': ['Несоответствие по локации', 'Неясность по образованию'], 'recommendation': 'consider'}
+            return None
 
     def _calculate_category_score(self, severity: str) -> int:
         severity_scores = {'low': 80, 'medium': 60, 'high': 30}
         return severity_scores.get(severity, 60)
 
-    async def _finalize_analysis(self, db: Session, session_id: str) -> Dict[str, Any]:
-        messages = db.query(SmartBotMessage).filter(SmartBotMessage.session_id == session_id).order_by(SmartBotMessage.created_at).all()
-        analysis = db.query(CandidateAnalysis).filter(CandidateAnalysis.session_id == session_id).first()
+    def _json_value(self, value: Any, default: Any) -> Any:
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                return default
+        return value if isinstance(value, type(default)) else default
+
+    async def _finalize_analysis(self, db: AsyncSession, session_id: str, speculation_key: Optional[str]=None, last_turn: Optional[Tuple[str, str]]=None) -> Dict[str, Any]:
+        messages = await self._load_conversation(db, session_id)
+        analysis = await db.scalar(select(CandidateAnalysis).filter(CandidateAnalysis.session_id == session_id))
         if not self.openai_available:
             return {'final_score': analysis.initial_score if analysis else 75, 'summary': 'Кандидат прошел собеседование с ботом. Анализ завершен.', 'recommendation': 'consider'}
-        conversation_text = '\n'.join([f'{msg.message_type}: {msg.content}' for msg in messages if msg.message_type and msg.content])
-        prompt = f'\nНа основе полного разговора с кандидатом, создай финальный анализ для работодателя.\nПЕРВИЧНАЯ ОЦЕНКА: {(analysis.initial_score if analysis else 50)}\nПОЛНАЯ БЕСЕДА:\n{conversation_text}\nСоздай финальный отчет в JSON формате:\n{{\n    "final_score": число от 0 до 100,\n    "recommendation": "recommend|consider|reject",\n    "summary": "краткое резюме на русском для работодателя (2-3 предложения)",\n    "key_insights": ["ключевые выводы о кандидате"],\n    "resolved_concerns": ["какие вопросы были решены"],\n    "remaining_concerns": ["что остается проблемным"]\n}}\n'
         try:
-            from openai import AsyncOpenAI
-            client = AsyncOpenAI(api_key=settings.openai_api_key)
-            response = await client.chat.completions.create(model='gpt-4', messages=[{'role': 'system', 'content': 'Ты SmartBot - создаешь финальные отчеты для работодателей.'}, {'role': 'user', 'content': prompt}], max_tokens=1000, temperature=0.5)
-            result = response.choices[0].message.content
-            json_start = result.find('{')
-            json_end = result.rfind('}') + 1
-            if json_start != -1 and json_end != -1:
-                json_str = result[json_start:json_end]
-                parsed_result = json.loads(json_str)
+            draft = None
+            if speculation_key is not None and last_turn is not None:
+                draft_task = speculative_cache.take(session_id, 'final_report', speculation_key)
+                draft = await draft_task if draft_task is not None else None
+            if draft:
+                prompt = self._amend_report_prompt(draft, *last_turn)
+            else:
+                prompt = self._final_report_prompt(self._conversation_text(messages), analysis.initial_score if analysis else None)
+            report_messages = [REPORT_SYSTEM_MESSAGE, {'role': 'user', 'content': prompt}]
+            model = model_router.choose('report', report_messages)
+            parts: List[str] = []
+            async for delta in model_router.stream('report', report_messages, temperature=0.5, model=model):
+                parts.append(delta)
+                await ws_manager.broadcast_session(session_id, {'event': 'chat_delta', 'session_id': session_id, 'stream': 'final_report', 'delta': delta})
+            parsed_result = self._parse_report(''.join(parts))
+            if parsed_result is None and model != model_router.large_model:
+                metrics.inc('llm_route_fallbacks_total', task='report', model=model)
+                parsed_result = self._parse_report(await model_router.chat('report', report_messages, temperature=0.5, model=model_router.large_model))
+            if parsed_result is not None:
                 return parsed_result
         except Exception as e:
             logging.error(f'Error in final analysis: {e}')
@@ -0,0 +1,203 @@
+import json
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable, List, Optional
+from sqlalchemy import text
+from core.config import settings
+from core.db import ASYNC_DATABASE_URL, async_engine
+from core.metrics import metrics
+logger = logging.getLogger(__name__)
+EventHandler = Callable[[str, Hashable, dict], Awaitable[None]]
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+class EventBus:
+
+    def __init__(self) -> None:
+        self.handler: Optional[EventHandler] = None
+
+    def subscribe(self, handler: EventHandler) -> None:
+        self.handler = handler
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, kind: str, topic: Hashable, payload: dict) -> None:
+        raise NotImplementedError
+
+    async def _dispatch(self, kind: str, topic: Hashable, payload: dict) -> None:
+        if self.handler is None:
+            return
+        try:
+            await self.handler(kind, topic, payload)
+        except Exception as e:
+            logger.error(f'Event bus handler failed for {kind}:{topic}: {e}')
+
+class InMemoryEventBus(EventBus):
+
+    async def publish(self, kind: str, topic: Hashable, payload: dict) -> None:
+        metrics.inc('event_bus_published_total', backend='memory')
+        await self._dispatch(kind, topic, payload)
+
+class PostgresEventBus(EventBus):
+
+    def __init__(self, dsn: str, channel: str, batch_window: float, spill_ttl: int) -> None:
+        super().__init__()
+        self.dsn = dsn
+        self.channel = channel
+        self.batch_window = batch_window
+        self.spill_ttl = spill_ttl
+        self._outbox: 'asyncio.Queue[str]' = asyncio.Queue()
+        self._flusher: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    async def start(self) -> None:
+        self._stopping.clear()
+        self._ensure_flusher()
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._flusher is not None:
+            try:
+                await asyncio.wait_for(self._outbox.join(), timeout=5)
+            except asyncio.TimeoutError:
+                logger.warning(f'Dropping {self._outbox.qsize()} unpublished events on shutdown')
+            self._flusher.cancel()
+            self._flusher = None
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def publish(self, kind: str, topic: Hashable, payload: dict) -> None:
+        self._ensure_flusher()
+        self._outbox.put_nowait(json.dumps({'k': kind, 't': topic, 'p': payload}, separators=(',', ':'), ensure_ascii=False, default=str))
+        metrics.inc('event_bus_published_total', backend='postgres')
+        metrics.set_gauge('event_bus_outbox_depth', self._outbox.qsize())
+
+    async def _drain(self) -> List[str]:
+        envelopes = [await self._outbox.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_window
+        while True:
+            try:
+                envelopes.append(self._outbox.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return envelopes
+            try:
+                envelopes.append(await asyncio.wait_for(self._outbox.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                return envelopes
+
+    def _batches(self, envelopes: List[str]) -> List[List[str]]:
+        batches: List[List[str]] = []
+        current: List[str] = []
+        size = 2
+        for envelope in envelopes:
+            encoded = len(envelope.encode('utf-8')) + 1
+            if current and size + encoded > NOTIFY_PAYLOAD_LIMIT:
+                batches.append(current)
+                (current, size) = ([], 2)
+            current.append(envelope)
+            size += encoded
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _flush_loop(self) -> None:
+        while True:
+            envelopes = await self._drain()
+            try:
+                async with async_engine.begin() as conn:
+                    for batch in self._batches(envelopes):
+                        if len(batch) == 1 and len(batch[0].encode('utf-8')) + 2 > NOTIFY_PAYLOAD_LIMIT:
+                            spill_id = await conn.scalar(text('INSERT INTO ws_event_spill (payload) VALUES (CAST(:payload AS JSONB)) RETURNING id'), {'payload': batch[0]})
+                            message = json.dumps({'ref': spill_id})
+                            metrics.inc('event_bus_spilled_total')
+                        else:
+                            message = '[' + ','.join(batch) + ']'
+                        await conn.execute(text('SELECT pg_notify(:channel, :payload)'), {'channel': self.channel, 'payload': message})
+                        metrics.inc('event_bus_notifies_total')
+                        metrics.observe('event_bus_batch_size', len(batch))
+            except Exception as e:
+                metrics.inc('event_bus_publish_errors_total', len(envelopes))
+                logger.error(f'Failed to publish {len(envelopes)} events: {e}')
+            finally:
+                for _ in envelopes:
+                    self._outbox.task_done()
+                metrics.set_gauge('event_bus_outbox_depth', self._outbox.qsize())
+
+    async def _listen(self) -> None:
+        import asyncpg
+        backoff = 0.5
+        while not self._stopping.is_set():
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                notifications: 'asyncio.Queue[str]' = asyncio.Queue()
+                await conn.add_listener(self.channel, lambda _conn, _pid, _channel, payload: notifications.put_nowait(payload))
+                logger.info(f'Event bus listening on {self.channel!r}')
+                backoff = 0.5
+                last_sweep = 0.0
+                loop = asyncio.get_running_loop()
+                while not conn.is_closed():
+                    try:
+                        payload = await asyncio.wait_for(notifications.get(), timeout=5)
+                    except asyncio.TimeoutError:
+                        await conn.execute('SELECT 1')
+                        if loop.time() - last_sweep > self.spill_ttl:
+                            await conn.execute("DELETE FROM ws_event_spill WHERE created_at < NOW() - make_interval(secs => $1)", float(self.spill_ttl))
+                            last_sweep = loop.time()
+                        continue
+                    await self._handle_notification(conn, payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f'Event bus listener lost connection, reconnecting in {backoff:.1f}s: {e}')
+                metrics.inc('event_bus_reconnects_total')
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, 30)
+
+    async def _handle_notification(self, conn: Any, payload: str) -> None:
+        data = json.loads(payload)
+        if isinstance(data, dict) and 'ref' in data:
+            raw = await conn.fetchval('SELECT payload::text FROM ws_event_spill WHERE id = $1', data['ref'])
+            if raw is None:
+                metrics.inc('event_bus_spill_missing_total')
+                return
+            data = [json.loads(raw)]
+        for envelope in data:
+            metrics.inc('event_bus_received_total')
+            await self._dispatch(envelope['k'], envelope['t'], envelope['p'])
+
+def _listen_dsn() -> str:
+    url = settings.event_bus_database_url or ASYNC_DATABASE_URL
+    for prefix in ('postgresql+asyncpg://', 'postgresql+psycopg2://'):
+        if url.startswith(prefix):
+            return 'postgresql://' + url[len(prefix):]
+    return url
+
+def build_event_bus() -> EventBus:
+    if settings.event_bus_backend == 'postgres':
+        return PostgresEventBus(_listen_dsn(), channel=settings.event_bus_channel, batch_window=settings.event_bus_batch_window, spill_ttl=settings.event_bus_spill_ttl)
+    return InMemoryEventBus()
+event_bus = build_event_bus()
\ No newline at end of file
@@ -0,0 +1,158 @@
+import os
+import socket
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.config import settings
+from core.db import AsyncSessionLocal
+from models.analysis_jobs import AnalysisJob, AnalysisJobStatus, AnalysisJobKind
+logger = logging.getLogger(__name__)
+JobHandler = Callable[[AsyncSession, AnalysisJob], Awaitable[Optional[Dict[str, Any]]]]
+
+class JobQueue:
+
+    def __init__(self):
+        self.handlers: Dict[str, JobHandler] = {}
+
+    def register(self, kind: str) -> Callable[[JobHandler], JobHandler]:
+
+        def decorator(handler: JobHandler) -> JobHandler:
+            self.handlers[kind] = handler
+            return handler
+        return decorator
+
+    def enqueue(self, db: AsyncSession, kind: str, payload: Optional[Dict[str, Any]]=None, application_id: Optional[int]=None, max_attempts: Optional[int]=None) -> AnalysisJob:
+        job = AnalysisJob(kind=kind, payload=payload or {}, application_id=application_id, status=AnalysisJobStatus.QUEUED.value, attempts=0, max_attempts=max_attempts or settings.analysis_queue_max_attempts)
+        db.add(job)
+        return job
+
+    async def claim(self, db: AsyncSession, worker_id: str) -> Optional[AnalysisJob]:
+        job = await db.scalar(select(AnalysisJob).filter(AnalysisJob.status == AnalysisJobStatus.QUEUED.value, AnalysisJob.run_at <= func.now()).order_by(AnalysisJob.run_at, AnalysisJob.id).with_for_update(skip_locked=True).limit(1))
+        if not job:
+            await db.rollback()
+            return None
+        job.status = AnalysisJobStatus.RUNNING.value
+        job.attempts = (job.attempts or 0) + 1
+        job.locked_at = func.now()
+        job.locked_by = worker_id
+        await db.commit()
+        await db.refresh(job)
+        return job
+
+    async def complete(self, db: AsyncSession, job: AnalysisJob, result: Optional[Dict[str, Any]]=None) -> None:
+        job.status = AnalysisJobStatus.SUCCEEDED.value
+        job.result = result
+        job.last_error = None
+        job.locked_at = None
+        job.locked_by = None
+        job.finished_at = func.now()
+        await db.commit()
+
+    async def fail(self, db: AsyncSession, job: AnalysisJob, error: str) -> None:
+        job.last_error = error[:4000]
+        job.locked_at = None
+        job.locked_by = None
+        if job.attempts >= job.max_attempts:
+            job.status = AnalysisJobStatus.DEAD.value
+            job.finished_at = func.now()
+            logger.error(f'Analysis job {job.id} moved to dead-letter after {job.attempts} attempts: {error}')
+        else:
+            delay = settings.analysis_queue_retry_base_delay * 2 ** (job.attempts - 1)
+            job.status = AnalysisJobStatus.QUEUED.value
+            job.run_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+            logger.warning(f'Analysis job {job.id} failed (attempt {job.attempts}/{job.max_attempts}), retrying in {delay}s: {error}')
+        await db.commit()
+
+    async def requeue_stale(self, db: AsyncSession) -> int:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.analysis_queue_lock_timeout)
+        result = await db.execute(update(AnalysisJob).where(AnalysisJob.status == AnalysisJobStatus.RUNNING.value, AnalysisJob.locked_at < cutoff).values(status=AnalysisJobStatus.QUEUED.value, locked_at=None, locked_by=None, run_at=func.now()))
+        await db.commit()
+        return result.rowcount or 0
+
+    async def touch(self, job_id: int) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(AnalysisJob).where(AnalysisJob.id == job_id, AnalysisJob.status == AnalysisJobStatus.RUNNING.value).values(locked_at=func.now()))
+            await db.commit()
+
+    async def retry_dead(self, db: AsyncSession, job: AnalysisJob) -> None:
+        job.status = AnalysisJobStatus.QUEUED.value
+        job.attempts = 0
+        job.run_at = func.now()
+        job.finished_at = None
+        await db.commit()
+
+    async def run_once(self, worker_id: str) -> bool:
+        async with AsyncSessionLocal() as db:
+            job = await self.claim(db, worker_id)
+            if not job:
+                return False
+            job_id = job.id
+            handler = self.handlers.get(job.kind)
+            if handler is None:
+                job.attempts = job.max_attempts
+                await self.fail(db, job, f'No handler registered for job kind {job.kind!r}')
+                return True
+            try:
+                result = await handler(db, job)
+            except Exception as e:
+                await db.rollback()
+                job = await db.get(AnalysisJob, job_id, populate_existing=True)
+                await self.fail(db, job, repr(e))
+                return True
+            await self.complete(db, job, result)
+            return True
+
+    async def run_worker(self, worker_id: Optional[str]=None, stop_event: Optional[asyncio.Event]=None) -> None:
+        worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        stop_event = stop_event or asyncio.Event()
+        logger.info(f'Analysis worker {worker_id} started')
+        last_reap = 0.0
+        loop = asyncio.get_running_loop()
+        while not stop_event.is_set():
+            try:
+                if loop.time() - last_reap > settings.analysis_queue_lock_timeout / 2:
+                    async with AsyncSessionLocal() as db:
+                        requeued = await self.requeue_stale(db)
+                        if requeued:
+                            logger.warning(f'Requeued {requeued} stale analysis jobs')
+                    last_reap = loop.time()
+                processed = await self.run_once(worker_id)
+            except Exception as e:
+                logger.error(f'Analysis worker {worker_id} loop error: {e}')
+                processed = False
+            if not processed:
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout=settings.analysis_queue_poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        logger.info(f'Analysis worker {worker_id} stopped')
+job_queue = JobQueue()
+
+@job_queue.register(AnalysisJobKind.START_ANALYSIS.value)
+async def handle_start_analysis(db: AsyncSession, job: AnalysisJob) -> Dict[str, Any]:
+    from models.applications import JobApplication
+    from models.chat import SmartBotSession, SmartBotSessionStatus, CandidateAnalysis
+    from services.application_analyzer import application_analyzer
+    application = await db.get(JobApplication, job.application_id)
+    if not application:
+        return {'skipped': 'application_not_found'}
+    existing = await db.scalar(select(SmartBotSession).filter(SmartBotSession.application_id == application.id))
+    if existing and existing.status != SmartBotSessionStatus.ERROR.value:
+        return {'session_id': existing.session_id, 'status': existing.status}
+    if existing:
+        stale_analysis = await db.scalar(select(CandidateAnalysis).filter(CandidateAnalysis.session_id == existing.session_id))
+        if stale_analysis:
+            await db.delete(stale_analysis)
+        await db.delete(existing)
+        await db.commit()
+    session = await application_analyzer.start_analysis_session(db, application)
+    return {'session_id': session.session_id, 'status': session.status}
+
+@job_queue.register(AnalysisJobKind.REANALYZE_JOB.value)
+async def handle_reanalyze_job(db: AsyncSession, job: AnalysisJob) -> Dict[str, Any]:
+    from services.application_analyzer import application_analyzer
+    job_id = job.id
+    return await application_analyzer.reanalyze_job(db, int(job.payload['job_id']), heartbeat=lambda: job_queue.touch(job_id))
\ No newline at end of file
@@ -0,0 +1,103 @@
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+import httpx
+from core.config import settings
+from core.metrics import metrics
+logger = logging.getLogger(__name__)
+
+class LLMClient:
+
+    def __init__(self, api_key: Optional[str]=None, base_url: Optional[str]=None, max_connections: int=100, max_keepalive_connections: int=20, keepalive_expiry: float=30, connect_timeout: float=5, timeout: float=60) -> None:
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self._client: Any = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_settings(cls) -> 'LLMClient':
+        return cls(api_key=settings.openai_api_key, base_url=settings.openai_base_url, max_connections=settings.llm_max_connections, max_keepalive_connections=settings.llm_max_keepalive_connections, keepalive_expiry=settings.llm_keepalive_expiry, connect_timeout=settings.llm_connect_timeout, timeout=settings.llm_timeout)
+
+    @property
+    def available(self) -> bool:
+        return bool(self.api_key)
+
+    def _timeout(self, read_timeout: Optional[float]) -> httpx.Timeout:
+        return httpx.Timeout(read_timeout if read_timeout is not None else self.timeout, connect=self.connect_timeout)
+
+    async def get(self) -> Any:
+        if self._client is not None:
+            return self._client
+        async with self._lock:
+            if self._client is None:
+                from openai import AsyncOpenAI
+                self._http_client = httpx.AsyncClient(limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_keepalive_connections, keepalive_expiry=self.keepalive_expiry), timeout=self._timeout(None))
+                self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, http_client=self._http_client, max_retries=0, timeout=self._timeout(None))
+                metrics.inc('llm_clients_created_total')
+        return self._client
+
+    async def chat(self, messages: List[Dict[str, str]], model: str, max_tokens: int, temperature: float, timeout: Optional[float]=None) -> str:
+        client = await self.get()
+        started = time.perf_counter()
+        status = 'ok'
+        try:
+            response = await client.chat.completions.create(model=model, messages=messages, max_tokens=max_tokens, temperature=temperature, timeout=self._timeout(timeout))
+            return response.choices[0].message.content
+        except Exception:
+            status = 'error'
+            raise
+        finally:
+            metrics.inc('llm_requests_total', model=model, status=status)
+            metrics.observe('llm_request_seconds', time.perf_counter() - started, model=model)
+
+    async def stream(self, messages: List[Dict[str, str]], model: str, max_tokens: int, temperature: float, timeout: Optional[float]=None) -> AsyncIterator[str]:
+        client = await self.get()
+        started = time.perf_counter()
+        first_token_at: Optional[float] = None
+        status = 'ok'
+        response: Any = None
+        try:
+            response = await client.chat.completions.create(model=model, messages=messages, max_tokens=max_tokens, temperature=temperature, timeout=self._timeout(timeout), stream=True)
+            async for chunk in response:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    metrics.observe('llm_time_to_first_token_seconds', first_token_at - started, model=model)
+                yield delta
+        except (GeneratorExit, asyncio.CancelledError):
+            status = 'cancelled'
+            raise
+        except Exception:
+            status = 'error'
+            raise
+        finally:
+            if response is not None:
+                await response.response.aclose()
+            metrics.inc('llm_requests_total', model=model, status=status, stream=True)
+            metrics.observe('llm_request_seconds', time.perf_counter() - started, model=model)
+
+    async def configure(self, **overrides: Any) -> None:
+        await self.aclose()
+        for (name, value) in overrides.items():
+            if not hasattr(self, name) or name.startswith('_'):
+                raise AttributeError(f'Unknown LLM client option: {name}')
+            setattr(self, name, value)
+
+    async def aclose(self) -> None:
+        async with self._lock:
+            (client, self._client) = (self._client, None)
+            (http_client, self._http_client) = (self._http_client, None)
+        if client is not None:
+            await client.close()
+        elif http_client is not None:
+            await http_client.aclose()
+llm_client = LLMClient.from_settings()
\ No newline at end of file
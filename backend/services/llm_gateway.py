@@ -0,0 +1,238 @@
+import time
+import random
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, List, Optional
+from core.config import settings
+from core.metrics import metrics
+from services.llm_client import LLMClient, llm_client
+logger = logging.getLogger(__name__)
+
+class LLMUnavailableError(Exception):
+    pass
+
+class CircuitOpenError(LLMUnavailableError):
+    pass
+
+class LLMGatewayBusy(LLMUnavailableError):
+    pass
+
+class TokenBucket:
+
+    def __init__(self, name: str, per_minute: float) -> None:
+        self.name = name
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float) -> None:
+        if self.capacity <= 0:
+            return
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            if self.tokens < amount:
+                started = time.perf_counter()
+                while self.tokens < amount:
+                    await asyncio.sleep((amount - self.tokens) / self.rate)
+                    self._refill()
+                metrics.observe('llm_rate_limit_wait_seconds', time.perf_counter() - started, bucket=self.name)
+            self.tokens -= amount
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            logger.warning(f'LLM circuit breaker {self.state} -> {state}')
+        self.state = state
+        metrics.set_gauge('llm_breaker_open', 0 if state == self.CLOSED else 1)
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                return False
+            self._set_state(self.HALF_OPEN)
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def cancel_probe(self) -> None:
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probe_in_flight = False
+        self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+def _status_code(error: Exception) -> Optional[int]:
+    return getattr(error, 'status_code', None)
+
+def _is_retryable(error: Exception) -> bool:
+    import openai
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, asyncio.TimeoutError)):
+        return True
+    status_code = _status_code(error)
+    return status_code is not None and (status_code in (408, 409, 429) or status_code >= 500)
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, 'response', None)
+    value = response.headers.get('retry-after') if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum((len(m.get('content') or '') // 3 + 4 for m in messages))
+
+class LLMGateway:
+
+    def __init__(self, client: LLMClient, max_in_flight: int=8, requests_per_minute: float=0, tokens_per_minute: float=0, max_retries: int=3, backoff_base: float=1.0, backoff_max: float=30.0, queue_timeout: float=30.0, failure_threshold: int=5, recovery_timeout: float=30.0) -> None:
+        self.client = client
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue_timeout = queue_timeout
+        self.breaker = CircuitBreaker(failure_threshold, recovery_timeout)
+        self.requests = TokenBucket('requests', requests_per_minute)
+        self.tokens = TokenBucket('tokens', tokens_per_minute)
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._waiting = 0
+
+    @classmethod
+    def from_settings(cls, client: LLMClient) -> 'LLMGateway':
+        return cls(client, max_in_flight=settings.llm_max_in_flight, requests_per_minute=settings.llm_requests_per_minute, tokens_per_minute=settings.llm_tokens_per_minute, max_retries=settings.llm_max_retries, backoff_base=settings.llm_backoff_base, backoff_max=settings.llm_backoff_max, queue_timeout=settings.llm_queue_timeout, failure_threshold=settings.llm_breaker_failure_threshold, recovery_timeout=settings.llm_breaker_recovery_timeout)
+
+    @property
+    def available(self) -> bool:
+        return self.client.available
+
+    async def _admit(self, estimated_tokens: int) -> None:
+        await self.requests.acquire(1)
+        await self.tokens.acquire(estimated_tokens)
+        await self._slots.acquire()
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(self.backoff_max, retry_after) + random.uniform(0, self.backoff_base)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _enter(self, model: str, estimated_tokens: int, last_error: Optional[Exception]) -> None:
+        if not self.breaker.allow():
+            metrics.inc('llm_breaker_rejections_total', model=model)
+            raise CircuitOpenError('LLM provider circuit is open') from last_error
+        started = time.perf_counter()
+        self._waiting += 1
+        metrics.set_gauge('llm_queue_depth', self._waiting)
+        try:
+            await asyncio.wait_for(self._admit(estimated_tokens), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            metrics.inc('llm_queue_timeouts_total', model=model)
+            self.breaker.cancel_probe()
+            raise LLMGatewayBusy(f'LLM queue wait exceeded {self.queue_timeout}s')
+        finally:
+            self._waiting -= 1
+            metrics.set_gauge('llm_queue_depth', self._waiting)
+        metrics.observe('llm_queue_wait_seconds', time.perf_counter() - started, model=model)
+        metrics.add_gauge('llm_in_flight', 1)
+
+    def _leave(self) -> None:
+        self._slots.release()
+        metrics.add_gauge('llm_in_flight', -1)
+
+    def _retry_delay(self, attempt: int, error: Exception, model: str) -> Optional[float]:
+        if not _is_retryable(error):
+            self.breaker.cancel_probe()
+            raise error
+        self.breaker.record_failure()
+        if attempt == self.max_retries - 1:
+            return None
+        delay = self._backoff(attempt, error)
+        metrics.inc('llm_retries_total', model=model, status=_status_code(error) or type(error).__name__)
+        logger.warning(f'LLM call failed (attempt {attempt + 1}/{self.max_retries}), retrying in {delay:.1f}s: {error}')
+        return delay
+
+    async def chat(self, messages: List[Dict[str, str]], model: str, max_tokens: int, temperature: float, timeout: Optional[float]=None) -> str:
+        estimated_tokens = estimate_tokens(messages) + max_tokens
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_retries):
+            await self._enter(model, estimated_tokens, last_error)
+            try:
+                result = await self.client.chat(messages=messages, model=model, max_tokens=max_tokens, temperature=temperature, timeout=timeout)
+            except Exception as e:
+                last_error = e
+                delay = self._retry_delay(attempt, e, model)
+            else:
+                self.breaker.record_success()
+                return result
+            finally:
+                self._leave()
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+        raise LLMUnavailableError(f'LLM call failed after {self.max_retries} attempts') from last_error
+
+    async def stream(self, messages: List[Dict[str, str]], model: str, max_tokens: int, temperature: float, timeout: Optional[float]=None) -> AsyncIterator[str]:
+        estimated_tokens = estimate_tokens(messages) + max_tokens
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_retries):
+            await self._enter(model, estimated_tokens, last_error)
+            emitted = False
+            finished = False
+            succeeded = False
+            delay: Optional[float] = None
+            try:
+                async for delta in self.client.stream(messages=messages, model=model, max_tokens=max_tokens, temperature=temperature, timeout=timeout):
+                    emitted = True
+                    yield delta
+                finished = succeeded = True
+                self.breaker.record_success()
+            except Exception as e:
+                last_error = e
+                if emitted:
+                    if _is_retryable(e):
+                        self.breaker.record_failure()
+                    raise LLMUnavailableError('LLM stream interrupted') from e
+                delay = self._retry_delay(attempt, e, model)
+                finished = True
+            finally:
+                self._leave()
+                if not finished:
+                    self.breaker.cancel_probe()
+            if succeeded:
+                return
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+        raise LLMUnavailableError(f'LLM stream failed after {self.max_retries} attempts') from last_error
+llm_gateway = LLMGateway.from_settings(llm_client)
\ No newline at end of file
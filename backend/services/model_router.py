@@ -0,0 +1,96 @@
+import time
+import logging
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from core.config import settings
+from core.metrics import metrics
+from services.llm_gateway import LLMGateway, llm_gateway
+from services.prompt_budget import prompt_budget
+logger = logging.getLogger(__name__)
+TASKS = ('analysis', 'report', 'chat', 'rephrase', 'summary')
+SMALL = 'small'
+LARGE = 'large'
+
+class TaskRoute:
+
+    def __init__(self, tier: str, max_tokens: int, latency_budget: float, timeout: float) -> None:
+        if tier not in (SMALL, LARGE):
+            raise ValueError(f'Unknown model tier: {tier!r}')
+        self.tier = tier
+        self.max_tokens = max_tokens
+        self.latency_budget = latency_budget
+        self.timeout = timeout
+
+class ModelRouter:
+
+    def __init__(self, gateway: LLMGateway, small_model: str, large_model: str, small_context: int, large_context: int, short_prompt_tokens: int, routes: Dict[str, TaskRoute], latency_smoothing: float=0.2) -> None:
+        self.gateway = gateway
+        self.models = {SMALL: small_model, LARGE: large_model}
+        self.context = {SMALL: small_context, LARGE: large_context}
+        self.short_prompt_tokens = short_prompt_tokens
+        self.routes = routes
+        self.latency_smoothing = latency_smoothing
+        self.expected_latency: Dict[str, float] = {}
+
+    @classmethod
+    def from_settings(cls, gateway: LLMGateway) -> 'ModelRouter':
+        routes = {task: TaskRoute(getattr(settings, f'llm_route_{task}'), getattr(settings, f'llm_{task}_max_tokens'), getattr(settings, f'llm_{task}_latency_budget'), getattr(settings, f'llm_{task}_timeout', settings.llm_chat_timeout)) for task in TASKS}
+        return cls(gateway, small_model=settings.llm_small_model, large_model=settings.llm_large_model, small_context=settings.llm_small_context_tokens, large_context=settings.llm_large_context_tokens, short_prompt_tokens=settings.llm_route_short_prompt_tokens, routes=routes)
+
+    @property
+    def large_model(self) -> str:
+        return self.models[LARGE]
+
+    def signature(self, task: str) -> str:
+        return f'{self.routes[task].tier}:{self.models[SMALL]}/{self.models[LARGE]}'
+
+    def _fits(self, tier: str, prompt_tokens: int, max_tokens: int) -> bool:
+        return prompt_tokens + max_tokens <= self.context[tier]
+
+    def choose(self, task: str, messages: List[Dict[str, str]]) -> str:
+        route = self.routes[task]
+        prompt_tokens = prompt_budget.count_messages(messages)
+        other = LARGE if route.tier == SMALL else SMALL
+        (tier, reason) = (route.tier, 'policy')
+        if not self._fits(tier, prompt_tokens, route.max_tokens) and self._fits(other, prompt_tokens, route.max_tokens):
+            (tier, reason) = (other, 'context')
+        elif tier == LARGE and prompt_tokens <= self.short_prompt_tokens:
+            (tier, reason) = (SMALL, 'short_prompt')
+        elif tier == LARGE and self.expected_latency.get(self.models[LARGE], 0) > route.latency_budget and self._fits(SMALL, prompt_tokens, route.max_tokens):
+            (tier, reason) = (SMALL, 'latency_budget')
+        model = self.models[tier]
+        metrics.inc('llm_route_total', task=task, model=model, reason=reason)
+        return model
+
+    def _record(self, task: str, model: str, messages: List[Dict[str, str]], text: str, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        previous = self.expected_latency.get(model)
+        self.expected_latency[model] = elapsed if previous is None else previous + self.latency_smoothing * (elapsed - previous)
+        metrics.observe('llm_task_seconds', elapsed, task=task, model=model)
+        metrics.observe('llm_task_prompt_tokens', prompt_budget.count_messages(messages), task=task, model=model)
+        metrics.observe('llm_task_completion_tokens', len(text) // 3, task=task, model=model)
+
+    async def _call(self, task: str, model: str, messages: List[Dict[str, str]], temperature: float) -> str:
+        route = self.routes[task]
+        started = time.perf_counter()
+        text = await self.gateway.chat(model=model, messages=messages, max_tokens=route.max_tokens, temperature=temperature, timeout=route.timeout)
+        self._record(task, model, messages, text, started)
+        return text
+
+    async def chat(self, task: str, messages: List[Dict[str, str]], temperature: float, validate: Optional[Callable[[str], bool]]=None, model: Optional[str]=None) -> str:
+        model = model or self.choose(task, messages)
+        text = await self._call(task, model, messages, temperature)
+        if validate is not None and model != self.large_model and not validate(text):
+            metrics.inc('llm_route_fallbacks_total', task=task, model=model)
+            logger.warning(f'{model} output failed validation for {task}, retrying with {self.large_model}')
+            text = await self._call(task, self.large_model, messages, temperature)
+        return text
+
+    async def stream(self, task: str, messages: List[Dict[str, str]], temperature: float, model: str) -> AsyncIterator[str]:
+        route = self.routes[task]
+        started = time.perf_counter()
+        parts: List[str] = []
+        async for delta in self.gateway.stream(model=model, messages=messages, max_tokens=route.max_tokens, temperature=temperature, timeout=route.timeout):
+            parts.append(delta)
+            yield delta
+        self._record(task, model, messages, ''.join(parts), started)
+model_router = ModelRouter.from_settings(llm_gateway)
\ No newline at end of file
@@ -3,7 +3,8 @@ import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import Dict, Any, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from core.config import settings
 from models.users import User
 from models.jobs import Job
@@ -20,29 +21,29 @@ class NotificationService:
         self.smtp_password = getattr(settings, 'smtp_password', None)
         self.from_email = getattr(settings, 'from_email', 'noreply@smartbot.kz')
 
-    async def send_analysis_completion_notification(self, db: Session, session_id: str) -> bool:
+    async def send_analysis_completion_notification(self, db: AsyncSession, session_id: str) -> bool:
         try:
-            session = db.query(SmartBotSession).filter(SmartBotSession.session_id == session_id).first()
+            session = await db.scalar(select(SmartBotSession).filter(SmartBotSession.session_id == session_id))
             if not session:
                 logger.error(f'Session not found: {session_id}')
                 return False
-            application = db.query(JobApplication).filter(JobApplication.id == session.application_id).first()
+            application = await db.scalar(select(JobApplication).filter(JobApplication.id == session.application_id))
             if not application:
                 logger.error(f'Application not found for session: {session_id}')
                 return False
-            job = db.query(Job).filter(Job.id == application.job_id).first()
+            job = await db.scalar(select(Job).filter(Job.id == application.job_id))
             if not job:
                 logger.error(f'Job not found for application: {application.id}')
                 return False
-            employer = db.query(User).filter(User.id == job.employer_id).first()
+            employer = await db.scalar(select(User).filter(User.id == job.employer_id))
             if not employer:
                 logger.error(f'Employer not found for job: {job.id}')
                 return False
-            candidate = db.query(User).filter(User.id == application.user_id).first()
+            candidate = await db.scalar(select(User).filter(User.id == application.user_id))
             if not candidate:
                 logger.error(f'Candidate not found for application: {application.id}')
                 return False
-            analysis = db.query(CandidateAnalysis).filter(CandidateAnalysis.session_id == session_id).first()
+            analysis = await db.scalar(select(CandidateAnalysis).filter(CandidateAnalysis.session_id == session_id))
             await self._send_email_notification(employer=employer, candidate=candidate, job=job, analysis=analysis, session_id=session_id)
             logger.info(f'Analysis completion notification sent to employer {employer.email} for session {session_id}')
             return True
@@ -75,13 +76,13 @@ class NotificationService:
             logger.error(f'Failed to send email notification: {str(e)}')
             raise
 
-    async def send_application_status_notification(self, db: Session, application_id: int, new_status: str) -> bool:
+    async def send_application_status_notification(self, db: AsyncSession, application_id: int, new_status: str) -> bool:
         try:
-            application = db.query(JobApplication).filter(JobApplication.id == application_id).first()
+            application = await db.scalar(select(JobApplication).filter(JobApplication.id == application_id))
             if not application:
                 return False
-            candidate = db.query(User).filter(User.id == application.user_id).first()
-            job = db.query(Job).filter(Job.id == application.job_id).first()
+            candidate = await db.scalar(select(User).filter(User.id == application.user_id))
+            job = await db.scalar(select(Job).filter(Job.id == application.job_id))
             if not candidate or not job:
                 return False
             logger.info(f'Application status notification sent to {candidate.email}')
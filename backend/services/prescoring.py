@@ -0,0 +1,167 @@
+import re
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from scipy import sparse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.config import settings
+from core.metrics import metrics
+from models.jobs import Job
+from models.resumes import Resume
+TOKEN_RE = re.compile('[a-zа-я0-9][a-zа-я0-9+#]*')
+STOPWORDS = frozenset('и в во на с со по для от до из за к ко о об у не но а или как что это мы вы вас нас наш ваш при без так же the and or of to in for with on at a an is are be we you our your'.split())
+RU_SUFFIXES = sorted('иями ями ами ого его ому ему ыми ими ой ей ий ый ая яя ое ее ов ев ам ям ах ях ом ем ую юю ия ие ию а я о е ы и у ю ь'.split(), key=len, reverse=True)
+SKILL_DICTIONARY: Dict[str, Sequence[str]] = {'python': ('python', 'питон'), 'java': ('java',), 'javascript': ('javascript', 'js', 'es6'), 'typescript': ('typescript', 'ts'), 'react': ('react', 'reactjs', 'react.js'), 'vue': ('vue', 'vue.js', 'vuejs'), 'angular': ('angular',), 'node.js': ('node', 'node.js', 'nodejs'), 'django': ('django',), 'fastapi': ('fastapi',), 'flask': ('flask',), 'spring': ('spring', 'spring boot'), 'php': ('php', 'laravel'), 'go': ('golang', 'go'), 'c#': ('c#', '.net', 'asp.net'), 'c++': ('c++',), 'kotlin': ('kotlin',), 'swift': ('swift',), 'sql': ('sql', 'mysql', 'postgresql', 'postgres', 'ms sql', 'oracle'), 'nosql': ('mongodb', 'redis', 'cassandra', 'elasticsearch'), 'docker': ('docker',), 'kubernetes': ('kubernetes', 'k8s'), 'ci/cd': ('ci/cd', 'jenkins', 'gitlab ci', 'github actions'), 'cloud': ('aws', 'gcp', 'azure', 'yandex cloud'), 'linux': ('linux', 'unix', 'bash'), 'git': ('git',), 'html/css': ('html', 'css', 'sass', 'scss'), 'rest api': ('rest', 'restful', 'api'), 'machine learning': ('machine learning', 'ml', 'машинное обучение', 'pytorch', 'tensorflow', 'scikit-learn'), 'data analysis': ('pandas', 'numpy', 'анализ данных', 'power bi', 'tableau'), 'excel': ('excel', 'эксель'), '1с': ('1с', '1c'), 'figma': ('figma',), 'photoshop': ('photoshop', 'adobe'), 'qa': ('тестирование', 'selenium', 'pytest', 'qa'), 'smm': ('smm', 'таргет', 'instagram', 'контент'), 'sales': ('продаж', 'crm', 'b2b', 'b2c'), 'accounting': ('бухгалтер', 'мсфо', 'налог'), 'english': ('english', 'английск'), 'kazakh': ('казахск',), 'project management': ('scrum', 'agile', 'kanban', 'jira', 'управление проектами')}
+SKILL_NAMES = list(SKILL_DICTIONARY)
+
+def _alias_pattern(alias: str) -> str:
+    return re.escape(alias) + ('(?![a-z0-9])' if alias.isascii() and alias[-1].isalnum() else '')
+SKILL_PATTERNS = [re.compile('(?<![a-zа-я0-9])(?:' + '|'.join((_alias_pattern(alias) for alias in aliases)) + ')', re.IGNORECASE) for aliases in SKILL_DICTIONARY.values()]
+LEVEL_MIN_YEARS = {'junior': 0, 'middle': 2, 'senior': 5, 'lead': 6}
+YEARS_RE = re.compile('(\\d+(?:[.,]\\d+)?)\\s*\\+?\\s*(?:год|лет|years?|yrs?)')
+REMOTE_RE = re.compile('удал[её]н|remote', re.IGNORECASE)
+DEGREE_RE = re.compile('высшее|бакалавр|магистр|degree|bachelor', re.IGNORECASE)
+SEVERITY_PENALTY = {'high': 15, 'medium': 8, 'low': 3}
+
+def _stem(token: str) -> str:
+    if token.isascii():
+        return token
+    for suffix in RU_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 4:
+            return token[:-len(suffix)]
+    return token
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [_stem(t) for t in TOKEN_RE.findall(text.lower().replace('ё', 'е')) if len(t) > 1 and t not in STOPWORDS]
+
+def _job_text(job: Job) -> str:
+    return ' '.join(filter(None, [job.title, job.requirements, job.description]))
+
+def _resume_text(resume: Resume) -> str:
+    return ' '.join(filter(None, [resume.title, resume.desired_position, resume.skills, resume.experience, resume.education, resume.summary]))
+
+def _city(location: Optional[str]) -> str:
+    return (location or '').split(',')[0].strip().lower().replace('ё', 'е')
+
+def _years(experience: Optional[str]) -> Optional[float]:
+    values = [float(v.replace(',', '.')) for v in YEARS_RE.findall((experience or '').lower())]
+    return max(values) if values else None
+
+class TfidfIndex:
+
+    def __init__(self) -> None:
+        self.vocabulary: Dict[str, int] = {}
+        self.idf = np.zeros(0)
+        self.documents = 0
+        self.fitted_at = 0.0
+
+    def fit(self, documents: Iterable[str]) -> 'TfidfIndex':
+        df: Counter = Counter()
+        count = 0
+        for document in documents:
+            df.update(set(tokenize(document)))
+            count += 1
+        self.vocabulary = {term: i for (i, term) in enumerate(df)}
+        frequencies = np.fromiter((df[term] for term in self.vocabulary), dtype=np.float64, count=len(self.vocabulary))
+        self.idf = np.log((1 + count) / (1 + frequencies)) + 1
+        self.documents = count
+        self.fitted_at = time.monotonic()
+        return self
+
+    def transform(self, documents: Sequence[str]) -> sparse.csr_matrix:
+        (rows, cols, data) = ([], [], [])
+        for (row, document) in enumerate(documents):
+            counts = Counter((self.vocabulary[t] for t in tokenize(document) if t in self.vocabulary))
+            rows.extend([row] * len(counts))
+            cols.extend(counts.keys())
+            data.extend(counts.values())
+        matrix = sparse.csr_matrix((np.asarray(data, dtype=np.float64), (rows, cols)), shape=(len(documents), len(self.vocabulary)))
+        matrix.data = 1 + np.log(matrix.data)
+        matrix = matrix.multiply(self.idf).tocsr()
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sparse.diags(1 / norms) @ matrix
+
+def skill_matrix(texts: Sequence[str]) -> np.ndarray:
+    return np.array([[pattern.search(text) is not None for pattern in SKILL_PATTERNS] for text in texts], dtype=bool).reshape(len(texts), len(SKILL_PATTERNS))
+
+class PrescoringEngine:
+
+    def __init__(self, borderline_min: float, borderline_max: float, refit_interval: float, corpus_limit: int) -> None:
+        self.borderline_min = borderline_min
+        self.borderline_max = borderline_max
+        self.refit_interval = refit_interval
+        self.corpus_limit = corpus_limit
+        self.index: Optional[TfidfIndex] = None
+
+    def is_borderline(self, score: float) -> bool:
+        return self.borderline_min <= score < self.borderline_max
+
+    async def ensure_corpus(self, db: AsyncSession) -> None:
+        if self.index is not None and time.monotonic() - self.index.fitted_at < self.refit_interval:
+            return
+        rows = (await db.execute(select(Job.title, Job.requirements, Job.description).filter(Job.is_active == True).order_by(Job.id.desc()).limit(self.corpus_limit))).all()
+        self.index = TfidfIndex().fit((' '.join(filter(None, row)) for row in rows))
+        metrics.set_gauge('prescoring_vocabulary_size', len(self.index.vocabulary))
+
+    def score(self, job: Job, resume: Resume) -> Dict[str, Any]:
+        return self.score_many(job, [resume])[0]
+
+    def score_many(self, job: Job, resumes: Sequence[Resume]) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        job_text = _job_text(job)
+        resume_texts = [_resume_text(resume) for resume in resumes]
+        index = self.index if self.index is not None and self.index.documents else TfidfIndex().fit([job_text, *resume_texts])
+        similarity = np.asarray((index.transform(resume_texts) @ index.transform([job_text]).T).todense()).ravel()
+        required = skill_matrix([job_text])[0]
+        present = skill_matrix(resume_texts)
+        matched = present & required
+        coverage = matched.sum(axis=1) / required.sum() if required.any() else np.ones(len(resumes))
+        text_fit = np.minimum(1.0, similarity / 0.3)
+        fit = 0.6 * coverage + 0.4 * text_fit if required.any() else text_fit
+        results = [self._result(job, resume, float(fit[i]), float(similarity[i]), matched[i], required & ~present[i]) for (i, resume) in enumerate(resumes)]
+        metrics.observe('prescoring_seconds', time.perf_counter() - started)
+        metrics.inc('prescoring_candidates_total', len(resumes))
+        return results
+
+    def _result(self, job: Job, resume: Resume, fit: float, similarity: float, matched: np.ndarray, missing: np.ndarray) -> Dict[str, Any]:
+        discrepancies: List[Dict[str, str]] = []
+        strengths: List[str] = []
+        matched_names = [SKILL_NAMES[i] for i in np.flatnonzero(matched)]
+        missing_names = [SKILL_NAMES[i] for i in np.flatnonzero(missing)]
+        if matched_names:
+            strengths.append('Совпадающие навыки: ' + ', '.join(matched_names))
+        if missing_names:
+            share = len(missing_names) / (len(missing_names) + len(matched_names))
+            discrepancies.append({'category': 'навыки', 'issue': 'В резюме не указаны требуемые навыки: ' + ', '.join(missing_names), 'severity': 'high' if share > 0.7 else 'medium' if share > 0.3 else 'low'})
+        (job_city, resume_city) = (_city(job.location), _city(resume.location))
+        remote = bool(REMOTE_RE.search(' '.join(filter(None, [job.location, job.employment_type, job.description]))))
+        if job_city and resume_city and job_city != resume_city and not remote:
+            discrepancies.append({'category': 'город', 'issue': f'Кандидат из города {resume.location}, вакансия в {job.location}', 'severity': 'medium'})
+        elif job_city and job_city == resume_city:
+            strengths.append('Живет в городе вакансии')
+        level = (job.experience_level or '').lower()
+        years = _years(resume.experience)
+        if level in LEVEL_MIN_YEARS and LEVEL_MIN_YEARS[level]:
+            needed = LEVEL_MIN_YEARS[level]
+            if years is None:
+                discrepancies.append({'category': 'опыт', 'issue': f'Не указан стаж, вакансия уровня {level}', 'severity': 'low'})
+            elif years < needed:
+                discrepancies.append({'category': 'опыт', 'issue': f'Опыт {years:g} лет при требуемом уровне {level} (от {needed} лет)', 'severity': 'high' if years < needed - 2 else 'medium'})
+            else:
+                strengths.append(f'Опыт {years:g} лет соответствует уровню {level}')
+        if resume.desired_salary and job.salary_max:
+            (desired, ceiling) = (float(resume.desired_salary), float(job.salary_max))
+            if desired > ceiling * 1.1:
+                discrepancies.append({'category': 'зарплата', 'issue': f'Ожидания {desired:,.0f} выше вилки вакансии (до {ceiling:,.0f})', 'severity': 'high' if desired > ceiling * 1.3 else 'medium'})
+        if DEGREE_RE.search(_job_text(job)) and not (resume.education or '').strip():
+            discrepancies.append({'category': 'образование', 'issue': 'Не указано образование, а вакансия его требует', 'severity': 'low'})
+        score = 35 + 65 * fit - sum((SEVERITY_PENALTY.get(d['severity'], 8) for d in discrepancies))
+        score = int(round(min(100.0, max(0.0, score))))
+        recommendation = 'recommend' if score >= 80 else 'consider' if score >= 60 else 'reject'
+        return {'initial_score': score, 'discrepancies': discrepancies, 'questions': [], 'strengths': strengths, 'concerns': [d['issue'] for d in discrepancies], 'recommendation': recommendation, 'similarity': round(similarity, 4), 'source': 'prescoring'}
+prescoring_engine = PrescoringEngine(borderline_min=settings.prescoring_borderline_min, borderline_max=settings.prescoring_borderline_max, refit_interval=settings.prescoring_refit_interval, corpus_limit=settings.prescoring_corpus_limit)
\ No newline at end of file
@@ -0,0 +1,118 @@
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+from core.config import settings
+from core.metrics import metrics
+try:
+    import tiktoken
+except Exception:
+    tiktoken = None
+SENTENCE_END_RE = re.compile('(?<=[.!?;\\n])\\s+')
+TRUNCATION_MARK = ' …'
+OMITTED_MARK = '… (более ранние сообщения опущены)'
+
+class TokenCounter:
+
+    def __init__(self, encoding_name: str='cl100k_base', max_entries: int=8192, chars_per_token: float=3.0) -> None:
+        self.max_entries = max_entries
+        self.chars_per_token = chars_per_token
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.get_encoding(encoding_name)
+            except Exception:
+                self._encoding = None
+        self._counts: 'OrderedDict[str, int]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def exact(self) -> bool:
+        return self._encoding is not None
+
+    def _encode_count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return -(-len(text) // int(self.chars_per_token))
+
+    def count(self, text: Optional[str]) -> int:
+        if not text:
+            return 0
+        key = hashlib.sha1(text.encode()).hexdigest()
+        with self._lock:
+            cached = self._counts.get(key)
+            if cached is not None:
+                self._counts.move_to_end(key)
+        if cached is not None:
+            metrics.inc('prompt_token_count_cache_hits_total')
+            return cached
+        tokens = self._encode_count(text)
+        with self._lock:
+            self._counts[key] = tokens
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return tokens
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self.count(text) <= max_tokens:
+            return text
+        if self._encoding is not None:
+            head = self._encoding.decode(self._encoding.encode(text, disallowed_special=())[:max_tokens])
+        else:
+            head = text[:int(max_tokens * self.chars_per_token)]
+        sentences = SENTENCE_END_RE.split(head)
+        if len(sentences) > 1 and len(head) - len(sentences[-1]) > len(head) // 2:
+            head = head[:len(head) - len(sentences[-1])]
+        elif ' ' in head[len(head) // 2:]:
+            head = head[:head.rindex(' ')]
+        return head.rstrip() + TRUNCATION_MARK
+
+class PromptBudget:
+
+    def __init__(self, counter: TokenCounter) -> None:
+        self.counter = counter
+
+    def fit_fields(self, task: str, fields: Dict[str, Optional[str]], budgets: Dict[str, int]) -> Dict[str, Optional[str]]:
+        fitted = dict(fields)
+        for (name, budget) in budgets.items():
+            value = fields.get(name)
+            if not isinstance(value, str):
+                continue
+            tokens = self.counter.count(value)
+            if tokens > budget:
+                fitted[name] = self.counter.truncate(value, budget)
+                metrics.inc('prompt_truncations_total', task=task, section=name)
+            metrics.observe('prompt_section_tokens', min(tokens, budget), task=task, section=name)
+        return fitted
+
+    def _tail_size(self, task: str, contents: Sequence[Optional[str]], budget: int) -> int:
+        used = 0
+        kept = 0
+        for content in reversed(contents):
+            tokens = self.counter.count(content)
+            if used + tokens > budget:
+                metrics.inc('prompt_truncations_total', task=task, section='history')
+                break
+            used += tokens
+            kept += 1
+        metrics.observe('prompt_section_tokens', used, task=task, section='history')
+        return kept
+
+    def fit_recent(self, task: str, lines: Sequence[str], budget: int) -> List[str]:
+        kept = self._tail_size(task, lines, budget)
+        if kept == 0 and lines:
+            return [OMITTED_MARK, self.counter.truncate(lines[-1], budget)]
+        tail = list(lines[len(lines) - kept:])
+        return [OMITTED_MARK] + tail if kept < len(lines) else tail
+
+    def fit_messages(self, task: str, messages: Sequence[Dict[str, str]], budget: int) -> List[Dict[str, str]]:
+        kept = self._tail_size(task, [m.get('content') for m in messages], budget)
+        if kept == 0 and messages:
+            return [{**messages[-1], 'content': self.counter.truncate(messages[-1].get('content') or '', budget)}]
+        return list(messages[len(messages) - kept:])
+
+    def count_messages(self, messages: Sequence[Dict[str, str]]) -> int:
+        return sum((self.counter.count(m.get('content')) + 4 for m in messages))
+token_counter = TokenCounter(max_entries=settings.prompt_token_cache_entries)
+prompt_budget = PromptBudget(token_counter)
\ No newline at end of file
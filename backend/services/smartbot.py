@@ -1,25 +1,40 @@
 import uuid
-from typing import Optional, List
-from sqlalchemy.orm import Session
+import time
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, Optional, List, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from core.config import settings
+from core.db import AsyncSessionLocal
+from core.metrics import metrics
 from models.chat import AIChatSession, AIChatMessage, MessageRole
 from schemas.chat import ChatResponse
+from services.llm_client import llm_client
+from services.model_router import model_router
+from services.prompt_budget import prompt_budget
+logger = logging.getLogger(__name__)
+SYSTEM_MESSAGE = {'role': 'system', 'content': 'Вы SmartBot - умный помощник по поиску работы и карьерному развитию. \n                Ваша задача помогать пользователям с:\n                - Поиском подходящих вакансий\n                - Составлением и улучшением резюме\n                - Подготовкой к собеседованиям\n                - Карьерными советами\n                - Развитием профессиональных навыков\n                Отвечайте дружелюбно, профессионально и по существу. \n                Если вопрос не связан с карьерой, вежливо перенаправьте разговор на профессиональные темы.'}
 
 class SmartBotService:
 
-    def __init__(self):
-        self.openai_available = bool(settings.openai_api_key)
+    def __init__(self) -> None:
+        self._summarizing: Dict[str, asyncio.Task] = {}
 
-    def get_or_create_session(self, db: Session, session_id: Optional[str]=None, user_id: Optional[int]=None) -> AIChatSession:
+    @property
+    def openai_available(self) -> bool:
+        return llm_client.available
+
+    async def get_or_create_session(self, db: AsyncSession, session_id: Optional[str]=None, user_id: Optional[int]=None) -> AIChatSession:
         if session_id:
-            session = db.query(AIChatSession).filter(AIChatSession.session_id == session_id).first()
+            session = await db.scalar(select(AIChatSession).filter(AIChatSession.session_id == session_id))
             if session:
                 return session
         new_session_id = str(uuid.uuid4())
         session = AIChatSession(session_id=new_session_id, user_id=user_id)
         db.add(session)
-        db.commit()
-        db.refresh(session)
+        await db.commit()
+        await db.refresh(session)
         return session
 
     def get_demo_response(self, message: str) -> str:
@@ -42,28 +57,72 @@ class SmartBotService:
             return 'Интересный вопрос! Как SmartBot, я специализируюсь на помощи с поиском работы, составлением резюме и карьерными вопросами. Можете переформулировать ваш вопрос в контексте карьеры?'
 
     async def get_openai_response(self, messages: List[dict]) -> str:
-        if not settings.openai_api_key:
+        if not self.openai_available:
             return self.get_demo_response(messages[-1].get('content', ''))
         try:
-            from openai import AsyncOpenAI
-            client = AsyncOpenAI(api_key=settings.openai_api_key)
-            system_message = {'role': 'system', 'content': 'Вы SmartBot - умный помощник по поиску работы и карьерному развитию. \n                Ваша задача помогать пользователям с:\n                - Поиском подходящих вакансий\n                - Составлением и улучшением резюме\n                - Подготовкой к собеседованиям\n                - Карьерными советами\n                - Развитием профессиональных навыков\n                Отвечайте дружелюбно, профессионально и по существу. \n                Если вопрос не связан с карьерой, вежливо перенаправьте разговор на профессиональные темы.'}
-            full_messages = [system_message] + messages
-            response = await client.chat.completions.create(model='gpt-3.5-turbo', messages=full_messages, max_tokens=500, temperature=0.7)
-            return response.choices[0].message.content
+            full_messages = [SYSTEM_MESSAGE] + messages
+            return await model_router.chat('chat', full_messages, temperature=0.7)
         except Exception as e:
             print(f'OpenAI API error: {e}')
             return 'Извините, произошла ошибка при обработке вашего запроса. Попробуйте еще раз.'
 
-    async def chat(self, db: Session, message: str, session_id: Optional[str]=None, user_id: Optional[int]=None) -> ChatResponse:
-        session = self.get_or_create_session(db, session_id, user_id)
+    async def _prepare_turn(self, db: AsyncSession, message: str, session_id: Optional[str], user_id: Optional[int]) -> Tuple[AIChatSession, List[dict]]:
+        session = await self.get_or_create_session(db, session_id, user_id)
         user_message = AIChatMessage(session_id=session.session_id, role=MessageRole.USER, content=message)
         db.add(user_message)
-        db.commit()
-        messages = db.query(AIChatMessage).filter(AIChatMessage.session_id == session.session_id).order_by(AIChatMessage.created_at).all()
+        await db.commit()
+        query = select(AIChatMessage).filter(AIChatMessage.session_id == session.session_id)
+        if session.summary_through_id is not None:
+            query = query.filter(AIChatMessage.id > session.summary_through_id)
+        tail = (await db.scalars(query.order_by(AIChatMessage.id.desc()).limit(settings.chat_tail_messages + 4 * settings.chat_summary_every_turns))).all()
         conversation_messages = []
-        for msg in messages[-10:]:
+        for msg in reversed(tail):
             conversation_messages.append({'role': msg.role.value, 'content': msg.content})
+        conversation_messages = prompt_budget.fit_messages('chat', conversation_messages, settings.prompt_chat_history_tokens)
+        if session.summary:
+            conversation_messages.insert(0, {'role': 'system', 'content': f'Краткое содержание предыдущей части беседы: {session.summary}'})
+        return (session, conversation_messages)
+
+    async def _save_reply(self, db: AsyncSession, session: AIChatSession, ai_response: str) -> None:
+        assistant_message = AIChatMessage(session_id=session.session_id, role=MessageRole.ASSISTANT, content=ai_response)
+        db.add(assistant_message)
+        pending = (await db.execute(update(AIChatSession).where(AIChatSession.id == session.id).values(messages_since_summary=AIChatSession.messages_since_summary + 2).returning(AIChatSession.messages_since_summary))).scalar()
+        await db.commit()
+        if self.openai_available and pending is not None and pending - settings.chat_tail_messages >= 2 * settings.chat_summary_every_turns and session.session_id not in self._summarizing:
+            session_id = session.session_id
+            self._summarizing[session_id] = asyncio.create_task(self._update_summary(session_id))
+            self._summarizing[session_id].add_done_callback(lambda _: self._summarizing.pop(session_id, None))
+
+    async def _update_summary(self, session_id: str) -> None:
+        started = time.perf_counter()
+        try:
+            async with AsyncSessionLocal() as db:
+                session = await db.scalar(select(AIChatSession).filter(AIChatSession.session_id == session_id))
+                if session is None:
+                    return
+                tail_start = await db.scalar(select(AIChatMessage.id).filter(AIChatMessage.session_id == session_id).order_by(AIChatMessage.id.desc()).offset(settings.chat_tail_messages - 1).limit(1))
+                if tail_start is None:
+                    return
+                query = select(AIChatMessage).filter(AIChatMessage.session_id == session_id, AIChatMessage.id < tail_start).order_by(AIChatMessage.id).limit(4 * settings.chat_summary_every_turns)
+                if session.summary_through_id is not None:
+                    query = query.filter(AIChatMessage.id > session.summary_through_id)
+                folded = (await db.scalars(query)).all()
+                if not folded:
+                    return
+                transcript = '\n'.join((f'{msg.role.value}: {prompt_budget.counter.truncate(msg.content, settings.prompt_resume_field_tokens)}' for msg in folded))
+                prompt = f"ТЕКУЩЕЕ КРАТКОЕ СОДЕРЖАНИЕ:\n{session.summary or '(пусто)'}\nНОВЫЕ СООБЩЕНИЯ:\n{transcript}\nОбнови краткое содержание беседы с учетом новых сообщений: цели пользователя, его навыки и опыт, что уже обсудили и посоветовали. Не больше 5-6 предложений, на языке беседы."
+                summary = await model_router.chat('summary', [{'role': 'system', 'content': 'Ты ведешь краткий конспект карьерной консультации.'}, {'role': 'user', 'content': prompt}], temperature=0.3)
+                result = await db.execute(update(AIChatSession).where(AIChatSession.id == session.id, AIChatSession.summary_through_id.is_not_distinct_from(session.summary_through_id)).values(summary=summary.strip(), summary_through_id=folded[-1].id, messages_since_summary=AIChatSession.messages_since_summary - len(folded)))
+                await db.commit()
+                metrics.inc('chat_summary_updates_total', status='ok' if result.rowcount else 'conflict')
+        except Exception as e:
+            metrics.inc('chat_summary_updates_total', status='error')
+            logger.warning(f'Failed to update chat summary for {session_id}: {e}')
+        finally:
+            metrics.observe('chat_summary_seconds', time.perf_counter() - started)
+
+    async def chat(self, db: AsyncSession, message: str, session_id: Optional[str]=None, user_id: Optional[int]=None) -> ChatResponse:
+        (session, conversation_messages) = await self._prepare_turn(db, message, session_id, user_id)
         if self.openai_available:
             try:
                 ai_response = await self.get_openai_response(conversation_messages)
@@ -71,8 +130,26 @@ class SmartBotService:
                 ai_response = self.get_demo_response(message)
         else:
             ai_response = self.get_demo_response(message)
-        assistant_message = AIChatMessage(session_id=session.session_id, role=MessageRole.ASSISTANT, content=ai_response)
-        db.add(assistant_message)
-        db.commit()
+        await self._save_reply(db, session, ai_response)
         return ChatResponse(message=ai_response, session_id=session.session_id)
+
+    async def chat_stream(self, db: AsyncSession, message: str, session_id: Optional[str]=None, user_id: Optional[int]=None) -> AsyncIterator[dict]:
+        (session, conversation_messages) = await self._prepare_turn(db, message, session_id, user_id)
+        yield {'event': 'session', 'session_id': session.session_id}
+        parts: List[str] = []
+        if self.openai_available:
+            try:
+                full_messages = [SYSTEM_MESSAGE] + conversation_messages
+                async for delta in model_router.stream('chat', full_messages, temperature=0.7, model=model_router.choose('chat', full_messages)):
+                    parts.append(delta)
+                    yield {'event': 'chat_delta', 'session_id': session.session_id, 'delta': delta}
+            except Exception as e:
+                metrics.inc('chat_stream_errors_total')
+                logger.warning(f'Chat stream failed for {session.session_id}: {e}')
+        if not parts:
+            parts = [self.get_demo_response(message)]
+            yield {'event': 'chat_delta', 'session_id': session.session_id, 'delta': parts[0]}
+        ai_response = ''.join(parts)
+        await self._save_reply(db, session, ai_response)
+        yield {'event': 'chat_done', 'session_id': session.session_id, 'message': ai_response}
 smartbot_service = SmartBotService()
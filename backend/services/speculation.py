@@ -0,0 +1,97 @@
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Sequence
+from core.config import settings
+from core.metrics import metrics
+logger = logging.getLogger(__name__)
+
+def state_key(message_ids: Sequence[Any]) -> str:
+    return hashlib.sha1(','.join((str(i) for i in message_ids)).encode()).hexdigest()
+
+class Speculation:
+
+    def __init__(self, kind: str, key: str, task: 'asyncio.Task[Any]') -> None:
+        self.kind = kind
+        self.key = key
+        self.task = task
+        self.created = time.monotonic()
+
+class SpeculativeCache:
+
+    def __init__(self, ttl: float, max_sessions: int) -> None:
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: 'OrderedDict[str, dict[str, Speculation]]' = OrderedDict()
+
+    def _drop(self, speculation: Speculation, reason: str) -> None:
+        if not speculation.task.done():
+            speculation.task.cancel()
+        metrics.inc('speculation_discarded_total', kind=speculation.kind, reason=reason)
+
+    def _sweep(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        for session_id in [s for (s, entries) in self._sessions.items() if all((e.created < cutoff for e in entries.values()))]:
+            for speculation in self._sessions.pop(session_id).values():
+                self._drop(speculation, 'expired')
+        while len(self._sessions) > self.max_sessions:
+            (_, entries) = self._sessions.popitem(last=False)
+            for speculation in entries.values():
+                self._drop(speculation, 'evicted')
+        metrics.set_gauge('speculation_sessions', len(self._sessions))
+
+    def schedule(self, session_id: str, kind: str, key: str, factory: Callable[[], Awaitable[Any]]) -> None:
+        entries = self._sessions.setdefault(session_id, {})
+        self._sessions.move_to_end(session_id)
+        previous = entries.pop(kind, None)
+        if previous is not None:
+            self._drop(previous, 'superseded')
+
+        async def run() -> Any:
+            started = time.perf_counter()
+            try:
+                return await factory()
+            except Exception as e:
+                logger.warning(f'Speculative {kind} for session {session_id} failed: {e}')
+                return None
+            finally:
+                metrics.observe('speculation_seconds', time.perf_counter() - started, kind=kind)
+
+        task = asyncio.create_task(run())
+        entries[kind] = Speculation(kind, key, task)
+        metrics.inc('speculation_started_total', kind=kind)
+        self._sweep()
+
+    def take(self, session_id: str, kind: str, key: str, ready_only: bool=False) -> Optional['asyncio.Task[Any]']:
+        entries = self._sessions.get(session_id)
+        speculation = entries.pop(kind, None) if entries is not None else None
+        if entries is not None and not entries:
+            self._sessions.pop(session_id, None)
+        if speculation is None:
+            metrics.inc('speculation_misses_total', kind=kind)
+            return None
+        if speculation.key != key:
+            self._drop(speculation, 'stale')
+            return None
+        if speculation.task.done() and (speculation.task.cancelled() or speculation.task.result() is None):
+            self._drop(speculation, 'failed')
+            return None
+        if ready_only and not speculation.task.done():
+            self._drop(speculation, 'not_ready')
+            return None
+        metrics.inc('speculation_hits_total', kind=kind)
+        return speculation.task
+
+    def discard(self, session_id: str, kind: Optional[str]=None, reason: str='invalidated') -> None:
+        entries = self._sessions.get(session_id)
+        if entries is None:
+            return
+        for name in [kind] if kind else list(entries):
+            speculation = entries.pop(name, None)
+            if speculation is not None:
+                self._drop(speculation, reason)
+        if not entries:
+            self._sessions.pop(session_id, None)
+speculative_cache = SpeculativeCache(ttl=settings.speculation_ttl, max_sessions=settings.speculation_max_sessions)
\ No newline at end of file
@@ -1,52 +1,229 @@
-from typing import Dict, Set
-from fastapi import WebSocket
+from typing import Any, Deque, Dict, Hashable, List, Optional, Tuple
+from collections import OrderedDict, deque
+from fastapi import WebSocket, WebSocketDisconnect
 import asyncio
 import json
+import uuid
+from core.config import settings
+from core.metrics import metrics
+from services.event_bus import event_bus
+EPHEMERAL_EVENTS = {'chat_delta'}
+
+class WSConnection:
+
+    def __init__(self, manager: 'WSManager', kind: str, topic: Hashable, websocket: WebSocket) -> None:
+        self.manager = manager
+        self.kind = kind
+        self.topic = topic
+        self.websocket = websocket
+        self.queue: 'asyncio.Queue[str]' = asyncio.Queue(maxsize=manager.queue_size)
+        self.closed = False
+        self.sender: Optional[asyncio.Task] = None
+        self.last_seen = asyncio.get_running_loop().time()
+
+    def start(self) -> None:
+        self.sender = asyncio.create_task(self._run())
+
+    def offer(self, message: str) -> bool:
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            return False
+        metrics.add_gauge('ws_queue_depth', 1, kind=self.kind)
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            message = await self.queue.get()
+            metrics.add_gauge('ws_queue_depth', -1, kind=self.kind)
+            try:
+                await asyncio.wait_for(self.websocket.send_text(message), timeout=self.manager.send_timeout)
+            except asyncio.TimeoutError:
+                await self.manager.evict(self, 'send_timeout')
+                return
+            except Exception:
+                await self.manager.evict(self, 'send_error')
+                return
+            metrics.inc('ws_messages_sent_total', kind=self.kind)
+
+    def stop(self) -> None:
+        self.closed = True
+        pending = self.queue.qsize()
+        if pending:
+            metrics.add_gauge('ws_queue_depth', -pending, kind=self.kind)
+            metrics.inc('ws_messages_dropped_total', pending, kind=self.kind, reason='disconnect')
+        if self.sender is not None and self.sender is not asyncio.current_task():
+            self.sender.cancel()
+
+class TopicHistory:
+
+    def __init__(self, size: int) -> None:
+        self.seq = 0
+        self.events: Deque[Tuple[int, str]] = deque(maxlen=size)
 
 class WSManager:
 
-    def __init__(self) -> None:
-        self.job_connections: Dict[int, Set[WebSocket]] = {}
-        self.session_connections: Dict[str, Set[WebSocket]] = {}
+    def __init__(self, queue_size: Optional[int]=None, send_timeout: Optional[float]=None, replay_size: Optional[int]=None, replay_max_topics: Optional[int]=None, ping_interval: Optional[float]=None, idle_timeout: Optional[float]=None) -> None:
+        self.queue_size = queue_size if queue_size is not None else settings.ws_send_queue_size
+        self.send_timeout = send_timeout if send_timeout is not None else settings.ws_send_timeout
+        self.ping_interval = ping_interval if ping_interval is not None else settings.ws_ping_interval
+        self.idle_timeout = idle_timeout if idle_timeout is not None else settings.ws_idle_timeout
+        self.replay_size = replay_size if replay_size is not None else settings.ws_replay_buffer_size
+        self.replay_max_topics = replay_max_topics if replay_max_topics is not None else settings.ws_replay_max_topics
+        self.epoch = uuid.uuid4().hex[:12]
+        self.job_connections: Dict[int, Dict[WebSocket, WSConnection]] = {}
+        self.session_connections: Dict[str, Dict[WebSocket, WSConnection]] = {}
+        self._history: 'OrderedDict[Tuple[str, Hashable], TopicHistory]' = OrderedDict()
         self._lock = asyncio.Lock()
 
-    async def connect_job(self, job_id: int, websocket: WebSocket) -> None:
-        async with self._lock:
-            self.job_connections.setdefault(job_id, set()).add(websocket)
+    def _registry(self, kind: str) -> Dict[Any, Dict[WebSocket, WSConnection]]:
+        return self.job_connections if kind == 'job' else self.session_connections
 
-    async def disconnect_job(self, job_id: int, websocket: WebSocket) -> None:
+    def _encode(self, payload: dict) -> str:
+        return json.dumps(payload, separators=(',', ':'), ensure_ascii=False, default=str)
+
+    def _record(self, kind: str, topic: Hashable, payload: dict) -> str:
+        key = (kind, topic)
+        history = self._history.get(key)
+        if history is None:
+            history = self._history[key] = TopicHistory(self.replay_size)
+            while len(self._history) > self.replay_max_topics:
+                self._history.popitem(last=False)
+            metrics.set_gauge('ws_replay_topics', len(self._history))
+        self._history.move_to_end(key)
+        history.seq += 1
+        message = self._encode({**payload, 'seq': history.seq, 'epoch': self.epoch})
+        history.events.append((history.seq, message))
+        return message
+
+    def current_seq(self, kind: str, topic: Hashable) -> int:
+        history = self._history.get((kind, topic))
+        return history.seq if history else 0
+
+    def _replay(self, kind: str, topic: Hashable, since: int, epoch: Optional[str]) -> Optional[List[str]]:
+        if epoch is not None and epoch != self.epoch:
+            return None
+        history = self._history.get((kind, topic))
+        if history is None:
+            return [] if since == 0 else None
+        if since > history.seq:
+            return None
+        oldest = history.events[0][0] if history.events else history.seq + 1
+        if since < oldest - 1:
+            return None
+        return [message for (seq, message) in history.events if seq > since]
+
+    async def _connect(self, kind: str, topic: Hashable, websocket: WebSocket, since: Optional[int]=None, epoch: Optional[str]=None) -> WSConnection:
+        conn = WSConnection(self, kind, topic, websocket)
         async with self._lock:
-            conns = self.job_connections.get(job_id)
-            if conns and websocket in conns:
-                conns.remove(websocket)
-                if len(conns) == 0:
-                    self.job_connections.pop(job_id, None)
+            previous = self._registry(kind).setdefault(topic, {}).pop(websocket, None)
+            self._registry(kind)[topic][websocket] = conn
+        if previous is not None:
+            previous.stop()
+        else:
+            metrics.add_gauge('ws_connections', 1, kind=kind)
+        topic_field = 'job_id' if kind == 'job' else 'session_id'
+        current = self.current_seq(kind, topic)
+        conn.offer(self._encode({'event': 'subscribed', topic_field: topic, 'seq': current, 'epoch': self.epoch}))
+        if since is not None:
+            backlog = self._replay(kind, topic, since, epoch)
+            if backlog is None or len(backlog) >= self.queue_size:
+                metrics.inc('ws_resync_total', kind=kind)
+                conn.offer(self._encode({'event': 'resync_required', topic_field: topic, 'seq': current, 'epoch': self.epoch}))
+            else:
+                metrics.inc('ws_replayed_events_total', len(backlog), kind=kind)
+                for message in backlog:
+                    conn.offer(message)
+        conn.start()
+        return conn
 
-    async def connect_session(self, session_id: str, websocket: WebSocket) -> None:
+    async def _disconnect(self, kind: str, topic: Hashable, websocket: WebSocket) -> Optional[WSConnection]:
         async with self._lock:
-            self.session_connections.setdefault(session_id, set()).add(websocket)
+            conns = self._registry(kind).get(topic)
+            conn = conns.pop(websocket, None) if conns else None
+            if conns is not None and len(conns) == 0:
+                self._registry(kind).pop(topic, None)
+        if conn is not None:
+            conn.stop()
+            metrics.add_gauge('ws_connections', -1, kind=kind)
+        return conn
+
+    async def connect_job(self, job_id: int, websocket: WebSocket, since: Optional[int]=None, epoch: Optional[str]=None) -> WSConnection:
+        return await self._connect('job', job_id, websocket, since, epoch)
+
+    async def disconnect_job(self, job_id: int, websocket: WebSocket) -> None:
+        await self._disconnect('job', job_id, websocket)
+
+    async def connect_session(self, session_id: str, websocket: WebSocket, since: Optional[int]=None, epoch: Optional[str]=None) -> WSConnection:
+        return await self._connect('session', session_id, websocket, since, epoch)
 
     async def disconnect_session(self, session_id: str, websocket: WebSocket) -> None:
-        async with self._lock:
-            conns = self.session_connections.get(session_id)
-            if conns and websocket in conns:
-                conns.remove(websocket)
-                if len(conns) == 0:
-                    self.session_connections.pop(session_id, None)
+        await self._disconnect('session', session_id, websocket)
+
+    async def serve(self, conn: WSConnection) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while not conn.closed:
+                try:
+                    frame = await asyncio.wait_for(conn.websocket.receive(), timeout=self.ping_interval)
+                except asyncio.TimeoutError:
+                    if loop.time() - conn.last_seen > self.idle_timeout:
+                        await self.evict(conn, 'idle', code=1001)
+                        return
+                    conn.offer(self._encode({'event': 'ping'}))
+                    continue
+                if frame['type'] == 'websocket.disconnect':
+                    return
+                conn.last_seen = loop.time()
+                raw = frame.get('text')
+                if raw is None:
+                    continue
+                try:
+                    message = json.loads(raw)
+                except ValueError:
+                    continue
+                if isinstance(message, dict) and message.get('event') == 'ping':
+                    conn.offer(self._encode({'event': 'pong'}))
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            await self._disconnect(conn.kind, conn.topic, conn.websocket)
+
+    async def evict(self, conn: WSConnection, reason: str, code: int=1013) -> None:
+        if await self._disconnect(conn.kind, conn.topic, conn.websocket) is None:
+            return
+        metrics.inc('ws_reaped_total', kind=conn.kind, reason=reason)
+        asyncio.create_task(self._close(conn.websocket, code))
+
+    async def _close(self, websocket: WebSocket, code: int) -> None:
+        try:
+            await asyncio.wait_for(websocket.close(code=code), timeout=self.send_timeout)
+        except Exception:
+            pass
+
+    async def deliver(self, kind: str, topic: Hashable, payload: dict) -> None:
+        if payload.get('event') in EPHEMERAL_EVENTS:
+            message = self._encode(payload)
+        else:
+            message = self._record(kind, topic, payload)
+        conns = list(self._registry(kind).get(topic, {}).values())
+        if not conns:
+            return
+        slow = []
+        for conn in conns:
+            if not conn.offer(message):
+                slow.append(conn)
+        metrics.inc('ws_messages_enqueued_total', len(conns) - len(slow), kind=kind)
+        for conn in slow:
+            metrics.inc('ws_messages_dropped_total', kind=kind, reason='queue_full')
+            await self.evict(conn, 'queue_full')
 
     async def broadcast_job(self, job_id: int, payload: dict) -> None:
-        conns = list(self.job_connections.get(job_id, set()))
-        for ws in conns:
-            try:
-                await ws.send_json(payload)
-            except Exception:
-                await self.disconnect_job(job_id, ws)
+        await event_bus.publish('job', job_id, payload)
 
     async def broadcast_session(self, session_id: str, payload: dict) -> None:
-        conns = list(self.session_connections.get(session_id, set()))
-        for ws in conns:
-            try:
-                await ws.send_json(payload)
-            except Exception:
-                await self.disconnect_session(session_id, ws)
-ws_manager = WSManager()
\ No newline at end of file
+        await event_bus.publish('session', session_id, payload)
+ws_manager = WSManager()
+event_bus.subscribe(ws_manager.deliver)
\ No newline at end of file
@@ -0,0 +1,23 @@
+-- =========================
+-- КЭШ ПЕРВИЧНОГО АНАЛИЗА SmartBot
+-- =========================
+-- ключ — sha256 от нормализованных данных вакансии и резюме, модели и версии промпта;
+-- правка вакансии/резюме меняет ключ, поэтому старые записи просто не находятся;
+-- они удаляются по TTL и при превышении ANALYSIS_CACHE_MAX_ENTRIES
+CREATE TABLE IF NOT EXISTS analysis_cache (
+    id              SERIAL PRIMARY KEY,
+    fingerprint     VARCHAR(64) NOT NULL UNIQUE,
+    job_id          INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    resume_id       INTEGER NOT NULL REFERENCES resumes(id) ON DELETE CASCADE,
+    model           VARCHAR(100) NOT NULL,
+    prompt_version  VARCHAR(20) NOT NULL,
+    result          JSONB NOT NULL,
+    hit_count       INTEGER NOT NULL DEFAULT 0,
+    created_at      TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    last_hit_at     TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    expires_at      TIMESTAMP WITH TIME ZONE NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analysis_cache_job_id ON analysis_cache(job_id);
+CREATE INDEX IF NOT EXISTS idx_analysis_cache_resume_id ON analysis_cache(resume_id);
+CREATE INDEX IF NOT EXISTS idx_analysis_cache_expires_at ON analysis_cache(expires_at);
+CREATE INDEX IF NOT EXISTS idx_analysis_cache_last_hit ON analysis_cache(last_hit_at DESC, id DESC);
\ No newline at end of file
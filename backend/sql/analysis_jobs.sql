@@ -0,0 +1,29 @@
+-- =========================
+-- ОЧЕРЕДЬ ФОНОВОГО АНАЛИЗА SmartBot
+-- =========================
+-- задания забираются воркерами через SELECT ... FOR UPDATE SKIP LOCKED (см. run_worker.py)
+CREATE TABLE IF NOT EXISTS analysis_jobs (
+    id              SERIAL PRIMARY KEY,
+    kind            VARCHAR(50) NOT NULL,
+    payload         JSONB,
+    status          VARCHAR(20) NOT NULL DEFAULT 'queued'
+                     CHECK (status IN ('queued','running','succeeded','dead')),
+    application_id  INTEGER REFERENCES job_applications(id) ON DELETE CASCADE,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    max_attempts    INTEGER NOT NULL DEFAULT 3,
+    run_at          TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    locked_at       TIMESTAMP WITH TIME ZONE,
+    locked_by       VARCHAR(255),
+    last_error      TEXT,
+    result          JSONB,
+    created_at      TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at      TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    finished_at     TIMESTAMP WITH TIME ZONE
+);
+-- частичный индекс: воркер сканирует только готовые к запуску задания
+CREATE INDEX IF NOT EXISTS idx_analysis_jobs_ready ON analysis_jobs(run_at, id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_analysis_jobs_running ON analysis_jobs(locked_at) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS idx_analysis_jobs_application_id ON analysis_jobs(application_id);
+DROP TRIGGER IF EXISTS trg_analysis_jobs_updated ON analysis_jobs;
+CREATE TRIGGER trg_analysis_jobs_updated BEFORE UPDATE ON analysis_jobs
+FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
\ No newline at end of file
@@ -0,0 +1,13 @@
+-- =========================
+-- JSONB-ПОЛЯ АНАЛИЗА КАНДИДАТА
+-- =========================
+-- раньше в JSONB-колонки записывалась строка с сериализованным JSON ("[\"...\"]");
+-- разворачиваем такие значения в настоящие массивы и объекты
+UPDATE candidate_analyses SET strengths = (strengths #>> '{}')::jsonb WHERE jsonb_typeof(strengths) = 'string';
+UPDATE candidate_analyses SET weaknesses = (weaknesses #>> '{}')::jsonb WHERE jsonb_typeof(weaknesses) = 'string';
+UPDATE candidate_analyses SET missing_requirements = (missing_requirements #>> '{}')::jsonb WHERE jsonb_typeof(missing_requirements) = 'string';
+UPDATE candidate_analyses SET clarifications_received = (clarifications_received #>> '{}')::jsonb WHERE jsonb_typeof(clarifications_received) = 'string';
+-- уточнения хранятся как {"items": [...]}: ответ кандидата дописывается через jsonb_set(..., '{items}', items || ...)
+UPDATE candidate_analyses SET clarifications_received = jsonb_build_object('items', clarifications_received) WHERE jsonb_typeof(clarifications_received) = 'array';
+UPDATE candidate_analyses SET clarifications_received = '{"items": []}'::jsonb WHERE clarifications_received IS NULL OR jsonb_typeof(clarifications_received) <> 'object';
+UPDATE smartbot_messages SET message_metadata = (message_metadata #>> '{}')::jsonb WHERE jsonb_typeof(message_metadata) = 'string';
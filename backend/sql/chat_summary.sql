@@ -0,0 +1,10 @@
+-- =========================
+-- СВОДКА ДЛИННЫХ ДИАЛОГОВ AI-ЧАТА
+-- =========================
+-- summary — краткое содержание сообщений до summary_through_id включительно;
+-- в промпт попадает сводка и все сообщения после summary_through_id (с ограничением LIMIT)
+ALTER TABLE ai_chat_sessions ADD COLUMN IF NOT EXISTS summary TEXT;
+ALTER TABLE ai_chat_sessions ADD COLUMN IF NOT EXISTS summary_through_id INTEGER;
+ALTER TABLE ai_chat_sessions ADD COLUMN IF NOT EXISTS messages_since_summary INTEGER NOT NULL DEFAULT 0;
+-- хвост диалога читается через ORDER BY id DESC LIMIT N
+CREATE INDEX IF NOT EXISTS idx_ai_chat_messages_session_id_id ON ai_chat_messages(session_id, id);
\ No newline at end of file
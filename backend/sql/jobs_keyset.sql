@@ -0,0 +1,5 @@
+-- =========================
+-- KEYSET-ПАГИНАЦИЯ ВАКАНСИЙ
+-- =========================
+-- GET /api/jobs?pagination=cursor идёт по (created_at, id) DESC только среди активных вакансий
+CREATE INDEX IF NOT EXISTS idx_jobs_active_created_id ON jobs(created_at DESC, id DESC) WHERE is_active;
\ No newline at end of file
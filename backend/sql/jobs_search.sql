@@ -0,0 +1,19 @@
+-- =========================
+-- ПОЛНОТЕКСТОВЫЙ ПОИСК ПО ВАКАНСИЯМ
+-- =========================
+-- generated tsvector (русский + английский) с GIN-индексом вместо ILIKE '%...%',
+-- плюс триграммный индекс для нечёткого поиска по названию компании.
+-- Выражение должно совпадать с JOB_SEARCH_VECTOR_SQL в backend/models/jobs.py
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce(company_name, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(company_name, '')), 'B') ||
+    setweight(to_tsvector('russian', coalesce(description, '')), 'D') ||
+    setweight(to_tsvector('english', coalesce(description, '')), 'D')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_jobs_search_vector ON jobs USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_jobs_company_name_trgm ON jobs USING GIN (company_name gin_trgm_ops);
\ No newline at end of file
@@ -0,0 +1,9 @@
+-- =========================
+-- ИНДЕКСЫ ДИАЛОГОВ SmartBot
+-- =========================
+-- хвост диалога и страницы истории: ORDER BY created_at DESC, id DESC LIMIT N
+CREATE INDEX IF NOT EXISTS idx_smartbot_messages_session_created ON smartbot_messages(session_id, created_at, id);
+-- последний вопрос сессии при обработке ответа кандидата
+CREATE INDEX IF NOT EXISTS idx_smartbot_messages_session_questions ON smartbot_messages(session_id, created_at, id) WHERE message_type = 'question';
+-- категория анализа, к которой относится ответ
+CREATE INDEX IF NOT EXISTS idx_analysis_categories_analysis_category ON analysis_categories(analysis_id, category);
\ No newline at end of file
@@ -0,0 +1,12 @@
+-- =========================
+-- ШИНА СОБЫТИЙ WebSocket (EVENT_BUS_BACKEND=postgres)
+-- =========================
+-- события раздаются через LISTEN/NOTIFY на канале ws_events;
+-- payload NOTIFY ограничен 8000 байт, поэтому крупные события кладутся сюда,
+-- а в канал уходит только {"ref": id}. Строки старше EVENT_BUS_SPILL_TTL удаляются слушателями.
+CREATE TABLE IF NOT EXISTS ws_event_spill (
+    id          BIGSERIAL PRIMARY KEY,
+    payload     JSONB NOT NULL,
+    created_at  TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_ws_event_spill_created_at ON ws_event_spill(created_at);
\ No newline at end of file
@@ -0,0 +1,107 @@
+import sys
+import os
+import json
+import asyncio
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import pytest
+from sqlalchemy import delete
+import main
+from core.db import AsyncSessionLocal
+from core.metrics import metrics
+from models.chat import SmartBotMessage, SmartBotMessageType
+from services.application_analyzer import ApplicationAnalyzer, application_analyzer
+from services.model_router import model_router
+from services.speculation import speculative_cache, state_key
+from services.ws_manager import ws_manager
+from test_reanalysis import _cleanup, _database_available, _seed
+DRAFT = {'final_score': 70, 'summary': 'Черновик без последнего ответа', 'recommendation': 'consider'}
+REPORT = {'final_score': 82, 'summary': 'Готов к переезду, опыт подтвержден', 'recommendation': 'recommend'}
+
+class FakeScalars:
+
+    def all(self) -> list:
+        return []
+
+class FakeDB:
+
+    async def scalars(self, query) -> FakeScalars:
+        return FakeScalars()
+
+    async def scalar(self, query):
+        return SimpleNamespace(initial_score=70)
+
+def _hits() -> float:
+    return metrics.snapshot()['counters'].get('speculation_hits_total{kind=final_report}', 0)
+
+@pytest.fixture
+def llm(monkeypatch):
+    prompts = []
+
+    async def stream(task, messages, temperature, model=None):
+        prompts.append(messages[-1]['content'])
+        yield json.dumps(REPORT, ensure_ascii=False)
+
+    async def broadcast_session(session_id, event):
+        return None
+    monkeypatch.setattr(ApplicationAnalyzer, 'openai_available', property(lambda self: True))
+    monkeypatch.setattr(model_router, 'choose', lambda task, messages: model_router.large_model)
+    monkeypatch.setattr(model_router, 'stream', stream)
+    monkeypatch.setattr(ws_manager, 'broadcast_session', broadcast_session)
+    return prompts
+
+async def _draft():
+    return DRAFT
+
+def test_finalize_amends_speculative_draft(llm):
+
+    async def scenario() -> dict:
+        speculative_cache.schedule('finalize-draft', 'final_report', state_key([41]), _draft)
+        return await application_analyzer._finalize_analysis(FakeDB(), 'finalize-draft', state_key([41]), ('Готовы ли вы к переезду?', 'Да, готов'))
+    hits = _hits()
+    result = asyncio.run(scenario())
+    assert result == REPORT
+    assert _hits() == hits + 1
+    assert len(llm) == 1
+    assert 'Черновик финального отчета' in llm[0]
+    assert 'Да, готов' in llm[0]
+
+def test_finalize_without_last_turn_builds_full_report(llm):
+
+    async def scenario() -> dict:
+        speculative_cache.schedule('finalize-full', 'final_report', state_key([42]), _draft)
+        try:
+            return await application_analyzer._finalize_analysis(FakeDB(), 'finalize-full', state_key([42]))
+        finally:
+            speculative_cache.discard('finalize-full')
+    hits = _hits()
+    assert asyncio.run(scenario()) == REPORT
+    assert _hits() == hits
+    assert 'Черновик финального отчета' not in llm[0]
+
+def test_last_answer_uses_speculative_draft(llm, monkeypatch):
+    if not asyncio.run(_database_available()):
+        pytest.skip('PostgreSQL with SmartBot tables is not available')
+    monkeypatch.setattr(ApplicationAnalyzer, '_speculate', lambda self, *args: None)
+
+    async def scenario() -> dict:
+        async with AsyncSessionLocal() as db:
+            ids = await _seed(db)
+            question = SmartBotMessage(session_id=ids['session'], message_type=SmartBotMessageType.QUESTION.value, content='Готовы ли вы к переезду?', message_metadata={'question_category': 'город', 'remaining_questions': []})
+            db.add(question)
+            await db.commit()
+        try:
+            speculative_cache.schedule(ids['session'], 'final_report', state_key([question.id]), _draft)
+            async with AsyncSessionLocal() as db:
+                return await application_analyzer.process_candidate_response(db, ids['session'], 'Да, готов к переезду')
+        finally:
+            async with AsyncSessionLocal() as db:
+                await db.execute(delete(SmartBotMessage).where(SmartBotMessage.session_id == ids['session']))
+                await db.commit()
+                await _cleanup(db, ids)
+    hits = _hits()
+    result = asyncio.run(scenario())
+    assert result['is_completed'] is True
+    assert _hits() == hits + 1
+    assert 'Черновик финального отчета' in llm[0]
+    assert 'Да, готов к переезду' in llm[0]
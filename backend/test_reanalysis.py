@@ -0,0 +1,78 @@
+import sys
+import os
+import uuid
+import asyncio
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import pytest
+from sqlalchemy import select, delete, text
+import main
+from core.db import AsyncSessionLocal
+from models.users import User, UserType
+from models.jobs import Job
+from models.resumes import Resume
+from models.applications import JobApplication
+from models.chat import SmartBotSession, CandidateAnalysis, AnalysisCategory, AnalysisStatus
+from services.application_analyzer import ApplicationAnalyzer, application_analyzer
+
+async def _database_available() -> bool:
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(text('SELECT 1 FROM analysis_categories LIMIT 1'))
+        return True
+    except Exception:
+        return False
+
+async def _seed(db) -> dict:
+    suffix = uuid.uuid4().hex[:8]
+    employer = User(email=f'employer-{suffix}@example.com', hashed_password='x', full_name='Employer', user_type=UserType.EMPLOYER)
+    candidate = User(email=f'candidate-{suffix}@example.com', hashed_password='x', full_name='Candidate', user_type=UserType.JOB_SEEKER)
+    db.add_all([employer, candidate])
+    await db.flush()
+    job = Job(title='Python разработчик', description='Разработка backend на Python и PostgreSQL', requirements='Python, SQL', location='Алматы', company_name='ТехКорп', employer_id=employer.id)
+    resume = Resume(title='Python developer', skills='Python, SQL', experience='3 года', location='Астана', user_id=candidate.id)
+    db.add_all([job, resume])
+    await db.flush()
+    application = JobApplication(user_id=candidate.id, job_id=job.id, resume_id=resume.id)
+    db.add(application)
+    await db.flush()
+    session = SmartBotSession(session_id=f'test-{suffix}', application_id=application.id)
+    db.add(session)
+    await db.flush()
+    analysis = CandidateAnalysis(session_id=session.session_id, initial_score=60, relevance_score=60, status=AnalysisStatus.IN_PROGRESS.value, clarifications_received={'items': [{'question_category': 'город', 'answer': 'Готов к переезду'}]})
+    db.add(analysis)
+    await db.flush()
+    db.add(AnalysisCategory(analysis_id=analysis.id, category='город', status='clarified', score=60, details='Кандидат из другого города | Ответ кандидата: Готов к переезду'))
+    await db.commit()
+    return {'users': [employer.id, candidate.id], 'job': job.id, 'resume': resume.id, 'application': application.id, 'session': session.session_id, 'analysis': analysis.id}
+
+async def _cleanup(db, ids: dict) -> None:
+    await db.execute(delete(AnalysisCategory).where(AnalysisCategory.analysis_id == ids['analysis']))
+    await db.execute(delete(CandidateAnalysis).where(CandidateAnalysis.id == ids['analysis']))
+    await db.execute(delete(SmartBotSession).where(SmartBotSession.session_id == ids['session']))
+    await db.execute(delete(JobApplication).where(JobApplication.id == ids['application']))
+    await db.execute(delete(Resume).where(Resume.id == ids['resume']))
+    await db.execute(delete(Job).where(Job.id == ids['job']))
+    await db.execute(delete(User).where(User.id.in_(ids['users'])))
+    await db.commit()
+
+def test_reanalysis_keeps_clarified_categories(monkeypatch):
+    if not asyncio.run(_database_available()):
+        pytest.skip('PostgreSQL with SmartBot tables is not available')
+    monkeypatch.setattr(ApplicationAnalyzer, 'openai_available', property(lambda self: False))
+
+    async def scenario() -> list:
+        async with AsyncSessionLocal() as db:
+            ids = await _seed(db)
+        try:
+            async with AsyncSessionLocal() as db:
+                await application_analyzer.reanalyze_job(db, ids['job'])
+            async with AsyncSessionLocal() as db:
+                return (await db.execute(select(AnalysisCategory.category, AnalysisCategory.status, AnalysisCategory.details).where(AnalysisCategory.analysis_id == ids['analysis']))).all()
+        finally:
+            async with AsyncSessionLocal() as db:
+                await _cleanup(db, ids)
+    categories = asyncio.run(scenario())
+    clarified = [row for row in categories if row.category == 'город']
+    assert len(clarified) == 1
+    assert clarified[0].status == 'clarified'
+    assert 'Готов к переезду' in clarified[0].details
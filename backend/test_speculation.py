@@ -0,0 +1,151 @@
+import sys
+import os
+import time
+import asyncio
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from core.metrics import metrics
+from services.speculation import SpeculativeCache, state_key
+
+def _counter(name: str, **labels) -> float:
+    key = name + '{' + ','.join((f'{k}={labels[k]}' for k in sorted(labels))) + '}'
+    return metrics.snapshot()['counters'].get(key, 0)
+
+def _value(result):
+
+    async def factory():
+        return result
+    return factory
+
+def _blocked(release: asyncio.Event):
+
+    async def factory():
+        await release.wait()
+        return 'late'
+    return factory
+
+def test_state_key_depends_on_message_ids():
+    assert state_key([1, 2]) == state_key([1, 2])
+    assert state_key([1, 2]) != state_key([2, 1])
+    assert state_key([None]) != state_key([1])
+
+def test_take_returns_ready_result_once():
+
+    async def scenario():
+        cache = SpeculativeCache(ttl=60, max_sessions=10)
+        cache.schedule('s', 'rephrase', 'k', _value('question'))
+        await asyncio.sleep(0)
+        task = cache.take('s', 'rephrase', 'k')
+        assert task is not None and await task == 'question'
+        assert cache.take('s', 'rephrase', 'k') is None
+        assert 's' not in cache._sessions
+    hits = _counter('speculation_hits_total', kind='rephrase')
+    misses = _counter('speculation_misses_total', kind='rephrase')
+    asyncio.run(scenario())
+    assert _counter('speculation_hits_total', kind='rephrase') == hits + 1
+    assert _counter('speculation_misses_total', kind='rephrase') == misses + 1
+
+def test_take_with_stale_key_drops_speculation():
+
+    async def scenario():
+        cache = SpeculativeCache(ttl=60, max_sessions=10)
+        release = asyncio.Event()
+        cache.schedule('s', 'final_report', state_key([1]), _blocked(release))
+        task = cache._sessions['s']['final_report'].task
+        assert cache.take('s', 'final_report', state_key([2])) is None
+        await asyncio.sleep(0)
+        assert task.cancelled()
+        assert cache.take('s', 'final_report', state_key([1])) is None
+    stale = _counter('speculation_discarded_total', kind='final_report', reason='stale')
+    asyncio.run(scenario())
+    assert _counter('speculation_discarded_total', kind='final_report', reason='stale') == stale + 1
+
+def test_take_ignores_failed_and_none_results():
+
+    async def failing():
+        raise RuntimeError('llm down')
+
+    async def scenario():
+        cache = SpeculativeCache(ttl=60, max_sessions=10)
+        cache.schedule('s', 'rephrase', 'k', _value(None))
+        cache.schedule('s', 'final_report', 'k', failing)
+        await asyncio.sleep(0.01)
+        assert cache.take('s', 'rephrase', 'k') is None
+        assert cache.take('s', 'final_report', 'k') is None
+    failed = _counter('speculation_discarded_total', kind='rephrase', reason='failed')
+    asyncio.run(scenario())
+    assert _counter('speculation_discarded_total', kind='rephrase', reason='failed') == failed + 1
+    assert _counter('speculation_discarded_total', kind='final_report', reason='failed') >= 1
+
+def test_take_ignores_cancelled_task():
+
+    async def scenario():
+        cache = SpeculativeCache(ttl=60, max_sessions=10)
+        cache.schedule('s', 'rephrase', 'k', _blocked(asyncio.Event()))
+        task = cache._sessions['s']['rephrase'].task
+        task.cancel()
+        await asyncio.sleep(0)
+        assert task.cancelled()
+        assert cache.take('s', 'rephrase', 'k') is None
+    asyncio.run(scenario())
+
+def test_ready_only_skips_pending_and_awaits_otherwise():
+
+    async def scenario():
+        cache = SpeculativeCache(ttl=60, max_sessions=10)
+        release = asyncio.Event()
+        cache.schedule('s', 'rephrase', 'k', _blocked(release))
+        task = cache._sessions['s']['rephrase'].task
+        assert cache.take('s', 'rephrase', 'k', ready_only=True) is None
+        await asyncio.sleep(0)
+        assert task.cancelled()
+        release = asyncio.Event()
+        cache.schedule('s', 'final_report', 'k', _blocked(release))
+        pending = cache.take('s', 'final_report', 'k')
+        assert pending is not None and not pending.done()
+        release.set()
+        assert await pending == 'late'
+    not_ready = _counter('speculation_discarded_total', kind='rephrase', reason='not_ready')
+    asyncio.run(scenario())
+    assert _counter('speculation_discarded_total', kind='rephrase', reason='not_ready') == not_ready + 1
+
+def test_schedule_supersedes_previous_speculation_of_same_kind():
+
+    async def scenario():
+        cache = SpeculativeCache(ttl=60, max_sessions=10)
+        cache.schedule('s', 'rephrase', 'old', _blocked(asyncio.Event()))
+        first = cache._sessions['s']['rephrase'].task
+        cache.schedule('s', 'rephrase', 'new', _value('fresh'))
+        await asyncio.sleep(0)
+        assert first.cancelled()
+        assert cache.take('s', 'rephrase', 'old') is None
+        cache.schedule('s', 'rephrase', 'new', _value('fresh'))
+        await asyncio.sleep(0)
+        assert await cache.take('s', 'rephrase', 'new') == 'fresh'
+    superseded = _counter('speculation_discarded_total', kind='rephrase', reason='superseded')
+    asyncio.run(scenario())
+    assert _counter('speculation_discarded_total', kind='rephrase', reason='superseded') == superseded + 1
+
+def test_sweep_expires_old_sessions_and_evicts_least_recent():
+
+    async def scenario():
+        cache = SpeculativeCache(ttl=60, max_sessions=2)
+        cache.schedule('old', 'rephrase', 'k', _blocked(asyncio.Event()))
+        expired = cache._sessions['old']['rephrase']
+        expired.created = time.monotonic() - 120
+        cache.schedule('a', 'rephrase', 'k', _blocked(asyncio.Event()))
+        assert 'old' not in cache._sessions
+        cache.schedule('b', 'rephrase', 'k', _blocked(asyncio.Event()))
+        cache.schedule('a', 'final_report', 'k', _blocked(asyncio.Event()))
+        evicted = cache._sessions['b']['rephrase'].task
+        cache.schedule('c', 'rephrase', 'k', _blocked(asyncio.Event()))
+        await asyncio.sleep(0)
+        assert expired.task.cancelled() and evicted.cancelled()
+        assert list(cache._sessions) == ['a', 'c']
+        cache.discard('a')
+        cache.discard('c', 'rephrase')
+        assert not cache._sessions
+    expired = _counter('speculation_discarded_total', kind='rephrase', reason='expired')
+    evicted = _counter('speculation_discarded_total', kind='rephrase', reason='evicted')
+    asyncio.run(scenario())
+    assert _counter('speculation_discarded_total', kind='rephrase', reason='expired') == expired + 1
+    assert _counter('speculation_discarded_total', kind='rephrase', reason='evicted') == evicted + 1
@@ -0,0 +1,122 @@
+import sys
+import os
+import json
+import asyncio
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from services.ws_manager import WSManager
+
+class FakeWebSocket:
+
+    def __init__(self) -> None:
+        self.sent = []
+
+    async def send_text(self, message: str) -> None:
+        self.sent.append(json.loads(message))
+
+    async def close(self, code: int=1000) -> None:
+        pass
+
+def _manager(queue_size: int=16, replay_size: int=5) -> WSManager:
+    return WSManager(queue_size=queue_size, send_timeout=1, replay_size=replay_size, replay_max_topics=10, ping_interval=30, idle_timeout=60)
+
+async def _publish(manager: WSManager, count: int, topic: str='s1') -> None:
+    for i in range(count):
+        await manager.deliver('session', topic, {'event': 'chat_message', 'n': i + 1})
+
+async def _drain(conn) -> None:
+    for _ in range(100):
+        if conn.queue.empty():
+            break
+        await asyncio.sleep(0.001)
+    await asyncio.sleep(0.001)
+
+async def _reconnect(manager: WSManager, since=None, epoch=None, topic: str='s1') -> list:
+    websocket = FakeWebSocket()
+    conn = await manager.connect_session(topic, websocket, since=since, epoch=epoch)
+    await _drain(conn)
+    await manager.disconnect_session(topic, websocket)
+    assert conn.closed
+    return websocket.sent
+
+def _scenario(published: int, since=None, epoch='current', queue_size: int=16, replay_size: int=5) -> list:
+
+    async def run() -> list:
+        manager = _manager(queue_size=queue_size, replay_size=replay_size)
+        await _publish(manager, published)
+        return await _reconnect(manager, since=since, epoch=manager.epoch if epoch == 'current' else epoch)
+    return asyncio.run(run())
+
+def _replayed(sent: list) -> list:
+    return [event['seq'] for event in sent if event['event'] == 'chat_message']
+
+def test_subscribed_reports_current_seq_without_replay():
+    sent = _scenario(3)
+    assert sent[0]['event'] == 'subscribed' and sent[0]['seq'] == 3
+    assert _replayed(sent) == []
+
+def test_replays_only_events_after_since():
+    sent = _scenario(4, since=2)
+    assert _replayed(sent) == [3, 4]
+    assert [event['n'] for event in sent[1:]] == [3, 4]
+
+def test_since_equal_to_seq_replays_nothing():
+    sent = _scenario(4, since=4)
+    assert [event['event'] for event in sent] == ['subscribed']
+
+def test_since_zero_on_unknown_topic_is_empty_replay():
+    sent = _scenario(0, since=0)
+    assert [event['event'] for event in sent] == ['subscribed']
+
+def test_since_just_before_oldest_buffered_event_replays_whole_buffer():
+    sent = _scenario(8, since=3, replay_size=5)
+    assert _replayed(sent) == [4, 5, 6, 7, 8]
+
+def test_since_older_than_buffer_requires_resync():
+    sent = _scenario(8, since=2, replay_size=5)
+    assert [event['event'] for event in sent] == ['subscribed', 'resync_required']
+    assert sent[1]['seq'] == 8
+
+def test_since_ahead_of_server_requires_resync():
+    sent = _scenario(3, since=4)
+    assert [event['event'] for event in sent] == ['subscribed', 'resync_required']
+
+def test_since_on_unknown_topic_requires_resync():
+    sent = _scenario(0, since=1)
+    assert [event['event'] for event in sent] == ['subscribed', 'resync_required']
+
+def test_epoch_mismatch_requires_resync():
+    sent = _scenario(3, since=1, epoch='restarted')
+    assert [event['event'] for event in sent] == ['subscribed', 'resync_required']
+
+def test_backlog_that_fills_queue_requires_resync():
+    sent = _scenario(4, since=0, queue_size=4, replay_size=10)
+    assert [event['event'] for event in sent] == ['subscribed', 'resync_required']
+
+def test_backlog_one_below_queue_size_is_replayed():
+    sent = _scenario(3, since=0, queue_size=4, replay_size=10)
+    assert _replayed(sent) == [1, 2, 3]
+
+def test_ephemeral_events_are_not_sequenced_or_replayed():
+
+    async def run() -> tuple:
+        manager = _manager()
+        await _publish(manager, 2)
+        await manager.deliver('session', 's1', {'event': 'chat_delta', 'delta': 'partial'})
+        return (manager.current_seq('session', 's1'), await _reconnect(manager, since=0, epoch=manager.epoch))
+    (seq, sent) = asyncio.run(run())
+    assert seq == 2
+    assert [event['event'] for event in sent] == ['subscribed', 'chat_message', 'chat_message']
+
+def test_live_events_follow_replay_in_order():
+
+    async def run() -> list:
+        manager = _manager()
+        await _publish(manager, 3)
+        websocket = FakeWebSocket()
+        conn = await manager.connect_session('s1', websocket, since=1, epoch=manager.epoch)
+        await manager.deliver('session', 's1', {'event': 'chat_message', 'n': 4})
+        await _drain(conn)
+        await manager.disconnect_session('s1', websocket)
+        return websocket.sent
+    sent = asyncio.run(run())
+    assert _replayed(sent) == [2, 3, 4]
@@ -5,6 +5,9 @@ export type WebSocketMessage = {
   type: string;
   data: any;
   timestamp?: string;
+  event?: string;
+  seq?: number;
+  epoch?: string;
 };
 
 type ConnectionStatus = 'connecting' | 'connected' | 'disconnected' | 'error';
@@ -36,6 +39,8 @@ export const useWebSocket = ({
   const wsRef = useRef<WebSocket | null>(null);
   const reconnectTimeoutRef = useRef<number | null>(null);
   const reconnectAttempts = useRef(0);
+  const lastSeqRef = useRef<number | null>(null);
+  const epochRef = useRef<string | null>(null);
   
   
   const onMessageRef = useRef(onMessage);
@@ -74,6 +79,10 @@ export const useWebSocket = ({
     }
     
     params.append('token', token);
+    if (lastSeqRef.current !== null && epochRef.current) {
+      params.append('since', String(lastSeqRef.current));
+      params.append('epoch', epochRef.current);
+    }
     wsUrl += `?${params.toString()}`;
 
     try {
@@ -91,6 +100,14 @@ export const useWebSocket = ({
       ws.onmessage = (event) => {
         try {
           const message: WebSocketMessage = JSON.parse(event.data);
+          if (message.event === 'ping') {
+            ws.send(JSON.stringify({ event: 'pong' }));
+            return;
+          }
+          if (typeof message.seq === 'number') {
+            lastSeqRef.current = message.seq;
+            epochRef.current = message.epoch ?? null;
+          }
           setLastMessage(message);
           onMessageRef.current?.(message);
         } catch (error) {
@@ -129,6 +146,11 @@ export const useWebSocket = ({
     }
   }, [token, sessionId, jobId]);
 
+  useEffect(() => {
+    lastSeqRef.current = null;
+    epochRef.current = null;
+  }, [sessionId, jobId]);
+
   const disconnect = useCallback(() => {
     if (reconnectTimeoutRef.current) {
       clearTimeout(reconnectTimeoutRef.current);
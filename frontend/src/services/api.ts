@@ -248,7 +248,7 @@ export const smartBotAPI = {
     }>('/api/smartbot/chat', data),
   getSession: (sessionId: string) => api.get<SmartBotSession>(`/api/smartbot/sessions/${sessionId}`),
   getAnalysis: (applicationId: number) => api.get<CandidateAnalysis>(`/api/smartbot/analysis/${applicationId}`),
-  getSessionMessages: (sessionId: string) => api.get<SmartBotMessage[]>(`/api/smartbot/sessions/${sessionId}/messages`),
+  getSessionMessages: (sessionId: string, params?: { limit?: number; before_id?: number }) => api.get<SmartBotMessage[]>(`/api/smartbot/session/${sessionId}/messages`, { params }),
   getEmployerAnalysis: (jobId: number) => api.get<EmployerAnalysisView[]>(`/api/smartbot/employer/applications/${jobId}`),
   getEmployerApplicationAnalysis: (applicationId: number) => api.get<EmployerAnalysisView>(`/api/smartbot/employer/application-analysis/${applicationId}`),
 };
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Скрипт для запуска воркера очереди анализа SmartBot
+"""
+import sys
+import os
+import asyncio
+import logging
+
+# Добавляем backend директорию в Python path
+backend_dir = os.path.join(os.path.dirname(__file__), 'backend')
+sys.path.insert(0, backend_dir)
+
+if __name__ == "__main__":
+    import main  # noqa: F401  регистрирует все модели SQLAlchemy
+    from services.job_queue import job_queue
+    from services.event_bus import event_bus
+    from services.llm_client import llm_client
+    from core.config import settings
+
+    async def run():
+        try:
+            await job_queue.run_worker()
+        finally:
+            # дожидаемся отправки событий WebSocket, накопленных в шине
+            await event_bus.stop()
+            await llm_client.aclose()
+
+    logging.basicConfig(level=logging.INFO)
+    if settings.event_bus_backend == 'memory':
+        # события из этого процесса не дойдут до сокетов API: первый вопрос SmartBot потеряется
+        logging.warning('EVENT_BUS_BACKEND=memory: WebSocket-события воркера не попадут в процесс API. '
+                        'Задайте EVENT_BUS_BACKEND=postgres для API и воркера или используйте ANALYSIS_QUEUE_EMBEDDED_WORKERS.')
+    print("🛠  Запуск воркера очереди анализа SmartBot...")
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("Воркер остановлен")